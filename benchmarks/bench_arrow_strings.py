@@ -0,0 +1,91 @@
+"""
+Benchmark of parsing a tabular and replacing its aliases and search patterns with the
+Arrow backed strings
+
+With the default numpy dtype backend, the cells of a parsed table are Python strings in
+object columns, of which the aliases and search patterns are replaced with the *re*
+module. With ``dtype_backend="pyarrow"`` the cells are stored in *string[pyarrow]*
+columns and the patterns are replaced with the regular expression kernels of Arrow. Both
+are timed on synthetic tabulars of :mod:`synthetic` with aliases, together with the time
+of the substitution stage and the memory of the parsed table. Run with::
+
+    python benchmarks/bench_arrow_strings.py [--rows N]
+"""
+import argparse
+import io
+import time
+
+import pandas as pd
+from synthetic import make_tabular
+
+from tabularxls import profiling
+from tabularxls.tabular_utils import parse_tabular
+
+N_REPEAT = 3
+# the default patterns of the command line and a replacement of the decimal comma
+SEARCH_AND_REPLACE = {
+    r"\$sharp\$": "#",
+    r"\$cdot\$": ".",
+    r"\$ast\$": "*",
+    r"\$\^ast\$": "*",
+    ",": ".",
+}
+
+
+def parse(text, dtype_backend):
+    """Parse the tabular, return the table, the total time and the substitution time"""
+    start = time.perf_counter()
+    table_df, profile = profiling.run_profiled(
+        parse_tabular,
+        io.StringIO(text),
+        search_and_replace=SEARCH_AND_REPLACE,
+        dtype_backend=dtype_backend,
+    )
+    duration = time.perf_counter() - start
+    return table_df, duration, profile.timings.get("substitute", 0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--rows",
+        type=int,
+        default=200_000,
+        help="Rows of 8 cells of the largest tabular",
+    )
+    args = parser.parse_args()
+
+    cases = {
+        f"{n_rows} rows": make_tabular(
+            n_rows=n_rows, n_aliases=50, alias_share=0.2, max_number=1000
+        )
+        for n_rows in (args.rows // 100, args.rows // 10, args.rows)
+    }
+    print(
+        f"{'tabular':14s} {'backend':8s} {'parse [s]':>10s} "
+        f"{'replace [s]':>12s} {'table':>8s}"
+    )
+    for label, text in cases.items():
+        tables = dict()
+        for dtype_backend in ("numpy", "pyarrow"):
+            results = [parse(text, dtype_backend) for _ in range(N_REPEAT)]
+            table_df = results[0][0]
+            duration = min(result[1] for result in results)
+            substitute = min(result[2] for result in results)
+            size = table_df.memory_usage(deep=True).sum() / 1024**2
+            print(
+                f"{label:14s} {dtype_backend:8s} {duration:10.3f} "
+                f"{substitute:12.3f} {size:6.0f}MB"
+            )
+            tables[dtype_backend] = table_df
+        # the same cells, of which the missing ones are None instead of NA
+        arrow_df = tables["pyarrow"].astype(object)
+        pd.testing.assert_frame_equal(
+            arrow_df.where(arrow_df.notna(), None),
+            tables["numpy"],
+            check_index_type=False,
+        )
+
+
+if __name__ == "__main__":
+    main()
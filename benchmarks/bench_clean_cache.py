@@ -0,0 +1,156 @@
+"""
+Benchmark of the memoized cell cleaning
+
+Compares :func:`clean_the_cells`, which remembers the cleaned cells, against cleaning
+each cell again with :func:`clean_cell`. Three sets of rows are cleaned: the rows of the
+tabulars in the *tests* and *examples* directories, repeated 100 times as in a long
+running watch or server process, a synthetic table with few distinct cells and aliases,
+and a synthetic table of distinct numbers to show the cost of the cache when nothing
+repeats. For the latter, the cache is bypassed once the miss rate exceeds
+:data:`CLEAN_CACHE_MAX_MISS_RATE`. The cache is emptied before each run. Run with::
+
+    python benchmarks/bench_clean_cache.py
+"""
+import timeit
+from pathlib import Path
+
+import numpy as np
+from synthetic import make_tabular
+
+from tabularxls import tabular_utils
+from tabularxls.tabular_utils import (
+    NORMAL_CHARACTERS,
+    SUPERSCRIPT_CHARACTERS,
+    AliasDict,
+    clean_cell,
+    clean_the_cells,
+    get_new_command,
+    get_super,
+)
+
+ROOT = Path(__file__).parent.parent
+N_REPEAT = 5
+
+
+def clean_the_cells_uncached(cells, aliases=None):
+    """The previous implementation: clean each cell again"""
+    clean_cells = list()
+    for cell in cells:
+        clean_text, n_col = clean_cell(cell, aliases)
+        clean_cells.append(clean_text)
+        if n_col is not None and n_col > 1:
+            for ii in range(1, n_col):
+                clean_cells.append("")
+    return clean_cells
+
+
+def get_super_maketrans(content):
+    """The previous implementation: build the translation table on each call"""
+    translations = content.maketrans(NORMAL_CHARACTERS, SUPERSCRIPT_CHARACTERS)
+    return content.translate(translations)
+
+
+def collect_rows(lines):
+    """Get the raw rows and the aliases of tabular lines"""
+    rows = list()
+    aliases = AliasDict()
+    for line in lines:
+        if "newcommand" in line:
+            alias, pattern = get_new_command(line.strip())
+            aliases[alias] = pattern
+        cells = line.strip().split("&")
+        if len(cells) > 1:
+            rows.append(cells)
+    return rows, aliases
+
+
+def collect_example_rows():
+    """Get the rows of all test and example files, each file with its own aliases"""
+    tables = list()
+    for tex_file in sorted(ROOT.glob("tests/*.tex")) + sorted(
+        ROOT.glob("examples/*.tex")
+    ):
+        with open(tex_file, encoding="utf-8") as fp:
+            tables.append(collect_rows(fp))
+    return tables
+
+
+def clean_tables(clean_function, tables):
+    """Clean all rows of the tables"""
+    tabular_utils.clear_clean_cache()
+    return [
+        [clean_function(cells, aliases) for cells in rows] for rows, aliases in tables
+    ]
+
+
+def main():
+    rng = np.random.default_rng(1)
+    vocabulary = [
+        "",
+        ".",
+        "-",
+        "\\Checkmark",
+        "\\textbf{Totaal}",
+        "12\\textsuperscript{1)}",
+        "\\hspace{1ex}93",
+    ] + [f"\\emph{{categorie {ii}}}" for ii in range(20)]
+    low_cardinality_lines = [
+        f"\\newcommand{{\\alias{chr(ord('a') + ii)}}}{{\\emph{{waarde {ii}}}}}"
+        for ii in range(10)
+    ]
+    vocabulary += [f"\\alias{chr(ord('a') + ii)}" for ii in range(10)]
+    for row in rng.choice(vocabulary, size=(20_000, 8)):
+        low_cardinality_lines.append(" & ".join(row) + " \\\\")
+    cases = {
+        "examples x 100": collect_example_rows() * 100,
+        "low cardinality": [collect_rows(low_cardinality_lines)],
+        "distinct numbers": [collect_rows(make_tabular(n_rows=20_000).splitlines())],
+    }
+
+    print(f"{'rows':18s} {'cells':>8s} {'distinct':>9s} {'before':>12s} {'after':>12s}")
+    for label, tables in cases.items():
+        cells = [cell for rows, _ in tables for cells in rows for cell in cells]
+        assert clean_tables(clean_the_cells, tables) == clean_tables(
+            clean_the_cells_uncached, tables
+        )
+        before = min(
+            timeit.repeat(
+                lambda: clean_tables(clean_the_cells_uncached, tables),
+                number=1,
+                repeat=N_REPEAT,
+            )
+        )
+        after = min(
+            timeit.repeat(
+                lambda: clean_tables(clean_the_cells, tables),
+                number=1,
+                repeat=N_REPEAT,
+            )
+        )
+        print(
+            f"{label:18s} {len(cells):8d} {len(set(cells)):9d} "
+            f"{len(cells) / before:8.0f} c/s {len(cells) / after:8.0f} c/s"
+        )
+
+    footnotes = ["1)", "2)", "a", "*"] * 25_000
+    assert list(map(get_super, footnotes)) == list(map(get_super_maketrans, footnotes))
+    before = min(
+        timeit.repeat(
+            lambda: list(map(get_super_maketrans, footnotes)),
+            number=1,
+            repeat=N_REPEAT,
+        )
+    )
+    after = min(
+        timeit.repeat(
+            lambda: list(map(get_super, footnotes)), number=1, repeat=N_REPEAT
+        )
+    )
+    print(
+        f"{'get_super':18s} {len(footnotes):8d} {'':9s} "
+        f"{len(footnotes) / before:8.0f} c/s {len(footnotes) / after:8.0f} c/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
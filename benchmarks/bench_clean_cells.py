@@ -0,0 +1,85 @@
+"""
+Micro benchmark of the cell cleaning
+
+Compares the compiled single pass cleaning of :func:`clean_the_cells` against the
+original chain of replacements on all cells of the tabulars in the *tests* and
+*examples* directories. Run with::
+
+    python benchmarks/bench_clean_cells.py
+"""
+import re
+import timeit
+from pathlib import Path
+
+from tabularxls.tabular_utils import (
+    clean_the_cells,
+    get_multicolumns,
+    replace_textsuper,
+)
+
+ROOT = Path(__file__).parent.parent
+N_REPEAT = 20
+
+
+def clean_the_cells_chain(cells):
+    """The original implementation: a chain of replacements for each cell"""
+    clean_cells = list()
+    for cell in cells:
+        clean_cell = replace_textsuper(cell)
+        clean_cell, n_col = get_multicolumns(clean_cell)
+        clean_cell = clean_cell.replace("\\rowcolor{white}", "")
+        clean_cell = clean_cell.replace("\\cornercell{", "")
+        clean_cell = clean_cell.replace("\\normalsize{", "")
+        clean_cell = clean_cell.replace("\\textbf{", "")
+        clean_cell = clean_cell.replace("\\emph{", "")
+        clean_cell = clean_cell.replace("\\python{", "")
+        clean_cell = clean_cell.replace("\\textemdash", "-")
+        clean_cell = clean_cell.replace("\\textendash", "-")
+        clean_cell = clean_cell.replace("\\numprint{", "")
+        clean_cell = re.sub(r"\\hspace{.*?}", "", clean_cell)
+        clean_cell = re.sub(r"\\vspace{.*?}", "", clean_cell)
+        clean_cell = clean_cell.replace("}", "")
+        clean_cell = clean_cell.replace("{", "")
+        clean_cell = clean_cell.replace("\\", "")
+        clean_cell = clean_cell.replace("--", "-")
+        clean_cells.append(clean_cell.strip())
+        if n_col is not None and n_col > 1:
+            for ii in range(1, n_col):
+                clean_cells.append("")
+    return clean_cells
+
+
+def collect_cells():
+    """Get the raw cells of all tabular lines of the test and example files"""
+    cells = list()
+    for tex_file in sorted(ROOT.glob("tests/*.tex")) + sorted(
+        ROOT.glob("examples/*.tex")
+    ):
+        with open(tex_file, encoding="utf-8") as fp:
+            for line in fp:
+                line_cells = line.strip().split("&")
+                if len(line_cells) > 1:
+                    cells.extend(line_cells)
+    return cells
+
+
+def main():
+    cells = collect_cells() * 100
+
+    assert clean_the_cells(cells) == clean_the_cells_chain(cells)
+
+    before = min(
+        timeit.repeat(lambda: clean_the_cells_chain(cells), number=1, repeat=N_REPEAT)
+    )
+    after = min(
+        timeit.repeat(lambda: clean_the_cells(cells), number=1, repeat=N_REPEAT)
+    )
+
+    print(f"cells           : {len(cells)}")
+    print(f"before          : {len(cells) / before:12.0f} cells/s")
+    print(f"after           : {len(cells) / after:12.0f} cells/s")
+    print(f"speed up        : {before / after:12.1f} x")
+
+
+if __name__ == "__main__":
+    main()
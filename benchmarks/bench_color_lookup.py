@@ -0,0 +1,62 @@
+"""
+Benchmark of the color name lookup used by the Excel writer
+
+Compares the prefix index of :func:`find_color_name` against the original linear scan
+over all color names on a table of 100k cells. Run with::
+
+    python benchmarks/bench_color_lookup.py
+"""
+import random
+import timeit
+
+from tabularxls.tabular_utils import find_color_name, get_color_names
+
+N_CELLS = 100_000
+
+
+def find_color_name_linear(line, minimal_color_length=2):
+    """The original implementation: rebuild the color list and scan it for each cell"""
+    found_color = None
+    for color_name in get_color_names(min_color_length=minimal_color_length):
+        if line.startswith(color_name):
+            found_color = color_name
+            break
+    return found_color
+
+
+def make_cells(n_cells, color_fraction=0.1, seed=1):
+    """Create cells of which a fraction starts with a color name"""
+    rng = random.Random(seed)
+    color_names = get_color_names()
+    cells = list()
+    for ii in range(n_cells):
+        value = f"{rng.randint(0, 10000)}"
+        if rng.random() < color_fraction:
+            value = rng.choice(color_names) + value
+        cells.append(value)
+    return cells
+
+
+def main():
+    cells = make_cells(N_CELLS)
+
+    # the linear scan is slow, so time it on a subset and scale up
+    n_linear = N_CELLS // 100
+    linear = timeit.timeit(
+        lambda: [find_color_name_linear(c) for c in cells[:n_linear]], number=1
+    )
+    linear *= N_CELLS / n_linear
+    indexed = min(
+        timeit.repeat(lambda: [find_color_name(c) for c in cells], number=1, repeat=5)
+    )
+
+    assert all(find_color_name(c) == find_color_name_linear(c) for c in cells[:1000])
+
+    print(f"cells           : {N_CELLS}")
+    print(f"linear scan     : {linear:10.3f} s (extrapolated)")
+    print(f"prefix index    : {indexed:10.3f} s")
+    print(f"speed up        : {linear / indexed:10.1f} x")
+
+
+if __name__ == "__main__":
+    main()
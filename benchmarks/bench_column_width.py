@@ -0,0 +1,93 @@
+"""
+Micro benchmark of the column widths
+
+Compares the vectorized :func:`get_max_width` with and without sampling against the
+original loop over all values on a frame of 1M cells. Run with::
+
+    python benchmarks/bench_column_width.py
+"""
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from tabularxls.tabular_utils import get_max_width, get_super
+
+N_ROWS = 100_000
+N_COLUMNS = 10
+SAMPLE_SIZE = 1000
+FOOTNOTE_SHARE = 0.02
+N_REPEAT = 5
+
+
+def get_max_width_loop(input_data, name, column_index=None):
+    """The original implementation: a loop over all values of the column"""
+    max_col_width = len(name)
+    if column_index is None:
+        values = input_data[name]
+    else:
+        values = input_data.iloc[:, column_index]
+    for value in values:
+        col_width = len(str(value))
+        if col_width > max_col_width:
+            max_col_width = col_width
+    return max_col_width
+
+
+def make_frame():
+    """
+    A frame of numbers, labels and numbers with footnotes, as produced by parse_tabular
+    """
+    rng = np.random.default_rng(0)
+    columns = dict()
+    for col_idx in range(N_COLUMNS):
+        numbers = rng.integers(0, 10**6, N_ROWS).astype(str)
+        if col_idx % 3 == 0:
+            values = numbers
+        elif col_idx % 3 == 1:
+            values = np.char.add("label ", numbers[:50])
+            values = rng.choice(values, N_ROWS)
+        else:
+            # a few values with a footnote in superscript
+            values = np.where(
+                rng.random(N_ROWS) < FOOTNOTE_SHARE,
+                np.char.add(numbers, get_super("1)")),
+                numbers,
+            )
+        columns[f"column {col_idx}"] = values.astype(object)
+    return pd.DataFrame(columns)
+
+
+def get_widths(data_df, width_function, **kwargs):
+    return [
+        width_function(data_df, name, column_index=col_idx, **kwargs)
+        for col_idx, name in enumerate(data_df.columns)
+    ]
+
+
+def main():
+    data_df = make_frame()
+
+    timings = dict()
+    for label, width_function, kwargs in (
+        ("before", get_max_width_loop, dict()),
+        ("after", get_max_width, dict()),
+        ("sampled", get_max_width, dict(sample_size=SAMPLE_SIZE)),
+    ):
+        timings[label] = min(
+            timeit.repeat(
+                lambda: get_widths(data_df, width_function, **kwargs),
+                number=1,
+                repeat=N_REPEAT,
+            )
+        )
+
+    print(f"cells           : {data_df.size}")
+    for label, timing in timings.items():
+        print(f"{label:16s}: {timing:8.3f} s")
+    print(f"speed up        : {timings['before'] / timings['after']:8.1f} x")
+    print(f"speed up sampled: {timings['before'] / timings['sampled']:8.1f} x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark of the latency of an in-memory conversion against one through temporary files
+
+A service which receives the LaTeX code of a tabular in a request used to write it to a
+temporary *.tex* file, convert it with :func:`convert_tabular` and read the temporary
+*.xlsx* file back. :func:`convert_tabular_in_memory` reads the code from memory and
+returns the Excel file as bytes. Both are timed per request on the tabulars of the
+*tests* directory and on synthetic tabulars of :mod:`synthetic`. Run with::
+
+    python benchmarks/bench_in_memory.py
+"""
+import tempfile
+import timeit
+from pathlib import Path
+
+import numpy as np
+from synthetic import make_tabular
+
+from tabularxls.main import convert_tabular, convert_tabular_in_memory
+from tabularxls.tabular_utils import get_color_index
+
+ROOT = Path(__file__).parent.parent
+N_REPEAT = 20
+
+
+def convert_through_files(text):
+    """The previous route: write the code to a file and read the Excel file back"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tex_file = Path(tmp_dir) / "request.tex"
+        xls_file = Path(tmp_dir) / "request.xlsx"
+        tex_file.write_text(text, encoding="utf-8")
+        convert_tabular(tex_file, xls_file)
+        return xls_file.read_bytes()
+
+
+def main():
+    # load the colors before timing, as a long running service would have done
+    get_color_index()
+    cases = {
+        "tabular_1.tex": (ROOT / "tests" / "tabular_1.tex").read_text(encoding="utf-8"),
+        "tabular_3.tex": (ROOT / "tests" / "tabular_3.tex").read_text(encoding="utf-8"),
+        "synthetic 100": make_tabular(n_rows=100),
+        "synthetic 2000": make_tabular(n_rows=2000),
+    }
+    print(f"{'tabular':16s} {'files':>10s} {'memory':>10s}")
+    for label, text in cases.items():
+        assert len(convert_tabular_in_memory(text)) > 0
+        files = timeit.repeat(
+            lambda: convert_through_files(text), number=1, repeat=N_REPEAT
+        )
+        memory = timeit.repeat(
+            lambda: convert_tabular_in_memory(text), number=1, repeat=N_REPEAT
+        )
+        print(
+            f"{label:16s} {np.median(files) * 1e3:7.1f} ms "
+            f"{np.median(memory) * 1e3:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
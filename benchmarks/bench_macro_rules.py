@@ -0,0 +1,75 @@
+"""
+Benchmark of the macro rules with a growing number of rules
+
+The macros of a cell are found in one pass of :data:`MACRO_PATTERN` and their rules
+looked up by name, so the time per cell should not depend on the number of rules. This
+is compared against a chain with one replacement per rule, as the hard-coded rules used
+to be applied. The cells are cleaned with :func:`clean_cell`, such that the cache of
+:func:`clean_the_cells` does not hide the cost of the rules. Run with::
+
+    python benchmarks/bench_macro_rules.py
+"""
+import timeit
+
+import numpy as np
+
+from tabularxls.tabular_utils import DEFAULT_MACRO_RULES, clean_cell
+
+N_REPEAT = 5
+N_CELLS = 20_000
+
+
+def get_macro_name(number: int) -> str:
+    """Name of a project specific macro, consisting of letters only"""
+    return "macro" + "".join(chr(ord("a") + int(digit)) for digit in str(number))
+
+
+def clean_cell_chain(cell, replacements):
+    """One replacement per rule, followed by the removal of the braces"""
+    for code, replacement in replacements:
+        cell = cell.replace(code, replacement)
+    for character in "{}\\":
+        cell = cell.replace(character, "")
+    return cell.strip()
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'rules':>6s} {'chain':>14s} {'dispatch':>14s}")
+    for n_rules in (10, 100, 1000):
+        macro_rules = DEFAULT_MACRO_RULES.copy()
+        names = [get_macro_name(ii) for ii in range(n_rules)]
+        for name in names:
+            macro_rules.add_rule(name, "unwrap")
+        replacements = [(f"\\{name}{{", "") for name in names]
+
+        used = rng.choice(names, size=N_CELLS)
+        cells = [
+            f"\\{name}{{{value}}}"
+            for name, value in zip(used, rng.integers(0, 1000, N_CELLS))
+        ]
+        assert [clean_cell_chain(cell, replacements) for cell in cells] == [
+            clean_cell(cell, macro_rules=macro_rules)[0] for cell in cells
+        ]
+
+        chain = min(
+            timeit.repeat(
+                lambda: [clean_cell_chain(cell, replacements) for cell in cells],
+                number=1,
+                repeat=N_REPEAT,
+            )
+        )
+        dispatch = min(
+            timeit.repeat(
+                lambda: [clean_cell(cell, macro_rules=macro_rules) for cell in cells],
+                number=1,
+                repeat=N_REPEAT,
+            )
+        )
+        print(
+            f"{n_rules:6d} {N_CELLS / chain:10.0f} c/s {N_CELLS / dispatch:10.0f} c/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
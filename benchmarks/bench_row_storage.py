@@ -0,0 +1,149 @@
+"""
+Benchmark of the memory used to store the parsed rows of a tall tabular
+
+The rows used to be collected as lists of strings, of which each chunk was converted
+with *DataFrame.from_records* and all chunks concatenated at the end.
+:func:`rows_to_data_frame` now stores the chunks in a :class:`ColumnarRows` buffer, with
+per column a code per cell and the distinct values, which is decoded once to an object
+data frame, to Arrow backed string columns, or directly to Categorical columns or an
+Arrow table. Each variant reads the same synthetic tabular of 5 million cells in its own
+process, such that its peak resident memory can be measured. Run with::
+
+    python benchmarks/bench_row_storage.py [--rows N] [--max_number M]
+
+The numbers of the default tabular are almost all distinct, which is the worst case for
+the dictionary encoding. Use for instance ``--max_number 1000`` for a tabular with many
+repeated cells.
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+from synthetic import write_tabular
+
+from tabularxls.tabular_utils import ColumnarRows, read_tabular_chunks
+
+VARIANTS = ("records", "columnar", "categorical", "strings", "arrow")
+# the column dtype of the data frame of each variant, see ColumnarRows.to_data_frame
+DTYPES = dict(categorical="category", strings="string[pyarrow]")
+
+
+def get_peak_rss() -> int:
+    """Peak resident memory of this process in bytes"""
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+def read_records(tabular_file):
+    """The previous implementation: a data frame per chunk of rows, concatenated once"""
+    chunk_dfs = list()
+    header_row = None
+    for rows in read_tabular_chunks(tabular_file):
+        if header_row is None:
+            header_row = rows.pop(0)
+        chunk_dfs.append(pd.DataFrame.from_records(rows, columns=header_row))
+        del rows
+    return pd.concat(chunk_dfs, ignore_index=True)
+
+
+def read_columnar(tabular_file, variant):
+    """Store the rows in a ColumnarRows buffer and convert it"""
+    columnar_rows = ColumnarRows()
+    header_row = None
+    for rows in read_tabular_chunks(tabular_file):
+        if header_row is None:
+            header_row = rows.pop(0)
+        columnar_rows.extend(rows)
+        del rows
+    if variant == "arrow":
+        return columnar_rows.to_arrow(header_row)
+    return columnar_rows.to_data_frame(header_row, dtype=DTYPES.get(variant))
+
+
+def run_variant(variant, tabular_file):
+    """Read the tabular in this process and print the results as JSON"""
+    start = time.perf_counter()
+    if variant == "records":
+        table = read_records(tabular_file)
+    else:
+        table = read_columnar(tabular_file, variant)
+    duration = time.perf_counter() - start
+    if variant == "arrow":
+        table_size = table.nbytes
+    else:
+        table_size = int(table.memory_usage(deep=True).sum())
+    print(json.dumps(dict(time=duration, peak_rss=get_peak_rss(), size=table_size)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--rows", type=int, default=625_000, help="Rows of 8 cells of the tabular"
+    )
+    parser.add_argument("--variant", nargs=2, help=argparse.SUPPRESS)
+    parser.add_argument(
+        "--max_number",
+        type=int,
+        default=100000,
+        help="The numbers in the cells are below this number",
+    )
+    parser.add_argument("--write", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant is not None:
+        run_variant(*args.variant)
+        return
+    if args.write is not None:
+        write_tabular(args.write, n_rows=args.rows, max_number=args.max_number)
+        return
+
+    variants = list(VARIANTS)
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        variants.remove("strings")
+        variants.remove("arrow")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # the tabular is written in its own process, as a child process starts with the
+        # peak memory of its parent
+        tabular_file = Path(tmp_dir) / "tall.tex"
+        subprocess.run(
+            [
+                sys.executable,
+                __file__,
+                "--rows",
+                str(args.rows),
+                "--max_number",
+                str(args.max_number),
+                "--write",
+                str(tabular_file),
+            ],
+            check=True,
+        )
+        print(f"{args.rows * 8 / 1e6:.1f} million cells")
+        print(f"{'variant':12s} {'time [s]':>9s} {'peak RSS':>10s} {'table':>10s}")
+        for variant in variants:
+            output = subprocess.run(
+                [sys.executable, __file__, "--variant", variant, str(tabular_file)],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            result = json.loads(output.splitlines()[-1])
+            print(
+                f"{variant:12s} {result['time']:9.2f} "
+                f"{result['peak_rss'] / 1024**2:8.0f}MB "
+                f"{result['size'] / 1024**2:8.0f}MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Load test of the conversion server
+
+Converts the same set of small tabular files by starting a new tabular2xls process for
+each file, as a build script would do, and by sending them to a running server from
+several client connections. Reports the conversions per second of both. Run with::
+
+    python benchmarks/bench_server.py
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from tabularxls.client import convert_files
+from tabularxls.server import ConversionServer
+
+N_FILES = 40
+N_CONNECTIONS = 4
+N_COLD = 10
+
+TABULAR = r"""\begin{tabular}{lrrr}
+Regio & 2019 & 2020 & 2021 \\
+\hline
+{row} & 1,2 & 3,4 & 5,6 \\
+Noord & 10 & 20 & 30 \\
+Zuid & 15 & 25 & 35\tablefootnote{voorlopig} \\
+\end{tabular}
+"""
+
+
+def make_files(directory, n_files):
+    """Create small tabular files"""
+    conversions = list()
+    for ii in range(n_files):
+        filename = Path(directory) / f"tabular_{ii}.tex"
+        filename.write_text(TABULAR.replace("{row}", f"Regio {ii}"))
+        conversions.append((str(filename), str(filename.with_suffix(".xlsx"))))
+    return conversions
+
+
+def convert_cold(conversions):
+    """Convert each file with a new tabular2xls process"""
+    start = time.perf_counter()
+    for filename, xls_filename in conversions:
+        subprocess.run(
+            [sys.executable, "-m", "tabularxls.main", filename],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+    return time.perf_counter() - start
+
+
+def convert_server(socket_path, conversions, n_connections):
+    """Convert the files with a running server over several connections"""
+    threads = [
+        threading.Thread(
+            target=convert_files,
+            args=(socket_path, conversions[ii::n_connections], dict()),
+        )
+        for ii in range(n_connections)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conversions = make_files(tmp_dir, N_FILES)
+
+        duration = convert_cold(conversions[:N_COLD])
+        print(f"cold processes          : {N_COLD / duration:8.1f} req/s")
+
+        start = time.perf_counter()
+        server = ConversionServer(
+            Path(tmp_dir) / "bench.sock", jobs=min(N_CONNECTIONS, os.cpu_count())
+        )
+        print(f"server start            : {time.perf_counter() - start:8.3f} s")
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            for n_connections in (1, N_CONNECTIONS):
+                duration = convert_server(
+                    server.socket_path, conversions, n_connections
+                )
+                print(
+                    f"server, {n_connections} connection(s) : "
+                    f"{N_FILES / duration:8.1f} req/s"
+                )
+        finally:
+            server.shutdown()
+            thread.join()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    main()
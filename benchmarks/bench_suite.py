@@ -0,0 +1,166 @@
+"""
+Benchmark suite of the parser and the writer on synthetic tabulars
+
+Each case is a synthetic tabular of :mod:`synthetic` with a given size and share of
+multicolumns, superscripts, colors and aliases, optionally with a top row to merge. For
+each case :func:`parse_tabular` and :func:`write_data_to_sheet_multiindex` are run in
+their own process, such that the peak resident memory of each stage can be measured.
+Reported are the best time of a few repeats, the peak RSS of the process, the size of
+the tabular and the size of the Excel file. Run with::
+
+    python benchmarks/bench_suite.py [--cases PATTERN] [--json results.json]
+
+Two runs written with ``--json`` can be compared with ``--compare old.json``.
+"""
+import argparse
+import json
+import pickle
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from fnmatch import fnmatch
+from pathlib import Path
+
+from synthetic import write_tabular
+
+N_REPEAT = 3
+
+# the parameters of make_tabular per case
+CASES = {
+    "plain_1k": dict(n_rows=1_000, n_cols=8),
+    "plain_20k": dict(n_rows=20_000, n_cols=8),
+    "wide_5k": dict(n_rows=5_000, n_cols=40),
+    "multicolumn_20k": dict(n_rows=20_000, n_cols=8, multicolumn_share=0.05),
+    "superscript_20k": dict(n_rows=20_000, n_cols=8, superscript_share=0.05),
+    "colors_20k": dict(n_rows=20_000, n_cols=8, color_share=0.05),
+    "aliases_20k": dict(n_rows=20_000, n_cols=8, n_aliases=50, alias_share=0.05),
+    "many_aliases_100": dict(n_rows=100, n_cols=8, n_aliases=400, alias_share=0.2),
+    "top_row_merge_20k": dict(n_rows=20_000, n_cols=8, top_row_merge=True),
+    "mixed_50k": dict(
+        n_rows=50_000,
+        n_cols=12,
+        multicolumn_share=0.02,
+        superscript_share=0.02,
+        color_share=0.02,
+        n_aliases=20,
+        alias_share=0.02,
+    ),
+}
+
+
+def get_peak_rss() -> int:
+    """Peak resident memory of this process in bytes"""
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+def run_stage(stage, tabular_file, top_row_merge, pickle_file, xls_file):
+    """Run one stage in this process and print its results as JSON"""
+    from tabularxls.tabular_utils import (
+        get_color_index,
+        parse_tabular,
+        write_data_to_sheet_multiindex,
+    )
+
+    get_color_index()
+    durations = list()
+    if stage == "parse":
+        for _ in range(N_REPEAT):
+            start = time.perf_counter()
+            table_df = parse_tabular(tabular_file, top_row_merge=top_row_merge)
+            durations.append(time.perf_counter() - start)
+        with open(pickle_file, "wb") as fp:
+            pickle.dump(table_df, fp)
+        size = Path(tabular_file).stat().st_size
+    else:
+        with open(pickle_file, "rb") as fp:
+            table_df = pickle.load(fp)
+        for _ in range(N_REPEAT):
+            start = time.perf_counter()
+            write_data_to_sheet_multiindex(table_df, xls_file)
+            durations.append(time.perf_counter() - start)
+        size = Path(xls_file).stat().st_size
+    print(json.dumps(dict(time=min(durations), peak_rss=get_peak_rss(), size=size)))
+
+
+def run_case(name, parameters, tmp_dir):
+    """Run both stages of a case, each in a new process"""
+    tabular_file = write_tabular(Path(tmp_dir) / f"{name}.tex", **parameters)
+    results = dict()
+    for stage in ("parse", "write"):
+        output = subprocess.run(
+            [
+                sys.executable,
+                __file__,
+                "--stage",
+                stage,
+                str(tabular_file),
+                str(parameters.get("top_row_merge", False)),
+                str(Path(tmp_dir) / f"{name}.pkl"),
+                str(Path(tmp_dir) / f"{name}.xlsx"),
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        results[stage] = json.loads(output.splitlines()[-1])
+    return results
+
+
+def print_results(results, reference=None):
+    """Print the results per case, with the ratio to the reference results if given"""
+    print(
+        f"{'case':20s} {'parse [s]':>10s} {'write [s]':>10s} "
+        f"{'parse RSS':>10s} {'write RSS':>10s} {'tex [kB]':>10s} {'xlsx [kB]':>10s}"
+    )
+    for name, result in results.items():
+        parse, write = result["parse"], result["write"]
+        line = (
+            f"{name:20s} {parse['time']:10.3f} {write['time']:10.3f} "
+            f"{parse['peak_rss'] / 1024**2:8.0f}MB "
+            f"{write['peak_rss'] / 1024**2:8.0f}MB "
+            f"{parse['size'] / 1024:10.0f} {write['size'] / 1024:10.0f}"
+        )
+        if reference is not None and name in reference:
+            line += (
+                f"   parse x{parse['time'] / reference[name]['parse']['time']:.2f}"
+                f"   write x{write['time'] / reference[name]['write']['time']:.2f}"
+            )
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cases", help="Only run the cases matching this pattern")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Compare with the results in this file")
+    parser.add_argument("--stage", nargs=5, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stage is not None:
+        stage, tabular_file, top_row_merge, pickle_file, xls_file = args.stage
+        run_stage(stage, tabular_file, top_row_merge == "True", pickle_file, xls_file)
+        return
+
+    results = dict()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, parameters in CASES.items():
+            if args.cases is None or fnmatch(name, args.cases):
+                results[name] = run_case(name, parameters, tmp_dir)
+
+    reference = None
+    if args.compare is not None:
+        with open(args.compare) as fp:
+            reference = json.load(fp)
+    print_results(results, reference=reference)
+
+    if args.json is not None:
+        with open(args.json, "w") as fp:
+            json.dump(results, fp, indent=2)
+
+
+if __name__ == "__main__":
+    main()
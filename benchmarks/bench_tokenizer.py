@@ -0,0 +1,92 @@
+"""
+Benchmark of the tabular tokenizer against the previous line loop
+
+The previous loop split each physical line on every ``&``, so it broke on escaped
+ampersands, separators inside braces and rows spanning several lines.
+:func:`read_tabular_lines` now feeds the lines to a :class:`TabularTokenizer`. Both read
+a plain and a mixed synthetic tabular of :mod:`synthetic` and clean the cells in the
+same way, so the difference is the cost of splitting the rows. Run with::
+
+    python benchmarks/bench_tokenizer.py [--rows N]
+"""
+import argparse
+import re
+import timeit
+
+from synthetic import make_tabular
+
+from tabularxls.tabular_utils import (
+    AliasDict,
+    clean_the_cells,
+    get_new_command,
+    read_tabular_lines,
+)
+
+N_REPEAT = 3
+
+
+def read_tabular_lines_split(lines):
+    """The previous implementation: split each line on every ampersand"""
+    aliases = AliasDict()
+    rows = list()
+    for line in lines:
+        clean_line = line.strip()
+        if clean_line.startswith("%") or clean_line == "":
+            continue
+        match = re.search("newcommand", clean_line)
+        if match is not None:
+            alias, pattern = get_new_command(clean_line)
+            aliases[alias] = pattern
+        clean_line = re.sub(r"\\hyperref\[.*\]{(.*)}", r"\1", clean_line)
+        cells = clean_line.split("&")
+        if len(cells) > 1:
+            rows.append(clean_the_cells(cells, aliases))
+    return rows
+
+
+def read_tabular_lines_tokenizer(lines):
+    """The rows of all chunks of :func:`read_tabular_lines`"""
+    return [row for rows in read_tabular_lines(lines) for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200_000, help="Rows per tabular")
+    args = parser.parse_args()
+
+    cases = {
+        "plain": dict(n_rows=args.rows),
+        "mixed": dict(
+            n_rows=args.rows,
+            n_cols=12,
+            multicolumn_share=0.02,
+            superscript_share=0.02,
+            color_share=0.02,
+            n_aliases=20,
+            alias_share=0.02,
+        ),
+    }
+    print(f"{'tabular':8s} {'MB':>6s} {'split':>11s} {'tokenizer':>11s}")
+    for label, parameters in cases.items():
+        text = make_tabular(**parameters)
+        lines = text.splitlines()
+        assert read_tabular_lines_split(lines) == read_tabular_lines_tokenizer(lines)
+
+        size = len(text.encode("utf-8")) / 1e6
+        before = min(
+            timeit.repeat(
+                lambda: read_tabular_lines_split(lines), number=1, repeat=N_REPEAT
+            )
+        )
+        after = min(
+            timeit.repeat(
+                lambda: read_tabular_lines_tokenizer(lines), number=1, repeat=N_REPEAT
+            )
+        )
+        print(
+            f"{label:8s} {size:6.1f} {size / before:6.1f} MB/s {size / after:6.1f} MB/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
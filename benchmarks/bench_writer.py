@@ -0,0 +1,89 @@
+"""
+Benchmark of the Excel writer
+
+Compares the direct xlsxwriter path of :func:`write_data_to_sheet_multiindex`, with and
+without constant memory mode, against the original path which first writes the whole
+frame with :meth:`DataFrame.to_excel` and then writes the headers and colored cells
+again. Run with::
+
+    python benchmarks/bench_writer.py
+"""
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from tabularxls.tabular_utils import (
+    WorkBook,
+    find_color_name,
+    get_max_width,
+    write_data_to_sheet_multiindex,
+)
+
+N_ROWS = 20_000
+N_COLS = 10
+
+
+def write_data_to_sheet_to_excel(data_df, file_name, sheet_name="Sheet"):
+    """
+    The original implementation: write with to_excel, then overwrite the headers and the
+    colored cells
+    """
+    from pandas.io.formats.excel import ExcelFormatter
+
+    with pd.ExcelWriter(file_name, engine="xlsxwriter") as writer:
+        data_df.to_excel(excel_writer=writer, sheet_name=sheet_name)
+        ExcelFormatter.header_style = None
+        worksheet = writer.sheets[sheet_name]
+        wb = WorkBook(workbook=writer.book)
+        data_df = data_df.reset_index(allow_duplicates=True)
+        for col_idx, column_name in enumerate(data_df.columns):
+            col_width = get_max_width(
+                input_data=data_df, name=column_name, column_index=col_idx
+            )
+            worksheet.set_column(col_idx, col_idx, col_width, cell_format=wb.left_align)
+            worksheet.write(0, col_idx, column_name, wb.header_format)
+            for idx, value in enumerate(data_df[column_name]):
+                found_color_name = find_color_name(value)
+                if found_color_name is not None:
+                    cell_format = wb.set_format(found_color_name)
+                    new_value = value.replace(found_color_name, "")
+                    worksheet.write(idx + 1, col_idx, new_value, cell_format)
+
+
+def make_table(n_rows, n_cols, color_fraction=0.05, seed=1):
+    """Create a table of string numbers of which a fraction is colored"""
+    rng = np.random.default_rng(seed)
+    values = rng.integers(0, 100000, size=(n_rows, n_cols)).astype(str).astype(object)
+    colored = rng.random(size=(n_rows, n_cols)) < color_fraction
+    values[colored] = "red" + values[colored]
+    table_df = pd.DataFrame(values, columns=[f"col{ii}" for ii in range(n_cols)])
+    table_df.index = pd.Index([f"row {ii}" for ii in range(n_rows)], name="Rows")
+    return table_df
+
+
+def main():
+    table_df = make_table(N_ROWS, N_COLS)
+
+    writers = {
+        "to_excel + overwrite": write_data_to_sheet_to_excel,
+        "direct": write_data_to_sheet_multiindex,
+        "direct, constant memory": lambda df, name: write_data_to_sheet_multiindex(
+            df, name, constant_memory=True
+        ),
+    }
+
+    print(f"cells           : {N_ROWS * N_COLS}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for label, writer in writers.items():
+            file_name = Path(tmp_dir) / "bench.xlsx"
+            start = time.perf_counter()
+            writer(table_df, file_name)
+            duration = time.perf_counter() - start
+            print(f"{label:24s}: {duration:8.3f} s")
+
+
+if __name__ == "__main__":
+    main()
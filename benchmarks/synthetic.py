@@ -0,0 +1,133 @@
+"""
+Generator of synthetic LaTeX tabulars for the benchmarks
+
+The tabulars look like the ones of the *examples* directory: a header row with bold
+column names, optionally below a row with a multicolumn group label for
+``--top_row_merge``, followed by rows with a label and numbers. A share of the cells can
+be given a multicolumn, a footnote in superscript, a color or a newcommand alias.
+"""
+from pathlib import Path
+
+import numpy as np
+
+# colors which are found by find_color_name after the cells have been cleaned
+COLORS = ("red", "blue", "green", "orange")
+
+
+def get_alias_name(number: int) -> str:
+    """
+    Get the name of an alias, consisting of letters only like a LaTeX command
+
+    Args:
+        number (int): Number of the alias
+
+    Returns:
+        str: The command name, such as \\synthab
+    """
+    letters = ""
+    while True:
+        number, remainder = divmod(number, 26)
+        letters = chr(ord("a") + remainder) + letters
+        if number == 0:
+            return "\\synth" + letters
+        number -= 1
+
+
+def make_tabular(
+    n_rows: int = 1000,
+    n_cols: int = 8,
+    multicolumn_share: float = 0.0,
+    superscript_share: float = 0.0,
+    color_share: float = 0.0,
+    n_aliases: int = 0,
+    alias_share: float = 0.0,
+    top_row_merge: bool = False,
+    max_number: int = 100000,
+    seed: int = 0,
+) -> str:
+    """
+    Create the LaTeX code of a synthetic tabular
+
+    Args:
+        n_rows (int, optional): Number of rows below the header. Defaults to 1000
+        n_cols (int, optional): Number of columns including the label column. Defaults
+            to 8
+        multicolumn_share (float, optional): Share of the rows of which the first two
+            number cells are merged with a multicolumn. Defaults to 0
+        superscript_share (float, optional): Share of the cells with a footnote in
+            superscript. Defaults to 0
+        color_share (float, optional): Share of the cells with a color. Defaults to 0
+        n_aliases (int, optional): Number of newcommand aliases defined above the
+            tabular. Defaults to 0
+        alias_share (float, optional): Share of the cells which consist of one of the
+            aliases. Defaults to 0
+        top_row_merge (bool, optional): Add a row with a group label above the header,
+            as expected by ``--top_row_merge``. Defaults to False
+        max_number (int, optional): The numbers are drawn below this number and shown
+            with one decimal, such that it sets the number of distinct cells per column.
+            Defaults to 100000
+        seed (int, optional): Seed of the random generator. Defaults to 0
+
+    Returns:
+        str: The tabular
+    """
+    rng = np.random.default_rng(seed)
+    n_values = n_cols - 1
+
+    numbers = rng.integers(0, max_number, size=(n_rows, n_values))
+    cells = np.char.add(
+        (numbers // 10).astype(str), np.char.add(",", (numbers % 10).astype(str))
+    ).astype(object)
+    if superscript_share > 0:
+        footnotes = rng.random(size=cells.shape) < superscript_share
+        cells[footnotes] = cells[footnotes] + "\\textsuperscript{1)}"
+    if color_share > 0:
+        colored = rng.random(size=cells.shape) < color_share
+        colors = rng.choice(COLORS, size=colored.sum())
+        cells[colored] = [
+            f"\\{color}{{{cell}}}" for color, cell in zip(colors, cells[colored])
+        ]
+    aliases = [get_alias_name(ii) for ii in range(n_aliases)]
+    if aliases and alias_share > 0:
+        aliased = rng.random(size=cells.shape) < alias_share
+        cells[aliased] = rng.choice(aliases, size=aliased.sum())
+
+    lines = [
+        f"\\newcommand{{{alias}}}{{\\emph{{waarde {alias[6:]}}}}}" for alias in aliases
+    ]
+    lines.append(f"\\begin{{tabular}}{{l{'r' * n_values}}}")
+    if top_row_merge:
+        lines.append(
+            f"    \\rowcolor{{white}} & "
+            f"\\multicolumn{{{n_values}}}{{c}}{{\\textbf{{Totaal}}}} \\\\"
+        )
+    header = ["\\cornercell{\\textbf{Regio}}"] + [
+        f"\\textbf{{{2000 + ii}}}" for ii in range(n_values)
+    ]
+    lines.append("    \\rowcolor{white}" + " & ".join(header) + " \\\\")
+    lines.append("    \\hline")
+
+    merged = rng.random(size=n_rows) < multicolumn_share
+    for row, row_cells in enumerate(cells):
+        row_cells = list(row_cells)
+        if merged[row] and n_values > 1:
+            row_cells[:2] = [f"\\multicolumn{{2}}{{c}}{{{row_cells[0]}}}"]
+        lines.append(f"    Regio {row} & " + " & ".join(row_cells) + " \\\\")
+    lines.append("\\end{tabular}")
+    return "\n".join(lines) + "\n"
+
+
+def write_tabular(filename, **kwargs) -> Path:
+    """
+    Write a synthetic tabular to a file
+
+    Args:
+        filename (str or Path): Name of the tabular file
+        **kwargs: The parameters of :func:`make_tabular`
+
+    Returns:
+        Path: The name of the tabular file
+    """
+    filename = Path(filename)
+    filename.write_text(make_tabular(**kwargs), encoding="utf-8")
+    return filename
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+Conversion of tabulars from an asyncio event loop
+
+The parsing and writing of a tabular is CPU bound and blocks the thread it runs in for
+up to seconds on large tables. In a service running an event loop, the conversions are
+therefore run in an executor, while the files are read and written in the default
+executor of the loop::
+
+    from tabularxls.aio import convert_async
+
+    async def handle(request):
+        xls_bytes = await convert_async(await request.read())
+        ...
+
+The number of conversions running at the same time is limited by a semaphore. The
+conversions waiting for a free slot are reported as the queue depth, see
+:meth:`AsyncConverter.get_metrics`.
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import weakref
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Union
+
+from tabularxls import profiling
+from tabularxls.main import convert_tabular_in_memory
+
+_logger = logging.getLogger(__name__)
+
+# the default converter of each event loop, see get_converter
+_converters = weakref.WeakKeyDictionary()
+
+
+class AsyncConverter:
+    """
+    Convert tabulars from an event loop, with the parsing and writing in an executor
+
+    Args:
+        executor (Executor, optional): The thread or process pool which runs the
+            conversions. Defaults to None, i.e. the default executor of the event loop
+        max_concurrent (int, optional): Maximum number of conversions running at the
+            same time. Defaults to None, i.e. the number of CPUs
+
+    Attributes:
+        queue_depth (int): Number of conversions waiting for a free slot
+        max_queue_depth (int): Largest queue depth seen so far
+        running (int): Number of conversions running in the executor
+        completed (int): Number of finished conversions, including the failed ones
+
+    Notes:
+        * A converter belongs to the event loop in which it is first used
+        * With a process pool, the LaTeX code and the Excel file are passed between the
+          processes as bytes
+    """
+
+    def __init__(
+        self,
+        executor: Union[Executor, None] = None,
+        max_concurrent: Union[int, None] = None,
+    ):
+        """
+        Constructor of the AsyncConverter class
+        """
+        self.executor = executor
+        self.max_concurrent = max_concurrent or os.cpu_count() or 1
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.running = 0
+        self.completed = 0
+        # created in the event loop on first use
+        self.semaphore = None
+
+    def get_metrics(self) -> dict:
+        """
+        Get the queue depth and the number of running and completed conversions, for
+        instance to export them to a monitoring system
+
+        Returns:
+            dict: The metrics keyed on their name
+        """
+        return dict(
+            queue_depth=self.queue_depth,
+            max_queue_depth=self.max_queue_depth,
+            running=self.running,
+            completed=self.completed,
+            max_concurrent=self.max_concurrent,
+        )
+
+    async def run_conversion(self, tex_code: bytes, **options) -> bytes:
+        """
+        Convert the LaTeX code in the executor
+
+        Args:
+            tex_code (bytes): The encoded LaTeX code
+            **options: The options of :func:`tabularxls.main.convert_tabular_in_memory`
+
+        Returns:
+            bytes: The contents of the Excel file
+        """
+        loop = asyncio.get_running_loop()
+        convert = partial(convert_tabular_in_memory, tex_code, **options)
+        profile = profiling.get_profile()
+        if isinstance(self.executor, ProcessPoolExecutor):
+            if profile is None:
+                return await loop.run_in_executor(self.executor, convert)
+            # the worker collects its own profile, which is added to the current one
+            xls_bytes, worker_profile = await loop.run_in_executor(
+                self.executor, partial(profiling.run_profiled, convert)
+            )
+            profile.merge(worker_profile)
+            return xls_bytes
+        # a thread runs the conversion in the context of the caller, such that the
+        # profile is collected
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self.executor, context.run, convert)
+
+    async def convert(
+        self,
+        source: Union[str, Path, bytes],
+        destination: Union[str, Path, None] = None,
+        **options,
+    ) -> Union[bytes, None]:
+        """
+        Convert a tabular file or LaTeX code without blocking the event loop
+
+        Args:
+            source (str, Path or bytes): Name of the tabular file, or the encoded LaTeX
+                code
+            destination (str or Path, optional): Name of the Excel file. Defaults to
+                None, in which case the Excel file is returned as bytes
+            **options: The options of :func:`tabularxls.main.convert_tabular_in_memory`,
+                such as *multi_index*, *document* or *encoding*
+
+        Returns:
+            bytes or None: The contents of the Excel file, or None if it was written to
+                *destination*
+        """
+        loop = asyncio.get_running_loop()
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        if isinstance(source, (str, Path)):
+            _logger.debug(f"Reading {source}")
+            tex_code = await loop.run_in_executor(None, Path(source).read_bytes)
+        else:
+            tex_code = bytes(source)
+
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        if self.semaphore.locked():
+            _logger.debug(f"Waiting for a free slot, queue depth {self.queue_depth}")
+        try:
+            await self.semaphore.acquire()
+        finally:
+            # also when cancelled while waiting
+            self.queue_depth -= 1
+        self.running += 1
+        try:
+            xls_bytes = await self.run_conversion(tex_code, **options)
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self.semaphore.release()
+
+        if destination is None:
+            return xls_bytes
+        destination = Path(destination)
+        _logger.debug(f"Writing to {destination}")
+        await loop.run_in_executor(None, write_bytes, destination, xls_bytes)
+        return None
+
+
+def write_bytes(filename: Path, contents: bytes):
+    """
+    Write the contents to a file, creating its directory if needed
+    """
+    filename.parent.mkdir(exist_ok=True, parents=True)
+    filename.write_bytes(contents)
+
+
+def get_converter() -> AsyncConverter:
+    """
+    Get the default converter of the running event loop
+
+    Returns:
+        AsyncConverter: The converter, which uses the default executor of the loop
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        return _converters[loop]
+    except KeyError:
+        converter = _converters[loop] = AsyncConverter()
+        return converter
+
+
+async def convert_async(
+    source: Union[str, Path, bytes],
+    destination: Union[str, Path, None] = None,
+    converter: Union[AsyncConverter, None] = None,
+    **options,
+) -> Union[bytes, None]:
+    """
+    Convert a tabular file or LaTeX code without blocking the event loop
+
+    Args:
+        source (str, Path or bytes): Name of the tabular file, or the encoded LaTeX code
+        destination (str or Path, optional): Name of the Excel file. Defaults to None,
+            in which case the Excel file is returned as bytes
+        converter (AsyncConverter, optional): The converter with the executor and the
+            limit of concurrent conversions. Defaults to None, i.e. the default
+            converter of the running event loop
+        **options: The options of :func:`tabularxls.main.convert_tabular_in_memory`
+
+    Returns:
+        bytes or None: The contents of the Excel file, or None if it was written to
+            *destination*
+    """
+    if converter is None:
+        converter = get_converter()
+    return await converter.convert(source, destination, **options)
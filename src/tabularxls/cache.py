@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Cache of converted tabular files, used to skip the conversion of unchanged tabulars
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Union
+
+import tabularxls
+
+_logger = logging.getLogger(__name__)
+
+# default maximum size of the cache directory in MB
+DEFAULT_CACHE_SIZE = 512
+
+
+class ConversionCache:
+    """
+    Cache of Excel files, keyed on the contents of the tabular file and the conversion
+    options
+
+    Args:
+        cache_directory (str or Path): Directory in which the cached Excel files are
+            stored
+        max_size (float, optional): Maximum size of the cache directory in MB. Defaults
+            to :data:`DEFAULT_CACHE_SIZE`
+
+    Notes:
+        * The modification time of a cached file is updated each time it is used. When
+          the cache grows beyond its maximum size, the least recently used files are
+          removed first
+        * The version of this package is part of the key, so a new version never reuses
+          old results
+    """
+
+    def __init__(
+        self, cache_directory: Union[str, Path], max_size: float = DEFAULT_CACHE_SIZE
+    ):
+        """
+        Constructor of the ConversionCache class
+        """
+        self.cache_directory = Path(cache_directory)
+        self.max_size = max_size
+        self.cache_directory.mkdir(exist_ok=True, parents=True)
+
+    @staticmethod
+    def get_key(
+        filename: Union[str, Path],
+        multi_index: bool = False,
+        search_and_replace: Union[dict, None] = None,
+        encoding: str = "utf-8",
+        top_row_merge: bool = False,
+        document: bool = False,
+        convert_numbers: bool = False,
+        decimal: str = ",",
+        macro_rules: Union[str, Path, None] = None,
+    ) -> str:
+        """
+        Get the cache key of a conversion
+
+        Args:
+            filename (str or Path): Name of the tabular file
+            multi_index (bool, optional): Conversion option. Defaults to False
+            search_and_replace (dict, optional): Conversion option. Defaults to None
+            encoding (str, optional): Conversion option. Defaults to "utf-8"
+            top_row_merge (bool, optional): Conversion option. Defaults to False
+            document (bool, optional): Conversion option. Defaults to False
+            convert_numbers (bool, optional): Conversion option. Defaults to False
+            decimal (str, optional): Conversion option. Defaults to ","
+            macro_rules (str or Path, optional): Name of the macro rules file, of which
+                the contents are part of the key. Defaults to None
+
+        Returns:
+            str: The hash of the file contents, the options and the package version
+        """
+        file_hash = hashlib.sha256()
+        with open(filename, "rb") as fp:
+            for block in iter(lambda: fp.read(1 << 20), b""):
+                file_hash.update(block)
+
+        # the search and replace patterns are applied in order, so keep them as a list
+        # of pairs
+        if search_and_replace is not None:
+            search_and_replace = list(search_and_replace.items())
+        if macro_rules is not None:
+            with open(macro_rules, "rb") as fp:
+                macro_rules = hashlib.sha256(fp.read()).hexdigest()
+        options = json.dumps(
+            [
+                tabularxls.__version__,
+                multi_index,
+                search_and_replace,
+                encoding,
+                top_row_merge,
+                document,
+                convert_numbers,
+                decimal,
+                macro_rules,
+            ]
+        )
+        file_hash.update(options.encode("utf-8"))
+
+        return file_hash.hexdigest()
+
+    def get_cache_file(self, key: str) -> Path:
+        """
+        Get the file name under which the result of a conversion is stored
+
+        Args:
+            key (str): The cache key
+
+        Returns:
+            Path: The file name in the cache directory
+        """
+        return self.cache_directory / (key + ".xlsx")
+
+    def fetch(self, key: str, xls_filename: Union[str, Path]) -> bool:
+        """
+        Copy a cached Excel file to its output location
+
+        Args:
+            key (str): The cache key
+            xls_filename (str or Path): Name of the Excel file to create
+
+        Returns:
+            bool: True if the file was found in the cache
+        """
+        cache_file = self.get_cache_file(key)
+        try:
+            os.utime(cache_file)
+        except FileNotFoundError:
+            return False
+
+        xls_filename = Path(xls_filename)
+        xls_filename.parent.mkdir(exist_ok=True, parents=True)
+        try:
+            shutil.copyfile(cache_file, xls_filename)
+        except FileNotFoundError:
+            # evicted by another process in the meanwhile
+            return False
+        _logger.debug(f"Reused {cache_file} for {xls_filename}")
+        return True
+
+    def store(self, key: str, xls_filename: Union[str, Path]):
+        """
+        Store a converted Excel file in the cache
+
+        Args:
+            key (str): The cache key
+            xls_filename (str or Path): Name of the Excel file to store
+        """
+        cache_file = self.get_cache_file(key)
+        # copy to a temporary file first such that other processes never see a partial
+        # file
+        fd, tmp_name = tempfile.mkstemp(dir=self.cache_directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            shutil.copyfile(xls_filename, tmp_name)
+            os.replace(tmp_name, cache_file)
+        finally:
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+        _logger.debug(f"Stored {xls_filename} as {cache_file}")
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used files until the cache is within its maximum size
+        """
+        cache_files = list()
+        total_size = 0
+        for cache_file in self.cache_directory.glob("*.xlsx"):
+            try:
+                stat = cache_file.stat()
+            except FileNotFoundError:
+                continue
+            cache_files.append((stat.st_mtime, stat.st_size, cache_file))
+            total_size += stat.st_size
+
+        max_size = self.max_size * 1024**2
+        for mtime, size, cache_file in sorted(cache_files):
+            if total_size <= max_size:
+                break
+            _logger.debug(f"Evicting {cache_file}")
+            try:
+                cache_file.unlink()
+            except FileNotFoundError:
+                pass
+            total_size -= size
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+Client sending conversions to a running tabular2xls server
+
+The client has the same command line parameters as tabular2xls, but leaves the
+conversions to the warm workers of :mod:`tabularxls.server`. It does not import pandas,
+so it starts quickly.
+"""
+
+import json
+import logging
+import socket
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Union
+
+from tabularxls.main import (
+    get_conversion_options,
+    get_conversions,
+    get_parser,
+    report_conversions,
+    report_profile,
+    setup_logging,
+)
+from tabularxls.profiling import ConversionProfile
+from tabularxls.server import get_default_socket
+
+_logger = logging.getLogger(__name__)
+
+
+class ConversionClient:
+    """
+    Connection to a tabular2xls server
+
+    Args:
+        socket_path (str or Path, optional): The socket of the server. Defaults to
+            :func:`tabularxls.server.get_default_socket`
+
+    Notes:
+        * The requests of a single client are converted one after the other. Use a
+          client per thread to convert files in parallel
+        * The file names are sent as absolute paths, since the server may run in
+          another directory
+    """
+
+    def __init__(self, socket_path: Union[str, Path, None] = None):
+        """
+        Constructor of the ConversionClient class
+        """
+        if socket_path is None:
+            socket_path = get_default_socket()
+        self.socket_path = Path(socket_path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.connect(str(self.socket_path))
+        except OSError:
+            self.sock.close()
+            raise
+        self.file = self.sock.makefile("rwb")
+
+    def convert(
+        self,
+        filename: Union[str, Path],
+        xls_filename: Union[str, Path],
+        profile: Union[ConversionProfile, None] = None,
+        **options,
+    ) -> bool:
+        """
+        Let the server convert a tabular file
+
+        Args:
+            filename (str or Path): Name of the tabular file
+            xls_filename (str or Path): Name of the Excel file
+            profile (ConversionProfile, optional): Profile to which the profile of the
+                conversion by the server is added. Defaults to None, i.e. no profile is
+                collected
+            **options: The conversion options of :func:`tabularxls.main.convert_tabular`
+
+        Returns:
+            bool: True if the Excel file was taken from the cache instead of converted
+
+        Raises:
+            RuntimeError: The server failed to convert the file
+        """
+        request = dict(
+            filename=str(Path(filename).absolute()),
+            xls_filename=str(Path(xls_filename).absolute()),
+            options=options,
+            profile=profile is not None,
+        )
+        self.file.write(json.dumps(request).encode("utf-8") + b"\n")
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            raise RuntimeError(f"Connection closed by the server on {self.socket_path}")
+        response = json.loads(line)
+        if response["status"] != "ok":
+            raise RuntimeError(response["error"])
+        if profile is not None:
+            profile.merge(ConversionProfile.from_dict(response["profile"]))
+        return response["from_cache"]
+
+    def close(self):
+        """
+        Close the connection to the server
+        """
+        self.file.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def convert_files(socket_path, conversions, options, profile=None):
+    """
+    Convert files over a single connection to the server
+
+    Args:
+        socket_path (Path): The socket of the server
+        conversions (list): Pairs of tabular file name and Excel file name
+        options (dict): The conversion options
+        profile (ConversionProfile, optional): Profile to which the profiles of the
+            conversions are added. Defaults to None
+
+    Returns:
+        tuple: The number of files taken from the cache and the errors keyed on the
+            failed tabular files
+    """
+    failures = dict()
+    n_cached = 0
+    with ConversionClient(socket_path) as client:
+        for filename, xls_filename in conversions:
+            try:
+                n_cached += client.convert(
+                    filename, xls_filename, profile=profile, **options
+                )
+            except RuntimeError as err:
+                _logger.error(f"Failed to convert {filename}: {err}")
+                failures[filename] = err
+    return n_cached, failures
+
+
+def parse_args(args):
+    """Parse command line parameters
+
+    Args:
+      args (List[str]): command line parameters as list of strings
+          (for example  ``["--help"]``).
+
+    Returns:
+      :obj:`argparse.Namespace`: command line parameters namespace
+    """
+    parser = get_parser()
+    parser.description = (
+        "Tool to convert latex tabulars into xls files with a running "
+        "tabular2xls-server"
+    )
+    parser.add_argument(
+        "--socket",
+        help="The Unix domain socket of the server. Default is the environment "
+        "variable TABULAR2XLS_SOCKET, or tabular2xls-<uid>.sock in the temporary "
+        "directory",
+        metavar="SOCKET",
+    )
+    parsed_args = parser.parse_args(args)
+    if parsed_args.watch is not None:
+        parser.error("--watch is not supported by the client, use tabular2xls instead")
+    if not parsed_args.filenames:
+        parser.error("the following arguments are required: FILENAME")
+    return parsed_args
+
+
+def main(args):
+    """Send the conversions given on the command line to the server
+
+    The files are sent over *--jobs* connections, such that the server converts them in
+    parallel.
+
+    Args:
+      args (List[str]): command line parameters as list of strings
+          (for example  ``["--verbose", "tabular.tex"]``).
+
+    Returns:
+      int: The number of files which failed to convert and of the patterns which
+      matched no file
+    """
+    args = parse_args(args)
+    setup_logging(args.loglevel)
+
+    unmatched = list()
+    conversions = get_conversions(args, unmatched=unmatched)
+    options = get_conversion_options(args)
+    # the server converts a document within a single worker
+    options.pop("jobs", None)
+    for option in ("cache_directory", "macro_rules"):
+        if option in options:
+            options[option] = str(Path(options[option]).absolute())
+    socket_path = args.socket if args.socket is not None else get_default_socket()
+
+    items = [(str(key), str(value)) for key, value in conversions.items()]
+    n_connections = max(min(args.jobs, len(items)), 1)
+    failures = dict()
+    n_cached = 0
+    # each connection collects its own profile, which are added at the end
+    if args.profile or args.profile_json is not None:
+        profiles = [ConversionProfile() for _ in range(n_connections)]
+    else:
+        profiles = [None] * n_connections
+    start_time = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=n_connections) as executor:
+            results = executor.map(
+                convert_files,
+                [socket_path] * n_connections,
+                [items[i::n_connections] for i in range(n_connections)],
+                [options] * n_connections,
+                profiles,
+            )
+            for n_cached_connection, failures_connection in results:
+                n_cached += n_cached_connection
+                failures.update(failures_connection)
+    except OSError as err:
+        print(
+            f"Can not connect to a tabular2xls server on {socket_path}: {err}. "
+            "Start one with tabular2xls-server"
+        )
+        return len(conversions)
+    duration = time.perf_counter() - start_time
+
+    report_conversions(conversions, failures, n_cached, duration)
+    if profiles[0] is not None:
+        profile = ConversionProfile()
+        for connection_profile in profiles:
+            profile.merge(connection_profile)
+        report_profile(profile, args.profile, args.profile_json)
+
+    _logger.info("Done!")
+
+    return len(failures) + len(unmatched)
+
+
+def run():
+    """Calls :func:`main` passing the CLI arguments extracted from :obj:`sys.argv`
+
+    This function can be used as entry point to create console scripts with setuptools.
+    """
+    if main(sys.argv[1:]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run()
@@ -4,16 +4,37 @@ Tool to convert a LaTeX tabular file into an Excel-file
 """
 
 import argparse
+import glob
+import io
+import json
 import logging
+import os
 import sys
+import time
+from contextlib import nullcontext
+from functools import partial
 from pathlib import Path
 
-from tabularxls import __version__
-from tabularxls.tabular_utils import parse_tabular, write_data_to_sheet_multiindex
+from tabularxls import __version__, profiling
+from tabularxls.cache import ConversionCache, DEFAULT_CACHE_SIZE
 
 _logger = logging.getLogger(__name__)
 
 
+def __getattr__(name):
+    """
+    Import the conversion functions only when they are used
+
+    Importing pandas takes a considerable time, which is not needed for showing the help
+    or checking the arguments
+    """
+    if name in ("parse_tabular", "write_data_to_sheet_multiindex"):
+        from tabularxls import tabular_utils
+
+        return getattr(tabular_utils, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 # create a key-value class
 class KeyValue(argparse.Action):
     # Constructor calling
@@ -27,15 +48,11 @@ class KeyValue(argparse.Action):
             getattr(namespace, self.dest)[key] = value
 
 
-def parse_args(args):
-    """Parse command line parameters
-
-    Args:
-      args (List[str]): command line parameters as list of strings
-          (for example  ``["--help"]``).
+def get_parser():
+    """Get the parser of the command line parameters
 
     Returns:
-      :obj:`argparse.Namespace`: command line parameters namespace
+      :obj:`argparse.ArgumentParser`: the parser with all command line parameters
     """
     parser = argparse.ArgumentParser(
         description="Tool to convert latex tabulars into xls files"
@@ -45,10 +62,17 @@ def parse_args(args):
         action="version",
         version="tabularxls {ver}".format(ver=__version__),
     )
-    parser.add_argument("filename", help="Tabular file name", metavar="FILENAME")
+    parser.add_argument(
+        "filenames",
+        help="Tabular file names or glob patterns such as 'tabellen/*.tex'. Optional "
+        "with --watch",
+        metavar="FILENAME",
+        nargs="*",
+    )
     parser.add_argument(
         "--output_filename",
-        help="Name of the xls output file. Must have extension .xlsx",
+        help="Name of the xls output file. Must have extension .xlsx. Only allowed for "
+        "a single FILENAME",
         metavar="OUTPUT_FILENAME",
     )
     parser.add_argument(
@@ -97,7 +121,110 @@ def parse_args(args):
         help="Forceer dat we de bovenste rij als een multirow beschouwen",
         action="store_true",
     )
-    return parser.parse_args(args)
+    parser.add_argument(
+        "--convert_numbers",
+        help="Write the columns with only numbers, such as 12,5 or 1 234 or 45%%, as "
+        "numbers instead of text",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--decimal",
+        help="Decimal separator of the numbers, ',' or '.'. Default is ','",
+        metavar="DECIMAL",
+        choices=[",", "."],
+        default=",",
+    )
+    parser.add_argument(
+        "--dtype_backend",
+        help="Store the cells as Python strings with 'numpy' or in Arrow arrays with "
+        "'pyarrow', which needs less memory and replaces the aliases and search "
+        "patterns with the Arrow compute kernels. Default is numpy",
+        choices=["numpy", "pyarrow"],
+        default="numpy",
+    )
+    parser.add_argument(
+        "--macro_rules",
+        help="Configuration file with rules for the LaTeX macros in the cells, which "
+        "extend or replace the default rules. Each rule strips, unwraps, replaces or "
+        "formats a macro",
+        metavar="MACRO_RULES_FILE",
+    )
+    parser.add_argument(
+        "--document",
+        help="Treat each FILENAME as a LaTeX document and write each of its tabulars "
+        "to a sheet of one Excel file",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="Number of processes used to convert the files, or to parse the tabulars "
+        "of a document with --document. Default is 1",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--cache_directory",
+        help="Directory in which converted files are cached, such that unchanged "
+        "tabulars are not converted again. Defaults to the environment variable "
+        "TABULAR2XLS_CACHE_DIRECTORY. If not set, no cache is used",
+        metavar="CACHE_DIRECTORY",
+        default=os.environ.get("TABULAR2XLS_CACHE_DIRECTORY"),
+    )
+    parser.add_argument(
+        "--cache_size",
+        help="Maximum size of the cache directory in MB. "
+        f"Default is {DEFAULT_CACHE_SIZE}",
+        type=float,
+        default=DEFAULT_CACHE_SIZE,
+    )
+    parser.add_argument(
+        "--no_cache",
+        "--no-cache",
+        help="Do not use the cache, even if a cache directory is given",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--watch",
+        help="Keep running and convert the tabular files in WATCH_DIRECTORY each time "
+        "they change",
+        metavar="WATCH_DIRECTORY",
+    )
+    parser.add_argument(
+        "--polling",
+        help="Poll the directory for changes in watch mode, instead of using inotify",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--profile",
+        help="Print the time spent in each stage of the conversions and the number of "
+        "rows, cells and formats",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--profile_json",
+        help="Write the time spent in each stage of the conversions and the counts to "
+        "PROFILE_FILE as JSON",
+        metavar="PROFILE_FILE",
+    )
+    return parser
+
+
+def parse_args(args):
+    """Parse command line parameters
+
+    Args:
+      args (List[str]): command line parameters as list of strings
+          (for example  ``["--help"]``).
+
+    Returns:
+      :obj:`argparse.Namespace`: command line parameters namespace
+    """
+    parser = get_parser()
+    parsed_args = parser.parse_args(args)
+    if not parsed_args.filenames and parsed_args.watch is None:
+        parser.error("the following arguments are required: FILENAME")
+    return parsed_args
 
 
 def setup_logging(loglevel):
@@ -114,38 +241,57 @@ def setup_logging(loglevel):
     )
 
 
-def main(args):
-    """Wrapper allowing :func:`fib` to be called with string arguments in a CLI fashion
-
-    Instead of returning the value from :func:`fib`, it prints the result to the
-    ``stdout`` in a nicely formatted message.
+def get_input_filenames(patterns, unmatched=None):
+    """
+    Get the input files belonging to the file names and glob patterns given on the
+    command line
 
     Args:
-      args (List[str]): command line parameters as list of strings
-          (for example  ``["--verbose", "42"]``).
+        patterns (list): File names or glob patterns
+        unmatched (list, optional): List to which the glob patterns which match no
+            file are added. Defaults to None
+
+    Returns:
+        list: The input files as Path objects, without duplicates
     """
-    args = parse_args(args)
-    setup_logging(args.loglevel)
+    filenames = list()
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern, recursive=True))
+            if not matches:
+                _logger.error(f"No files found matching {pattern}")
+                if unmatched is not None:
+                    unmatched.append(pattern)
+        else:
+            matches = [pattern]
+        for match in matches:
+            filename = Path(match)
+            if filename not in filenames:
+                filenames.append(filename)
+    return filenames
 
-    filename = Path(args.filename)
 
-    search_and_replace = {
-        r"\$sharp\$": "#",
-        r"\$cdot\$": ".",
-        r"\$ast\$": "*",
-        r"\$\^ast\$": "*",
-    }
-    if args.search_and_replace is not None:
-        for k, v in args.search_and_replace.items():
-            search_and_replace[k] = v
+def get_output_filename(filename, output_filename=None, output_directory=None):
+    """
+    Get the name of the Excel file to which a tabular file is converted
+
+    Args:
+        filename (Path): Name of the tabular file
+        output_filename (str, optional): Name of the Excel file. Defaults to the tabular
+            file name with .xlsx extension
+        output_directory (str, optional): Directory to write the Excel file to. Defaults
+            to the directory of the output file name
 
-    if args.output_filename is None:
+    Returns:
+        Path: Name of the Excel file
+    """
+    if output_filename is None:
         xls_filename = filename.with_suffix(".xlsx")
     else:
-        xls_filename = Path(args.output_filename)
+        xls_filename = Path(output_filename)
 
-    if args.output_directory is not None:
-        output_directory = Path(args.output_directory)
+    if output_directory is not None:
+        output_directory = Path(output_directory)
         xls_file_base = xls_filename.stem + xls_filename.suffix
         xls_filename = output_directory / Path(xls_file_base)
 
@@ -154,27 +300,463 @@ def main(args):
             "Output filename does not have .xlsx extension. Please correct"
         )
 
+    return xls_filename
+
+
+def convert_tabular(
+    filename,
+    xls_filename,
+    multi_index=False,
+    search_and_replace=None,
+    encoding="utf-8",
+    top_row_merge=False,
+    convert_numbers=False,
+    decimal=",",
+    document=False,
+    jobs=1,
+    cache_directory=None,
+    cache_size=DEFAULT_CACHE_SIZE,
+    macro_rules=None,
+    dtype_backend="numpy",
+):
+    """
+    Convert a single tabular file or all tabulars of a LaTeX document into an Excel file
+
+    Args:
+        filename (Path): Name of the tabular file
+        xls_filename (Path): Name of the Excel file
+        multi_index (bool, optional): Convert the index into a multi index. Defaults to
+            False
+        search_and_replace (dict, optional): The search and replace strings. Defaults to
+            None
+        encoding (str, optional): Encoding of the tabular file. Defaults to "utf-8"
+        top_row_merge (bool, optional): Merge the top rows. Defaults to False
+        convert_numbers (bool, optional): Convert the columns with numbers to numbers.
+            Defaults to False
+        decimal (str, optional): The decimal separator of the numbers. Defaults to ","
+        document (bool, optional): The file is a LaTeX document of which each tabular is
+            written to its own sheet. Defaults to False
+        jobs (int, optional): Number of processes used to parse the tabulars of a
+            document. Defaults to 1
+        cache_directory (str, optional): Directory with cached conversions. Defaults to
+            None, i.e. no cache
+        cache_size (float, optional): Maximum size of the cache directory in MB
+        macro_rules (str or Path, optional): Name of the file with the macro rules, see
+            :meth:`tabularxls.tabular_utils.MacroRules.read`. Defaults to None, i.e. the
+            default rules
+        dtype_backend (str, optional): The dtype backend of the parsed cells, "numpy" or
+            "pyarrow". It does not change the Excel file, so it is not part of the cache
+            key. Defaults to "numpy"
+
+    Returns:
+        bool: True if the Excel file was taken from the cache instead of converted
+    """
+    options = dict(
+        multi_index=multi_index,
+        search_and_replace=search_and_replace,
+        encoding=encoding,
+        top_row_merge=top_row_merge,
+        convert_numbers=convert_numbers,
+        decimal=decimal,
+    )
+    profiling.count("files")
+    cache = cache_key = None
+    if cache_directory is not None:
+        with profiling.stage("cache"):
+            cache = ConversionCache(cache_directory, max_size=cache_size)
+            cache_key = cache.get_key(
+                filename, document=document, macro_rules=macro_rules, **options
+            )
+            from_cache = cache.fetch(cache_key, xls_filename)
+        if from_cache:
+            _logger.info(f"Unchanged {filename} ->> {xls_filename}")
+            profiling.count("cached_files")
+            return True
+
+    from tabularxls import tabular_utils
+
     _logger.info(f"Converting {filename} ->> {xls_filename}")
-    tabular_df = parse_tabular(
-        input_filename=filename,
+    if macro_rules is not None:
+        options["macro_rules"] = tabular_utils.MacroRules.from_file(macro_rules)
+    options["dtype_backend"] = dtype_backend
+    if document:
+        tabular_dfs = tabular_utils.parse_tabular_document(
+            input_filename=filename, jobs=jobs, **options
+        )
+    else:
+        tabular_df = tabular_utils.parse_tabular(input_filename=filename, **options)
+
+    xls_filename.parent.mkdir(exist_ok=True, parents=True)
+    _logger.debug(f"Writing to {xls_filename}")
+    if document:
+        tabular_utils.write_data_to_sheets(tabular_dfs, xls_filename)
+    else:
+        tabular_utils.write_data_to_sheet_multiindex(tabular_df, xls_filename)
+
+    if cache is not None:
+        with profiling.stage("cache"):
+            cache.store(cache_key, xls_filename)
+
+    return False
+
+
+def convert_tabular_in_memory(
+    source,
+    output=None,
+    multi_index=False,
+    search_and_replace=None,
+    encoding="utf-8",
+    top_row_merge=False,
+    convert_numbers=False,
+    decimal=",",
+    document=False,
+    jobs=1,
+    macro_rules=None,
+    dtype_backend="numpy",
+):
+    """
+    Convert a tabular or all tabulars of a LaTeX document in memory, without reading or
+    writing any file
+
+    Args:
+        source (str, bytes or file object): The LaTeX code, the LaTeX code encoded as
+            bytes or a text or binary file object to read it from
+        output (file object, optional): Binary file object to write the Excel file to,
+            such as a *io.BytesIO*. Defaults to None, in which case the Excel file is
+            returned as bytes
+        multi_index (bool, optional): Convert the index into a multi index. Defaults to
+            False
+        search_and_replace (dict, optional): The search and replace strings. Defaults to
+            None
+        encoding (str, optional): Encoding of the bytes or binary file object. Defaults
+            to "utf-8"
+        top_row_merge (bool, optional): Merge the top rows. Defaults to False
+        convert_numbers (bool, optional): Convert the columns with numbers to numbers.
+            Defaults to False
+        decimal (str, optional): The decimal separator of the numbers. Defaults to ","
+        document (bool, optional): The source is a LaTeX document of which each tabular
+            is written to its own sheet. Defaults to False
+        jobs (int, optional): Number of processes used to parse the tabulars of a
+            document. Defaults to 1
+        macro_rules (MacroRules, str or Path, optional): The rules of the macros in the
+            cells, or the name of the file with the rules. Defaults to None, i.e. the
+            default rules
+        dtype_backend (str, optional): The dtype backend of the parsed cells, "numpy" or
+            "pyarrow". Defaults to "numpy"
+
+    Notes:
+        * A *str* source is the LaTeX code itself, not the name of a file. Use
+          :func:`convert_tabular` to convert files
+
+    Returns:
+        bytes or None: The contents of the Excel file, or None if it was written to
+            *output*
+    """
+    from tabularxls import tabular_utils
+
+    profiling.count("files")
+    if isinstance(macro_rules, (str, Path)):
+        macro_rules = tabular_utils.MacroRules.from_file(macro_rules)
+    options = dict(
+        multi_index=multi_index,
+        search_and_replace=search_and_replace,
+        top_row_merge=top_row_merge,
+        convert_numbers=convert_numbers,
+        decimal=decimal,
+        macro_rules=macro_rules,
+        dtype_backend=dtype_backend,
+    )
+    source = tabular_utils.get_text_stream(source, encoding=encoding)
+    if document:
+        tabular_dfs = tabular_utils.parse_tabular_document(source, jobs=jobs, **options)
+    else:
+        tabular_dfs = {"Sheet": tabular_utils.parse_tabular(source, **options)}
+
+    xls_buffer = io.BytesIO() if output is None else output
+    tabular_utils.write_data_to_sheets(tabular_dfs, xls_buffer)
+    if output is None:
+        return xls_buffer.getvalue()
+    return None
+
+
+def get_conversions(args, unmatched=None):
+    """
+    Get the conversions requested on the command line
+
+    Args:
+        args (:obj:`argparse.Namespace`): The command line parameters
+        unmatched (list, optional): List to which the glob patterns which match no
+            file are added. Defaults to None
+
+    Raises:
+        ValueError: Two tabular files are converted to the same Excel file, for
+            instance files with the same name in different directories written to one
+            output directory
+
+    Returns:
+        dict: The names of the Excel files keyed on the names of the tabular files
+    """
+    filenames = get_input_filenames(args.filenames, unmatched=unmatched)
+    if args.output_filename is not None and (len(filenames) > 1 or args.watch):
+        raise ValueError(
+            "An output filename can only be given for a single input file. "
+            "Use --output_directory instead"
+        )
+
+    conversions = dict()
+    for filename in filenames:
+        conversions[filename] = get_output_filename(
+            filename,
+            output_filename=args.output_filename,
+            output_directory=args.output_directory,
+        )
+
+    # the pool would write the same Excel file from several processes at once
+    sources = dict()
+    for filename, xls_filename in conversions.items():
+        other = sources.setdefault(xls_filename.resolve(), filename)
+        if other != filename:
+            raise ValueError(
+                f"{other} and {filename} are both converted to {xls_filename}. "
+                "Convert them to separate output directories"
+            )
+    return conversions
+
+
+def get_conversion_options(args):
+    """
+    Get the options of :func:`convert_tabular` given on the command line
+
+    Args:
+        args (:obj:`argparse.Namespace`): The command line parameters
+
+    Returns:
+        dict: The conversion options
+    """
+    search_and_replace = {
+        r"\$sharp\$": "#",
+        r"\$cdot\$": ".",
+        r"\$ast\$": "*",
+        r"\$\^ast\$": "*",
+    }
+    if args.search_and_replace is not None:
+        for k, v in args.search_and_replace.items():
+            search_and_replace[k] = v
+
+    options = dict(
         multi_index=args.multi_index,
         search_and_replace=search_and_replace,
         encoding=args.encoding,
         top_row_merge=args.top_row_merge,
+        convert_numbers=args.convert_numbers,
+        decimal=args.decimal,
     )
+    if args.macro_rules is not None:
+        options["macro_rules"] = args.macro_rules
+    if args.dtype_backend != "numpy":
+        options["dtype_backend"] = args.dtype_backend
+    if args.document:
+        options["document"] = True
+        options["jobs"] = args.jobs
+    if args.cache_directory is not None and not args.no_cache:
+        options["cache_directory"] = args.cache_directory
+        options["cache_size"] = args.cache_size
+    return options
+
+
+def report_conversions(conversions, failures, n_cached, duration):
+    """
+    Print a summary of the conversions in case more than one file was converted or a
+    conversion failed
+
+    Args:
+        conversions (dict): The requested conversions
+        failures (dict): The errors of the failed conversions keyed on the tabular file
+        n_cached (int): Number of files taken from the cache
+        duration (float): Duration of all conversions in seconds
+    """
+    n_converted = len(conversions) - len(failures)
+    if len(conversions) > 1 or failures:
+        print(
+            f"Converted {n_converted} of {len(conversions)} files in {duration:.2f} s "
+            f"({len(conversions) / max(duration, 1e-9):.1f} files/s, "
+            f"{n_cached} unchanged files taken from the cache)"
+        )
+        for filename, err in failures.items():
+            print(f"FAILED {filename}: {err}")
+
+
+def report_profile(profile, print_table=True, json_filename=None):
+    """
+    Report the profile of the conversions
+
+    Args:
+        profile (:obj:`tabularxls.profiling.ConversionProfile`): The profile
+        print_table (bool, optional): Print the profile as a table. Defaults to True
+        json_filename (str, optional): Name of the file to write the profile to as JSON.
+            Defaults to None
+    """
+    if print_table:
+        print(profile.format_table())
+    if json_filename is not None:
+        with open(json_filename, "w") as fp:
+            json.dump(profile.to_dict(), fp, indent=2)
+        _logger.info(f"Wrote profile to {json_filename}")
+
+
+def watch_directory(
+    directory,
+    output_directory=None,
+    polling=False,
+    stop_event=None,
+    **options,
+):
+    """
+    Convert the tabular files of a directory each time they change, until interrupted
+
+    Args:
+        directory (str): The directory to watch
+        output_directory (str, optional): Directory to write the Excel files to.
+            Defaults to the watched directory
+        polling (bool, optional): Poll the directory instead of using inotify. Defaults
+            to False
+        stop_event (threading.Event, optional): Stop watching when this event is set.
+            Defaults to None
+        **options: The conversion options passed on to :func:`convert_tabular`
+
+    Notes:
+        * pandas and the color tables are loaded before watching starts, such that each
+          conversion runs in a warm process. The time of each conversion is reported
+    """
+    from tabularxls.tabular_utils import get_color_index
+    from tabularxls.watch import watch_changes
+
+    get_color_index()
+
+    print(f"Watching {directory} for changes. Press Ctrl-C to stop")
+    try:
+        for filenames in watch_changes(
+            directory, polling=polling, stop_event=stop_event
+        ):
+            for filename in filenames:
+                xls_filename = get_output_filename(
+                    filename, output_directory=output_directory
+                )
+                start_time = time.perf_counter()
+                try:
+                    from_cache = convert_tabular(filename, xls_filename, **options)
+                except Exception as err:
+                    _logger.error(f"Failed to convert {filename}: {err}")
+                    continue
+                duration = time.perf_counter() - start_time
+                print(
+                    f"Converted {filename} ->> {xls_filename} "
+                    f"in {duration * 1000:.0f} ms"
+                    + (" (unchanged, taken from the cache)" if from_cache else "")
+                )
+    except KeyboardInterrupt:
+        print("Stopped watching")
+
+
+def main(args):
+    """Wrapper allowing :func:`convert_tabular` to be called with string arguments in a
+    CLI fashion
+
+    All files are converted within this process, or distributed over a pool of *--jobs*
+    processes. With *--document*, the files are converted one by one and the pool is
+    used for the tabulars of each document. A conversion failure is reported for the
+    file and does not stop the other conversions. With *--watch*, the files of the
+    watched directory are converted each time they change after the given files have
+    been converted. With *--profile*, the time spent in each stage of the conversions is
+    reported, also for the conversions of the pool.
+
+    Args:
+      args (List[str]): command line parameters as list of strings
+          (for example  ``["--verbose", "tabular.tex"]``).
+
+    Returns:
+      int: The number of files which failed to convert and of the patterns which
+      matched no file
+    """
+    args = parse_args(args)
+    setup_logging(args.loglevel)
+
+    unmatched = list()
+    conversions = get_conversions(args, unmatched=unmatched)
+    options = get_conversion_options(args)
+
+    failures = dict()
+    n_cached = 0
+    profile_requested = args.profile or args.profile_json is not None
+    start_time = time.perf_counter()
+    if profile_requested:
+        profile_context = profiling.profile_conversion()
+    else:
+        profile_context = nullcontext()
+    with profile_context as profile:
+        if args.jobs > 1 and len(conversions) > 1 and not args.document:
+            from concurrent.futures import ProcessPoolExecutor
+
+            # with a profile, each worker returns the profile of its conversion as well
+            if profile is None:
+                convert = convert_tabular
+            else:
+                convert = partial(profiling.run_profiled, convert_tabular)
+            with ProcessPoolExecutor(
+                max_workers=args.jobs,
+                initializer=setup_logging,
+                initargs=(args.loglevel,),
+            ) as executor:
+                futures = {
+                    filename: executor.submit(
+                        convert, filename, xls_filename, **options
+                    )
+                    for filename, xls_filename in conversions.items()
+                }
+                for filename, future in futures.items():
+                    try:
+                        from_cache = future.result()
+                    except Exception as err:
+                        _logger.error(f"Failed to convert {filename}: {err}")
+                        failures[filename] = err
+                        continue
+                    if profile is not None:
+                        from_cache, worker_profile = from_cache
+                        profile.merge(worker_profile)
+                    n_cached += from_cache
+        else:
+            for filename, xls_filename in conversions.items():
+                try:
+                    n_cached += convert_tabular(filename, xls_filename, **options)
+                except Exception as err:
+                    _logger.error(f"Failed to convert {filename}: {err}")
+                    failures[filename] = err
+    duration = time.perf_counter() - start_time
+
+    report_conversions(conversions, failures, n_cached, duration)
+    if profile is not None:
+        report_profile(profile, args.profile, args.profile_json)
+
+    if args.watch is not None:
+        watch_directory(
+            args.watch,
+            output_directory=args.output_directory,
+            polling=args.polling,
+            **options,
+        )
 
-    xls_filename.parent.mkdir(exist_ok=True, parents=True)
-    _logger.debug(f"Writing to {xls_filename}")
-    write_data_to_sheet_multiindex(tabular_df, xls_filename)
     _logger.info(f"Done!")
 
+    return len(failures) + len(unmatched)
+
 
 def run():
     """Calls :func:`main` passing the CLI arguments extracted from :obj:`sys.argv`
 
     This function can be used as entry point to create console scripts with setuptools.
     """
-    main(sys.argv[1:])
+    if main(sys.argv[1:]):
+        sys.exit(1)
 
 
 if __name__ == "__main__":
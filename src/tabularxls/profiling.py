@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""
+Timers of the stages of a conversion and counts of what was converted
+
+A profile is only collected within :func:`profile_conversion`. Outside of it, the timers
+and counters of the conversion functions do nothing, so they do not slow down a normal
+conversion::
+
+    with profile_conversion() as profile:
+        convert_tabular(Path("tabular.tex"), Path("tabular.xlsx"))
+    print(profile.format_table())
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Iterable, Iterator, Union
+
+# the stages in the order of a conversion, used to order the table
+STAGES = (
+    "cache",
+    "read",
+    "clean",
+    "build",
+    "top_row_merge",
+    "substitute",
+    "convert_numbers",
+    "widths",
+    "write",
+)
+
+_current_profile = contextvars.ContextVar("tabularxls_profile", default=None)
+
+
+class ConversionProfile:
+    """
+    Time spent per stage of the conversion and counts of rows, cells and formats
+
+    Notes:
+        * The time of a stage excludes the time of the stages nested in it, such that
+          the times add up to the total time of the conversion
+        * Profiles of conversions in other processes are added with :meth:`merge`, in
+          which case the times are the summed times of all processes
+    """
+
+    def __init__(self):
+        """
+        Constructor of the ConversionProfile class
+        """
+        self.timings = dict()
+        self.counts = dict()
+        # time spent in nested stages, one entry per running stage
+        self._nested = list()
+
+    def start(self) -> float:
+        """
+        Start timing a stage
+
+        Returns:
+            float: The start time, to be passed on to :meth:`stop`
+        """
+        self._nested.append(0.0)
+        return time.perf_counter()
+
+    def stop(self, name: str, start: float):
+        """
+        Stop timing a stage
+
+        Args:
+            name (str): Name of the stage
+            start (float): The start time as returned by :meth:`start`
+        """
+        elapsed = time.perf_counter() - start
+        own_time = elapsed - self._nested.pop()
+        self.timings[name] = self.timings.get(name, 0.0) + own_time
+        if self._nested:
+            self._nested[-1] += elapsed
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Time the code within the context as stage *name*
+
+        Args:
+            name (str): Name of the stage
+        """
+        start = self.start()
+        try:
+            yield
+        finally:
+            self.stop(name, start)
+
+    def timed(self, name: str, function: Callable) -> Callable:
+        """
+        Time each call of a function as stage *name*
+
+        Args:
+            name (str): Name of the stage
+            function (callable): The function to time
+
+        Returns:
+            callable: The timed function
+        """
+
+        @wraps(function)
+        def timed_function(*args, **kwargs):
+            start = self.start()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.stop(name, start)
+
+        return timed_function
+
+    def timed_iterator(self, name: str, iterable: Iterable) -> Iterator:
+        """
+        Time the production of each item of an iterable as stage *name*
+
+        Args:
+            name (str): Name of the stage
+            iterable (iterable): The iterable to time, such as a generator reading a
+                file
+
+        Yields:
+            The items of the iterable
+        """
+        iterator = iter(iterable)
+        while True:
+            start = self.start()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.stop(name, start)
+            yield item
+
+    def count(self, name: str, number: int = 1):
+        """
+        Add to a count
+
+        Args:
+            name (str): Name of the count
+            number (int, optional): The number to add. Defaults to 1
+        """
+        self.counts[name] = self.counts.get(name, 0) + number
+
+    def merge(self, other: "ConversionProfile"):
+        """
+        Add the times and counts of another profile
+
+        Args:
+            other (ConversionProfile): The profile to add, for instance of a conversion
+                in another process
+        """
+        for name, seconds in other.timings.items():
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+        for name, number in other.counts.items():
+            self.count(name, number)
+
+    @property
+    def total(self) -> float:
+        """
+        float: The total time of all stages in seconds
+        """
+        return sum(self.timings.values())
+
+    def get_stages(self) -> list:
+        """
+        Get the names of the timed stages
+
+        Returns:
+            list: The stages in the order of a conversion, followed by any other stages
+        """
+        stages = [name for name in STAGES if name in self.timings]
+        stages += [name for name in self.timings if name not in STAGES]
+        return stages
+
+    def to_dict(self) -> dict:
+        """
+        Get the profile as a dictionary which can be stored as JSON
+
+        Returns:
+            dict: The times in seconds per stage, the total time and the counts
+        """
+        return dict(
+            timings={name: self.timings[name] for name in self.get_stages()},
+            total=self.total,
+            counts=dict(self.counts),
+        )
+
+    @classmethod
+    def from_dict(cls, profile_dict: dict) -> "ConversionProfile":
+        """
+        Create a profile from its dictionary
+
+        Args:
+            profile_dict (dict): The profile as returned by :meth:`to_dict`
+
+        Returns:
+            ConversionProfile: The profile
+        """
+        profile = cls()
+        profile.timings.update(profile_dict["timings"])
+        profile.counts.update(profile_dict["counts"])
+        return profile
+
+    def format_table(self) -> str:
+        """
+        Format the profile as a table
+
+        Returns:
+            str: The times per stage with their share of the total, followed by the
+                counts
+        """
+        total = self.total
+        lines = [f"{'stage':16s} {'time [ms]':>10s} {'share':>7s}"]
+        for name in self.get_stages():
+            seconds = self.timings[name]
+            share = seconds / total if total > 0 else 0
+            lines.append(f"{name:16s} {seconds * 1000:10.1f} {share:7.1%}")
+        lines.append(f"{'total':16s} {total * 1000:10.1f}")
+        lines.append("")
+        for name, number in self.counts.items():
+            lines.append(f"{name:16s} {number:10d}")
+        return "\n".join(lines)
+
+
+def get_profile() -> Union[ConversionProfile, None]:
+    """
+    Get the profile which is being collected
+
+    Returns:
+        ConversionProfile or None: The profile, or None outside of
+            :func:`profile_conversion`
+    """
+    return _current_profile.get()
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time the code within the context as stage *name* of the current profile, if any
+
+    Args:
+        name (str): Name of the stage
+    """
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+    else:
+        with profile.stage(name):
+            yield
+
+
+def count(name: str, number: int = 1):
+    """
+    Add to a count of the current profile, if any
+
+    Args:
+        name (str): Name of the count
+        number (int, optional): The number to add. Defaults to 1
+    """
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.count(name, number)
+
+
+@contextmanager
+def profile_conversion(callback: Union[Callable, None] = None):
+    """
+    Collect a profile of the conversions within the context
+
+    Args:
+        callback (callable, optional): Function which is called with the profile when
+            the context is left. Defaults to None
+
+    Yields:
+        ConversionProfile: The profile, which is complete once the context is left
+    """
+    profile = ConversionProfile()
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _current_profile.reset(token)
+        if callback is not None:
+            callback(profile)
+
+
+def run_profiled(function: Callable, *args, **kwargs) -> tuple:
+    """
+    Call a function while collecting a profile, such that a profile can be collected in
+    another process
+
+    Args:
+        function (callable): The function to call
+        *args: The positional arguments of the function
+        **kwargs: The keyword arguments of the function
+
+    Returns:
+        tuple: The result of the function and its profile
+    """
+    with profile_conversion() as profile:
+        result = function(*args, **kwargs)
+    return result, profile
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+"""
+Server keeping a pool of warm worker processes which convert tabular files on request
+
+The requests arrive over a Unix domain socket, one JSON object per line, such that each
+conversion is done by a process which has already imported pandas and built the color
+tables. Use :mod:`tabularxls.client` to send them
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Union
+
+from tabularxls import __version__, profiling
+from tabularxls.main import convert_tabular, setup_logging
+
+_logger = logging.getLogger(__name__)
+
+# options of convert_tabular which can be given with a request. The documents are parsed
+# in the worker itself, the pool already converts the requests in parallel
+REQUEST_OPTIONS = (
+    "multi_index",
+    "search_and_replace",
+    "encoding",
+    "top_row_merge",
+    "convert_numbers",
+    "decimal",
+    "document",
+    "cache_directory",
+    "cache_size",
+    "macro_rules",
+    "dtype_backend",
+)
+
+
+def get_default_socket() -> Path:
+    """
+    Get the socket on which the server listens when no socket is given
+
+    Returns:
+        Path: The socket given by the environment variable TABULAR2XLS_SOCKET, or a
+        socket of the current user in the temporary directory
+    """
+    socket_path = os.environ.get("TABULAR2XLS_SOCKET")
+    if socket_path is None:
+        socket_path = Path(tempfile.gettempdir()) / f"tabular2xls-{os.getuid()}.sock"
+    return Path(socket_path)
+
+
+def warm_up(loglevel=None):
+    """
+    Prepare a worker process for conversions by importing pandas and building the color
+    tables
+
+    Args:
+        loglevel (int, optional): The log level of the worker. Defaults to None, i.e. no
+            logging is set up
+    """
+    if loglevel is not None:
+        setup_logging(loglevel)
+
+    from tabularxls.tabular_utils import get_color_index
+
+    get_color_index()
+
+
+def convert_request(
+    filename: str, xls_filename: str, options: dict, profile: bool = False
+) -> dict:
+    """
+    Convert a tabular file in a worker process
+
+    Args:
+        filename (str): Name of the tabular file
+        xls_filename (str): Name of the Excel file
+        options (dict): The conversion options of the request
+        profile (bool, optional): Add the profile of the conversion to the response.
+            Defaults to False
+
+    Returns:
+        dict: The response to the request
+    """
+    options = {key: options[key] for key in REQUEST_OPTIONS if key in options}
+    start_time = time.perf_counter()
+    try:
+        if profile:
+            from_cache, conversion_profile = profiling.run_profiled(
+                convert_tabular, Path(filename), Path(xls_filename), **options
+            )
+        else:
+            from_cache = convert_tabular(Path(filename), Path(xls_filename), **options)
+    except Exception as err:
+        _logger.error(f"Failed to convert {filename}: {err}")
+        return dict(status="error", error=str(err))
+    response = dict(
+        status="ok", from_cache=from_cache, duration=time.perf_counter() - start_time
+    )
+    if profile:
+        response["profile"] = conversion_profile.to_dict()
+    return response
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """
+    Handle the conversion requests of a single connection
+
+    Notes:
+        * Each line of the connection is a request with the keys *filename*,
+          *xls_filename* and *options*, and optionally *profile*. Each response is a
+          line with the key *status*, being "ok" or "error", and either *from_cache*,
+          *duration* and the *profile* if requested, or *error*
+        * The requests of a connection are converted one after the other, the requests
+          of different connections in parallel
+    """
+
+    def handle(self):
+        """
+        Answer the requests until the client closes the connection
+        """
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                future = self.server.executor.submit(
+                    convert_request,
+                    request["filename"],
+                    request["xls_filename"],
+                    request.get("options", dict()),
+                    request.get("profile", False),
+                )
+                response = future.result()
+            except Exception as err:
+                _logger.error(f"Failed to handle request {line!r}: {err}")
+                response = dict(status="error", error=str(err))
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class ConversionServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Server listening on a Unix domain socket which passes the conversion requests to a
+    pool of warm workers
+
+    Args:
+        socket_path (str or Path, optional): The socket to listen on. Defaults to
+            :func:`get_default_socket`
+        jobs (int, optional): Number of worker processes. Defaults to the number of CPUs
+        loglevel (int, optional): The log level of the workers. Defaults to None, i.e.
+            no logging is set up
+
+    Notes:
+        * All workers are started and warmed up before the server accepts requests
+        * A socket left behind by a server which did not stop cleanly is removed. If
+          another server still listens on the socket, a RuntimeError is raised
+        * The socket is only accessible by the current user and is removed when the
+          server is closed
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        socket_path: Union[str, Path, None] = None,
+        jobs: Union[int, None] = None,
+        loglevel: Union[int, None] = None,
+    ):
+        """
+        Constructor of the ConversionServer class
+        """
+        if socket_path is None:
+            socket_path = get_default_socket()
+        self.socket_path = Path(socket_path)
+        if jobs is None:
+            jobs = os.cpu_count() or 1
+        self.jobs = jobs
+
+        remove_stale_socket(self.socket_path)
+        super().__init__(str(self.socket_path), RequestHandler)
+        os.chmod(self.socket_path, 0o600)
+
+        self.executor = ProcessPoolExecutor(
+            max_workers=jobs, initializer=warm_up, initargs=(loglevel,)
+        )
+        # the workers are only started on submission, so start them all now
+        for future in [self.executor.submit(os.getpid) for _ in range(jobs)]:
+            future.result()
+        _logger.info(f"Listening on {self.socket_path} with {jobs} workers")
+
+    def server_close(self):
+        """
+        Stop the workers and remove the socket
+        """
+        super().server_close()
+        self.executor.shutdown()
+        try:
+            self.socket_path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def remove_stale_socket(socket_path: Path):
+    """
+    Remove a socket of which the server is no longer running
+
+    Args:
+        socket_path (Path): The socket
+
+    Raises:
+        RuntimeError: Another server is listening on the socket
+    """
+    if not socket_path.exists():
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(str(socket_path))
+        except (ConnectionRefusedError, FileNotFoundError):
+            _logger.info(f"Removing stale socket {socket_path}")
+            socket_path.unlink(missing_ok=True)
+            return
+    raise RuntimeError(f"A tabular2xls server is already listening on {socket_path}")
+
+
+def parse_args(args):
+    """Parse command line parameters
+
+    Args:
+      args (List[str]): command line parameters as list of strings
+          (for example  ``["--help"]``).
+
+    Returns:
+      :obj:`argparse.Namespace`: command line parameters namespace
+    """
+    parser = argparse.ArgumentParser(
+        description="Server converting latex tabulars into xls files for "
+        "tabular2xls-client"
+    )
+    parser.add_argument(
+        "--version",
+        action="version",
+        version="tabularxls {ver}".format(ver=__version__),
+    )
+    parser.add_argument(
+        "--socket",
+        help="The Unix domain socket to listen on. Default is the environment "
+        "variable TABULAR2XLS_SOCKET, or tabular2xls-<uid>.sock in the temporary "
+        "directory",
+        metavar="SOCKET",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="Number of worker processes. Default is the number of CPUs",
+        type=int,
+        metavar="JOBS",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        dest="loglevel",
+        help="set loglevel to INFO",
+        action="store_const",
+        const=logging.INFO,
+        default=logging.WARNING,
+    )
+    parser.add_argument(
+        "-vv",
+        "--debug",
+        dest="loglevel",
+        help="set loglevel to DEBUG",
+        action="store_const",
+        const=logging.DEBUG,
+    )
+    parsed_args = parser.parse_args(args)
+    if parsed_args.jobs is not None and parsed_args.jobs < 1:
+        parser.error("the number of jobs must be at least 1")
+    return parsed_args
+
+
+def main(args):
+    """Run the server until it is interrupted or terminated
+
+    Args:
+      args (List[str]): command line parameters as list of strings
+          (for example  ``["--jobs", "4"]``).
+    """
+    args = parse_args(args)
+    setup_logging(args.loglevel)
+
+    # stop cleanly on a kill as well, such that the socket is removed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    server = ConversionServer(args.socket, jobs=args.jobs, loglevel=args.loglevel)
+    print(f"Listening on {server.socket_path} with {server.jobs} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    print("Server stopped")
+
+
+def run():
+    """Calls :func:`main` passing the CLI arguments extracted from :obj:`sys.argv`
+
+    This function can be used as entry point to create console scripts with setuptools.
+    """
+    main(sys.argv[1:])
+
+
+if __name__ == "__main__":
+    run()
@@ -2,24 +2,151 @@
 """
 Helper functions and classes for working with tabular data
 """
+import codecs
+import io
+import itertools
 import logging
+import math
 import re
+import unicodedata
+from contextlib import contextmanager
+from functools import lru_cache, partial
+import numpy as np
 import pandas as pd
 from pandas import DataFrame
-from pandas.io.formats.excel import ExcelFormatter
-import matplotlib.colors as mlc
 from pathlib import Path
-from typing import Union
+from typing import IO, Iterable, Iterator, Union
 
-try:
-    import cbsplotlib
-except ImportError:
-    cbsplotlib = None
-else:
-    import cbsplotlib.colors as cbc
+from tabularxls import profiling
+from tabularxls.named_colors import NAMED_COLORS
 
 _logger = logging.getLogger(__name__)
 
+# the default rules for the LaTeX macros in the cells, see MacroRules. A macro without a
+# rule keeps its name, such that for instance the color macros end up as the color name
+# in front of the cell contents
+MACRO_RULES = {
+    "rowcolor": ("strip", None),
+    "hspace": ("strip", None),
+    "vspace": ("strip", None),
+    "cornercell": ("unwrap", None),
+    "normalsize": ("unwrap", None),
+    "textbf": ("unwrap", None),
+    "emph": ("unwrap", None),
+    "python": ("unwrap", None),
+    "numprint": ("unwrap", None),
+    "textemdash": ("replace", "-"),
+    "textendash": ("replace", "-"),
+}
+
+# a macro with its first argument, if the argument does not contain braces itself
+MACRO_PATTERN = re.compile(r"\\([A-Za-z]+)(?:{([^{}]*)})?")
+
+# the name of a format rule is put between two markers in front of the argument of its
+# macro. The marker is a private use character, which is not stripped as white space and
+# is not found in the tabulars
+FORMAT_MARKER = "\ue000"
+FORMAT_MARKER_PATTERN = re.compile(
+    f"{FORMAT_MARKER}([^{FORMAT_MARKER}]*){FORMAT_MARKER}"
+)
+
+# the tokens which change the state of the tabular tokenizer: a row end, the begin or
+# end of the tabular, an escaped character, a brace, a cell separator and a comment
+TABULAR_TOKEN_PATTERN = re.compile(
+    r"\\\\|\\(?:begin|end){(?:cbs)?tabular[x*]?}|\\[&%{}]|[{}&%]"
+)
+# a LaTeX command without a text argument, such as \hline, \grayhline, \cline{2-3} or
+# \rowcolor{white}. A line outside a row with only these commands does not start a row
+RULE_COMMAND_PATTERN = re.compile(
+    r"\\(?:(?:[hc]line|hhline|[a-z]*rule|rowcolor|arrayrulecolor|noalign|"
+    r"addlinespace)\*?(?:\[[^\]]*\]|\([^)]*\))*(?:{[^{}]*})*|[A-Za-z]+\*?(?![A-Za-z{]))"
+)
+# the optional star and vertical space following a row end, such as \\[2pt]
+ROW_END_SPACE_PATTERN = re.compile(r"\s*\*?\s*(?:\[[^\]]*\])?")
+# a hyperref of which only the text is kept
+HYPERREF_PATTERN = re.compile(r"\\hyperref\[.*\]{(.*)}")
+# a brace or an escaped brace, see get_brace_groups
+BRACE_PATTERN = re.compile(r"\\[{}]|[{}]")
+# a multicolumn or multirow command up to its first argument, the number of columns or
+# rows. A negative number of rows puts the text at the bottom of the rows above
+MULTICOLUMN_PATTERN = re.compile(r"\\multicolumn{\s*(\d+)\s*}")
+MULTIROW_PATTERN = re.compile(r"\\multirow(?:\[[^\]]*\])?{\s*(-?\d+)\s*}")
+
+# translation table to remove the remaining braces and backslashes after the LaTeX code
+# has been replaced
+BRACES_TABLE = str.maketrans("", "", "{}\\")
+
+# characters which can be written in superscript and their glyphs, see get_super
+NORMAL_CHARACTERS = (
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+-=()"
+)
+SUPERSCRIPT_CHARACTERS = (
+    "ᴬᴮᶜᴰᴱᶠᴳᴴᴵᴶᴷᴸᴹᴺᴼᴾQᴿˢᵀᵁⱽᵂˣʸᶻᵃᵇᶜᵈᵉᶠᵍʰᶦʲᵏˡᵐⁿᵒᵖ۹ʳˢᵗᵘᵛʷˣʸᶻ⁰¹²³⁴⁵⁶⁷⁸⁹⁺⁻⁼⁽⁾"
+)
+SUPERSCRIPT_TABLE = str.maketrans(NORMAL_CHARACTERS, SUPERSCRIPT_CHARACTERS)
+
+# maximum number of cleaned cells which are remembered, see clean_the_cells
+CLEAN_CACHE_SIZE = 100_000
+# lookups of the cleaned cells after which the miss rate is checked, see clean_the_cells
+CLEAN_CACHE_WINDOW = 1000
+# miss rate of the cleaned cells above which they are not remembered for
+# CLEAN_CACHE_BYPASS cells
+CLEAN_CACHE_MAX_MISS_RATE = 0.5
+CLEAN_CACHE_BYPASS = 100_000
+# maximum number of alias sets of which the version is remembered, see AliasDict
+ALIAS_VERSIONS_SIZE = 1000
+# minimum number of distinct values in the chunks of a column before they are merged,
+# see ColumnarRows
+COMPACT_SIZE = 10_000
+# share of distinct cells above which a column is stored as plain cells instead of
+# codes, see ColumnarRows
+PLAIN_SHARE = 0.5
+# the dtypes in which the cells of a parsed table can be stored, see rows_to_data_frame
+DTYPE_BACKENDS = ("numpy", "pyarrow")
+# syntax which RE2, the regular expression engine of the Arrow compute kernels,
+# interprets differently than Python or not at all: the Unicode aware classes, back
+# references, look-arounds, flags and POSIX classes
+NON_ARROW_PATTERN = re.compile(r"\\[dDwWsSbBZ0-9]|\(\?[^:]|\[:")
+
+# relative width of the characters in a column. Superscript glyphs are roughly half as
+# wide as normal characters, East-Asian wide and full width characters twice as wide
+SUPERSCRIPT_WIDTH = 0.5
+WIDE_CHARACTER_WIDTH = 2
+SUPERSCRIPT_GLYPHS = frozenset(SUPERSCRIPT_CHARACTERS) - frozenset(NORMAL_CHARACTERS)
+
+# begin and end of the tabular environments, and of the floats with caption and label
+BEGIN_TABULAR_PATTERN = re.compile(r"\\begin{(?:cbs)?tabular[x*]?}")
+END_TABULAR_PATTERN = re.compile(r"\\end{(?:cbs)?tabular[x*]?}")
+BEGIN_FLOAT_PATTERN = re.compile(r"\\begin{(?:table|figure)\*?}")
+END_FLOAT_PATTERN = re.compile(r"\\end{(?:table|figure)\*?}")
+
+# cells which stand for a missing or hidden value, kept as text in a numeric column
+NUMBER_PLACEHOLDERS = (".", "-", "*", "")
+# spaces which group the thousands of a number, next to the point or comma which is not
+# the decimal separator
+THOUSANDS_SPACES = " \u00a0\u2009\u202f"
+
+# characters which are not allowed in a name of an Excel sheet and its maximum length
+INVALID_SHEET_CHARACTERS_PATTERN = re.compile(r"[\[\]:*?/\\]")
+MAX_SHEET_NAME_LENGTH = 31
+
+
+@lru_cache(maxsize=None)
+def get_cbs_colors():
+    """
+    Get the CBS color definitions of cbsplotlib, which is only imported the first time
+    the colors are needed
+
+    Returns:
+        module or None: The cbsplotlib.colors module, or None in case cbsplotlib is not
+            installed
+    """
+    try:
+        import cbsplotlib.colors as cbc
+    except ImportError:
+        cbc = None
+    return cbc
+
 
 def get_color_names(min_color_length=2):
     """
@@ -29,15 +156,16 @@ def get_color_names(min_color_length=2):
         min_color_length (int):  minimum length of the color names
 
     Notes:
-        * By default, all matlotlib colors are taken
+        * By default, all matlotlib colors are taken from :data:`NAMED_COLORS`
         * In case cbsplotlib is installed, also all CBS color definitions are taken
 
     Returns:
         list: All the default color names
     """
 
-    colors = [c.replace("xkcd:", "") for c in mlc.get_named_colors_mapping().keys()]
-    if cbsplotlib is not None:
+    colors = [c.replace("xkcd:", "") for c in NAMED_COLORS.keys()]
+    cbc = get_cbs_colors()
+    if cbc is not None:
         cbs_colors = [c.replace("cbs:", "") for c in cbc.CBS_COLORS.keys()]
         colors.extend(cbs_colors)
     defaults_colors = [c for c in colors if len(c) > min_color_length]
@@ -45,6 +173,36 @@ def get_color_names(min_color_length=2):
     return defaults_colors
 
 
+@lru_cache(maxsize=None)
+def get_color_index(min_color_length=2):
+    """
+    Get a prefix index of the color names, build only once per process
+
+    Args:
+        min_color_length (int):  minimum length of the color names
+
+    Notes:
+        * The index maps each color name to its position in the list of
+          :func:`get_color_names`. In case a color name occurs more than once, the first
+          position is kept.
+        * The lengths of the color names are stored in increasing order, such that a
+          line only needs to be checked once for each distinct color name length.
+
+    Returns:
+        tuple: The color name to position mapping (dict) and the sorted distinct name
+            lengths (tuple)
+    """
+
+    color_positions = dict()
+    for position, color_name in enumerate(
+        get_color_names(min_color_length=min_color_length)
+    ):
+        color_positions.setdefault(color_name, position)
+    color_lengths = tuple(sorted({len(c) for c in color_positions.keys()}))
+
+    return color_positions, color_lengths
+
+
 def get_color_code(color_name: str):
     """
     Get the code belonging to a color name
@@ -58,7 +216,8 @@ def get_color_code(color_name: str):
 
     color_code = None
 
-    if cbsplotlib is not None:
+    cbc = get_cbs_colors()
+    if cbc is not None:
         # in case cbsplotlib is imported, first try to obtain the CBS color definition
         try:
             color_code = cbc.CBS_COLORS_HEX[color_name]
@@ -71,7 +230,7 @@ def get_color_code(color_name: str):
     if color_code is None:
         # if no color code has been found yet, try to obtain it from the matplotlib color definitions
         try:
-            color_code = mlc.get_named_colors_mapping()[color_name]
+            color_code = NAMED_COLORS[color_name]
         except KeyError:
             _logger.info(f"Could find a value for the color name  '{color_name}'")
 
@@ -89,19 +248,18 @@ def get_super(content):
         superscript_content (str): New string in only superscript characters
     """
 
-    normal = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+-=()"
-    super_s = "ᴬᴮᶜᴰᴱᶠᴳᴴᴵᴶᴷᴸᴹᴺᴼᴾQᴿˢᵀᵁⱽᵂˣʸᶻᵃᵇᶜᵈᵉᶠᵍʰᶦʲᵏˡᵐⁿᵒᵖ۹ʳˢᵗᵘᵛʷˣʸᶻ⁰¹²³⁴⁵⁶⁷⁸⁹⁺⁻⁼⁽⁾"
-    translations = content.maketrans("".join(normal), "".join(super_s))
-    superscript_content = content.translate(translations)
+    superscript_content = content.translate(SUPERSCRIPT_TABLE)
     return superscript_content
 
 
-def replace_textsuper(cell):
+def replace_textsuper(cell, macro_rules=None):
     """
     Replace LaTeX textsuperscript characters with superscript characters
 
     Args:
         cell (str): Cell contents for which the textsuperscript needs to be translated into superscript
+        macro_rules (MacroRules, optional): The rules of the macros in the superscript.
+            Defaults to :data:`DEFAULT_MACRO_RULES`
 
     Notes:
         * Superscript in LaTeX is given with the *\\textsuperscript{}* command
@@ -112,7 +270,7 @@ def replace_textsuper(cell):
     """
     if match := re.search("\\\\textsuperscript{(.*?)}", cell):
         content = match.group(1)
-        content = clean_the_cells([content])[0]
+        content = clean_the_cells([content], macro_rules=macro_rules)[0]
         content = get_super(content)
         new_cell = re.sub("\\\\textsuperscript{(.*?)}", content, cell)
     else:
@@ -120,246 +278,2364 @@ def replace_textsuper(cell):
     return new_cell
 
 
-def get_multicolumns(clean_cell):
+def get_multicolumns(clean_cell, macro_rules=None):
     """
     Get the cell contents of a multicolumn cell
 
     Args:
         clean_cell (str):  Cell contents of a multicolumn cell
+        macro_rules (MacroRules, optional): The rules of the macros in the cell.
+            Defaults to :data:`DEFAULT_MACRO_RULES`
+
+    Returns:
+        first_cell (str), n_col (int): The contents of the first cell and the number of following multicolumn cells
+    """
+    if match := re.search("\\\\multicolumn{(.*?)}", clean_cell):
+        n_col = int(match.group(1))
+        new_match = re.sub("\\\\multicolumn{(.*?)}", "", clean_cell)
+        cell_format, first_cell = get_new_command(new_match, macro_rules=macro_rules)
+    else:
+        first_cell = clean_cell
+        n_col = None
+    return first_cell, n_col
+
+
+def get_new_command(line, macro_rules=None):
+    """
+    Get the contents of a LaTeX newcommand definition
+
+    Args:
+        line (str):  Line potentially containing a newcommand definition
+        macro_rules (MacroRules, optional): The rules of the macros in the definition.
+            Defaults to :data:`DEFAULT_MACRO_RULES`
+
+    Notes:
+        * The first brace group is the alias, the contents of all other brace groups
+          form its pattern
+
+    Returns:
+        list: The cleaned alias and pattern
+    """
+
+    groups = get_brace_groups(line)
+    alias = "".join(line[start:end] for start, end in groups[:1])
+    pattern = "".join(line[start:end] for start, end in groups[1:])
+
+    clean_patterns = clean_the_cells([alias, pattern], macro_rules=macro_rules)
+
+    return clean_patterns
+
+
+def get_brace_groups(text: str, max_groups: Union[int, None] = None) -> list:
+    """
+    Find the top level brace groups of a text in one pass over its braces
+
+    Args:
+        text (str): The text
+        max_groups (int, optional): Stop after this many groups. Defaults to None, i.e.
+            find all groups
+
+    Notes:
+        * Escaped braces are skipped, as are closing braces without an opening brace
+        * A group which is not closed runs until the end of the text
+
+    Returns:
+        list: The start and end position of the contents of each group
+    """
+    groups = list()
+    depth = 0
+    start = 0
+    for match in BRACE_PATTERN.finditer(text):
+        brace = match.group()
+        if brace == "{":
+            if depth == 0:
+                start = match.end()
+            depth += 1
+        elif brace == "}" and depth > 0:
+            depth -= 1
+            if depth == 0:
+                groups.append((start, match.start()))
+                if max_groups is not None and len(groups) >= max_groups:
+                    return groups
+    if depth > 0:
+        groups.append((start, len(text)))
+    return groups
+
+
+def get_multirows(cell: str) -> tuple:
+    """
+    Get the cell contents of a multirow cell
+
+    Args:
+        cell (str): Cell contents with a multirow command, such as
+            *\\multirow{2}{*}{Totaal}*
+
+    Returns:
+        tuple: The cell with the multirow command replaced by its text and the number of
+            rows it spans, negative if the rows are above the cell, or None if the cell
+            has no multirow command
+    """
+    match = MULTIROW_PATTERN.search(cell)
+    if match is None:
+        return cell, None
+    n_row = int(match.group(1))
+    # the width and the text follow the number of rows
+    rest = cell[match.end() :]
+    groups = get_brace_groups(rest, max_groups=2)
+    if len(groups) < 2:
+        return cell[: match.start()] + rest, n_row
+    text_start, text_end = groups[1]
+    return (
+        cell[: match.start()] + rest[text_start:text_end] + rest[text_end + 1 :],
+        n_row,
+    )
+
+
+def get_cell_spans(cells: list) -> list:
+    """
+    Get the multicolumn and multirow cells of a row
+
+    Args:
+        cells (list): The raw cells of the row
+
+    Returns:
+        list: The column, number of rows and number of columns of each cell spanning
+            more than one row or column. The column is counted in cleaned cells, i.e.
+            after the padding of the multicolumns before it
+    """
+    spans = list()
+    column = 0
+    for cell in cells:
+        n_col = 1
+        if "\\multi" in cell:
+            n_row = 1
+            if match := MULTICOLUMN_PATTERN.search(cell):
+                n_col = int(match.group(1))
+            if match := MULTIROW_PATTERN.search(cell):
+                n_row = int(match.group(1))
+            if n_col > 1 or n_row not in (-1, 0, 1):
+                spans.append((column, n_row, n_col))
+        column += max(n_col, 1)
+    return spans
+
+
+class MacroRules:
+    """
+    Rules which tell what to do with the LaTeX macros in the cells
+
+    Args:
+        rules (dict, optional): The kind and value of the rule keyed on the macro name,
+            see :meth:`add_rule`. Defaults to None, i.e. no rules
+
+    Attributes:
+        rules (dict): The kind and value of each rule keyed on the macro name, the
+            dispatch table of :meth:`replace`
+        formats (dict): The cell format properties of the format rules keyed on the
+            macro name
+
+    Notes:
+        * The macros of a cell are found in a single pass of :data:`MACRO_PATTERN`,
+          after which the rule of each macro is looked up by its name. Adding rules does
+          therefore not slow down the cleaning
+        * A macro without a rule is left as it is, after which its backslash and the
+          braces are removed
+        * The version of the rules is part of the key of the cleaned cells, see
+          :func:`clean_the_cells`
+    """
+
+    KINDS = ("strip", "unwrap", "replace", "format")
+
+    # version of each set of rules seen so far
+    _versions = dict()
+
+    def __init__(self, rules: Union[dict, None] = None):
+        """
+        Constructor of the MacroRules class
+        """
+        self.rules = dict()
+        self.formats = dict()
+        self._version = None
+        if rules is not None:
+            for macro, (kind, value) in rules.items():
+                self.add_rule(macro, kind, value)
+
+    def add_rule(self, macro: str, kind: str, value=None):
+        """
+        Add a rule for a macro, replacing its current rule
+
+        Args:
+            macro (str): Name of the macro without backslash, such as *textbf*
+            kind (str): What to do with the macro and its first argument:
+
+                * *strip*: remove both
+                * *unwrap*: keep the argument only
+                * *replace*: replace the macro by the text *value*, followed by its
+                  argument if any
+                * *format*: keep the argument only and write the cell with the format
+                  properties *value*, such as ``{"bold": True}``
+
+            value (str or dict, optional): The replacement text or the format
+                properties. Defaults to None
+        """
+        if kind not in self.KINDS:
+            raise ValueError(
+                f"Unknown kind of rule {kind!r} for {macro}. Choose from {self.KINDS}"
+            )
+        if not re.fullmatch("[A-Za-z]+", macro):
+            raise ValueError(f"Invalid macro name {macro!r}: only letters are allowed")
+        if kind == "replace" and not isinstance(value, str):
+            raise ValueError(f"A replace rule for {macro} needs a replacement text")
+        if kind == "format" and not isinstance(value, dict):
+            raise ValueError(f"A format rule for {macro} needs the format properties")
+
+        self.formats.pop(macro, None)
+        self.rules[macro] = (kind, value)
+        if kind == "format":
+            self.formats[macro] = value
+        self._version = None
+
+    def remove_rule(self, macro: str):
+        """
+        Remove the rule of a macro, such that the macro is left as it is
+
+        Args:
+            macro (str): Name of the macro
+        """
+        del self.rules[macro]
+        self.formats.pop(macro, None)
+        self._version = None
+
+    def copy(self) -> "MacroRules":
+        """
+        Get a copy of the rules, which can be extended without changing these rules
+
+        Returns:
+            MacroRules: The copy
+        """
+        return MacroRules(self.rules)
+
+    def read(self, filename: Union[str, Path]):
+        """
+        Add the rules of a configuration file
+
+        Args:
+            filename (str or Path): Name of the configuration file
+
+        Notes:
+            * The file has a section per kind of rule, listing the macro names. The
+              replace rules give the replacement text and the format rules the format
+              properties as JSON::
+
+                [strip]
+                footnotesize
+                [unwrap]
+                grayhline
+                [replace]
+                Checkmark = ✓
+                [format]
+                textbf = {"bold": true}
+        """
+        import configparser
+        import json
+
+        config = configparser.ConfigParser(allow_no_value=True, interpolation=None)
+        # macro names are case sensitive
+        config.optionxform = str
+        with open(filename, encoding="utf-8") as fp:
+            config.read_file(fp)
+        for kind in config.sections():
+            for macro, value in config.items(kind):
+                if kind == "format":
+                    try:
+                        value = json.loads(value)
+                    except (TypeError, json.JSONDecodeError) as err:
+                        raise ValueError(
+                            f"Invalid format properties for {macro} in {filename}: "
+                            f"{err}"
+                        )
+                self.add_rule(macro, kind, value)
+
+    @classmethod
+    def from_file(cls, filename: Union[str, Path]) -> "MacroRules":
+        """
+        Get the default rules extended with the rules of a configuration file
+
+        Args:
+            filename (str or Path): Name of the configuration file, see :meth:`read`
+
+        Returns:
+            MacroRules: The rules
+        """
+        macro_rules = DEFAULT_MACRO_RULES.copy()
+        macro_rules.read(filename)
+        return macro_rules
+
+    @property
+    def version(self) -> int:
+        """
+        int: The version of the rules. Rules with the same contents share their version
+        """
+        if self._version is None:
+            key = tuple(
+                (macro, kind, repr(value))
+                for macro, (kind, value) in sorted(self.rules.items())
+            )
+            self._version = self._versions.setdefault(key, len(self._versions))
+        return self._version
+
+    def __getstate__(self):
+        # the version is only valid within a process
+        state = self.__dict__.copy()
+        state["_version"] = None
+        return state
+
+    def replace(self, match: re.Match) -> str:
+        """
+        Get the replacement of a match of :data:`MACRO_PATTERN`
+
+        Args:
+            match (re.Match): The macro with its argument
+
+        Returns:
+            str: The replacement according to the rule of the macro
+        """
+        macro, argument = match.groups()
+        if argument:
+            argument = MACRO_PATTERN.sub(self.replace, argument)
+        try:
+            kind, value = self.rules[macro]
+        except KeyError:
+            if argument is None:
+                return match.group()
+            return f"\\{macro}{{{argument}}}"
+
+        if kind == "strip":
+            return ""
+        if argument is None:
+            argument = ""
+        if kind == "unwrap":
+            return argument
+        if kind == "replace":
+            return value + argument
+        return f"{FORMAT_MARKER}{macro}{FORMAT_MARKER}{argument}"
+
+    def sub(self, text: str) -> str:
+        """
+        Apply the rules to all macros of a text
+
+        Args:
+            text (str): The text
+
+        Returns:
+            str: The text with the macros replaced
+        """
+        return MACRO_PATTERN.sub(self.replace, text)
+
+
+DEFAULT_MACRO_RULES = MacroRules(MACRO_RULES)
+
+
+def split_format_marker(value: str) -> tuple:
+    """
+    Get the format name of a cell with a format rule
+
+    Args:
+        value (str): The cell contents
+
+    Returns:
+        tuple: The name of the first format in the cell, or None if there is none, and
+            the contents without the format markers
+    """
+    match = FORMAT_MARKER_PATTERN.search(value)
+    if match is None:
+        return None, value
+    return match.group(1), FORMAT_MARKER_PATTERN.sub("", value)
+
+
+def remove_format_markers(value):
+    """
+    Remove the format markers from a value
+
+    Args:
+        value (object): The cell contents
+
+    Returns:
+        object: The contents without the format markers if it is a string, else the
+            value itself
+    """
+    if isinstance(value, str) and FORMAT_MARKER in value:
+        return FORMAT_MARKER_PATTERN.sub("", value)
+    return value
+
+
+class AliasDict(dict):
+    """
+    The newcommand aliases of a tabular, which keep track of their version
+
+    Attributes:
+        changes (int): Number of times the aliases were changed
+        version (int): The version of the aliases
+        matcher (re.Pattern or None): All aliases merged into one alternation, see
+            *get_alias_matcher*
+
+    Notes:
+        * A change only counts the changes. The version and the matcher are determined
+          when they are needed, i.e. once when the cells are cleaned after the aliases
+          were defined, instead of for each alias
+        * Alias sets with the same contents share their version, such that the cleaned
+          cells of one tabular can be reused for the next. The versions of at most
+          :data:`ALIAS_VERSIONS_SIZE` sets are remembered
+    """
+
+    # version of each set of aliases seen recently, keyed on its contents
+    _versions = dict()
+    # the versions are never reused, also not after the versions are forgotten
+    _version_counter = itertools.count(1)
+
+    def __init__(self, *args, **kwargs):
+        """
+        Constructor of the AliasDict class
+        """
+        super().__init__(*args, **kwargs)
+        self.changes = 0
+        # the number of changes for which the version and the matcher were determined
+        self._state = None
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.changes += 1
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.changes += 1
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.changes += 1
+
+    def pop(self, *args):
+        self.changes += 1
+        return super().pop(*args)
+
+    def popitem(self):
+        self.changes += 1
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        self.changes += 1
+        return super().setdefault(key, default)
+
+    def clear(self):
+        super().clear()
+        self.changes += 1
+
+    def get_state(self) -> tuple:
+        """
+        Get the version and the matcher belonging to the current aliases
+
+        Returns:
+            tuple: The version and the matcher, which are only determined again after a
+                change
+        """
+        if self._state is None or self._state[0] != self.changes:
+            version = 0
+            if self:
+                contents = tuple(self.items())
+                version = self._versions.get(contents)
+                if version is None:
+                    if len(self._versions) >= ALIAS_VERSIONS_SIZE:
+                        self._versions.clear()
+                    version = self._versions[contents] = next(self._version_counter)
+            matcher = compile_alias_matcher(tuple(self.keys()))
+            self._state = (self.changes, version, matcher)
+        return self._state[1:]
+
+    @property
+    def version(self) -> int:
+        return self.get_state()[0]
+
+    @property
+    def matcher(self):
+        return self.get_state()[1]
+
+
+@lru_cache(maxsize=64)
+def compile_alias_matcher(aliases: tuple):
+    """
+    Merge aliases into one pattern which matches the start of a cell in case any of
+    the aliases does
+
+    Args:
+        aliases (tuple): The aliases
+
+    Returns:
+        re.Pattern or None: The merged aliases. None if there are no aliases or they can
+            not be merged
+    """
+    if not aliases or any(re.search(r"\\[1-9]|\(\?P=", alias) for alias in aliases):
+        return None
+    try:
+        return re.compile("|".join([f"(?:{alias})" for alias in aliases]))
+    except re.error:
+        _logger.debug("Could not merge the aliases")
+        return None
+
+
+def get_alias_matcher(aliases: Union[dict, None]):
+    """
+    Get the merged pattern of a set of aliases
+
+    Args:
+        aliases (dict or None): The aliases
+
+    Returns:
+        re.Pattern or None: The merged aliases, see *compile_alias_matcher*
+    """
+    if not aliases:
+        return None
+    try:
+        return aliases.matcher
+    except AttributeError:
+        return compile_alias_matcher(tuple(aliases.keys()))
+
+
+def get_aliases_version(aliases: Union[dict, None]):
+    """
+    Get the version of a set of aliases, used as part of the key of the cleaned cells
+
+    Args:
+        aliases (dict or None): The aliases
+
+    Returns:
+        int or tuple: The version of an AliasDict, or the contents of other aliases
+    """
+    if not aliases:
+        return 0
+    try:
+        return aliases.version
+    except AttributeError:
+        return tuple(aliases.items())
+
+
+# the cleaned cells and the number of cells they span, keyed on the raw cell and the
+# versions of the aliases and the macro rules
+_clean_cache = dict()
+# the lookups and misses of the cleaned cells in the current window and the number of
+# cells still to be cleaned without the cache, see clean_the_cells
+_clean_cache_stats = {"lookups": 0, "misses": 0, "bypass": 0}
+
+
+def clear_clean_cache():
+    """
+    Forget all cleaned cells and the miss rate of the cache, see clean_the_cells
+    """
+    _clean_cache.clear()
+    _clean_cache_stats.update(lookups=0, misses=0, bypass=0)
+
+
+def clean_cell(cell, aliases=None, alias_matcher=None, macro_rules=None):
+    """
+    Remove all spurious latex code from the contents of a single cell
+
+    Args:
+        cell (str): The cell contents
+        aliases (dict, optional): The aliases to replace in the cell. Defaults to None
+        alias_matcher (re.Pattern, optional): The merged aliases, see
+            *get_alias_matcher*. The aliases are only tried one by one if the merged
+            aliases match. Defaults to None, i.e. always try the aliases
+        macro_rules (MacroRules, optional): The rules of the macros in the cell.
+            Defaults to :data:`DEFAULT_MACRO_RULES`
+
+    Returns:
+        tuple: The cleaned cell contents and the number of columns it spans, None if it
+            is not a multicolumn
+    """
+    if macro_rules is None:
+        macro_rules = DEFAULT_MACRO_RULES
+    if "\\textsuperscript{" in cell:
+        cell = replace_textsuper(cell, macro_rules=macro_rules)
+    if "\\multicolumn{" in cell:
+        cell, n_col = get_multicolumns(cell, macro_rules=macro_rules)
+    else:
+        n_col = None
+    if "\\multirow" in cell:
+        cell = get_multirows(cell)[0]
+    if "\\" in cell:
+        cell = macro_rules.sub(cell)
+    clean_text = cell.translate(BRACES_TABLE).replace("--", "-")
+
+    if aliases and (alias_matcher is None or alias_matcher.match(clean_text)):
+        for alias, pattern in aliases.items():
+            if re.match(alias, clean_text):
+                clean_text = clean_text.replace(alias, pattern)
+
+    return clean_text.strip(), n_col
+
+
+def clean_the_cells(cells, aliases=None, macro_rules=None):
+    """
+    Remove all spurious latex code from cell contents
+
+    Args:
+        cells (list): List of cells containing strings to be cleaned
+        aliases (dict, optional): If aliases are passed (default None), all strings will be cleaned with the
+            replacements defined in the aliases
+        macro_rules (MacroRules, optional): The rules of the macros in the cells.
+            Defaults to :data:`DEFAULT_MACRO_RULES`
+
+    Notes:
+        * All macros are replaced in a single pass of :data:`MACRO_PATTERN` according to
+          *macro_rules*, after which the remaining braces and backslashes are removed
+          with :data:`BRACES_TABLE`. Only cells containing a textsuperscript or
+          multicolumn command need a separate pass
+        * Statistical tables repeat the same cells many times, so each cleaned cell with
+          LaTeX code or aliases is remembered, keyed on the raw cell and the versions of
+          the aliases and the macro rules. The cache is emptied when it holds
+          :data:`CLEAN_CACHE_SIZE` cells
+        * Tables of mostly distinct values gain nothing from the cache. When more than
+          :data:`CLEAN_CACHE_MAX_MISS_RATE` of the last :data:`CLEAN_CACHE_WINDOW`
+          lookups missed, the next :data:`CLEAN_CACHE_BYPASS` cells are cleaned without
+          the cache
+
+    Returns:
+        list: The new cell contents
+    """
+
+    if macro_rules is None:
+        macro_rules = DEFAULT_MACRO_RULES
+    version = get_aliases_version(aliases)
+    rules_version = macro_rules.version
+    alias_matcher = get_alias_matcher(aliases)
+    use_cache = _clean_cache_stats["bypass"] <= 0
+    if not use_cache:
+        _clean_cache_stats["bypass"] -= len(cells)
+    n_lookups = n_misses = 0
+    clean_cells = list()
+    for cell in cells:
+        if not version and "\\" not in cell:
+            # without LaTeX code or aliases, cleaning is cheaper than remembering
+            clean_text, n_col = clean_cell(cell)
+        elif not use_cache:
+            clean_text, n_col = clean_cell(
+                cell, aliases, alias_matcher, macro_rules=macro_rules
+            )
+        else:
+            key = (cell, version, rules_version)
+            n_lookups += 1
+            try:
+                clean_text, n_col = _clean_cache[key]
+            except KeyError:
+                n_misses += 1
+                clean_text, n_col = clean_cell(
+                    cell, aliases, alias_matcher, macro_rules=macro_rules
+                )
+                if len(_clean_cache) >= CLEAN_CACHE_SIZE:
+                    _clean_cache.clear()
+                _clean_cache[key] = clean_text, n_col
+
+        clean_cells.append(clean_text)
+        if n_col is not None and n_col > 1:
+            for ii in range(1, n_col):
+                clean_cells.append("")
+
+    if n_lookups:
+        stats = _clean_cache_stats
+        stats["lookups"] += n_lookups
+        stats["misses"] += n_misses
+        if stats["lookups"] >= CLEAN_CACHE_WINDOW:
+            if stats["misses"] > CLEAN_CACHE_MAX_MISS_RATE * stats["lookups"]:
+                stats["bypass"] = CLEAN_CACHE_BYPASS
+            stats["lookups"] = stats["misses"] = 0
+
+    return clean_cells
+
+
+def is_arrow_string_dtype(dtype) -> bool:
+    """
+    Check if a dtype is the pandas string dtype in Arrow arrays, i.e. *string[pyarrow]*
+    """
+    return isinstance(dtype, pd.StringDtype) and dtype.storage == "pyarrow"
+
+
+def is_arrow_rule(search: re.Pattern, replace: str) -> bool:
+    """
+    Check if a substitution can be applied with the regular expression kernels of Arrow,
+    which use RE2
+
+    Args:
+        search (re.Pattern): The search pattern
+        replace (str): The replacement
+
+    Notes:
+        * The search pattern may not use any syntax of *NON_ARROW_PATTERN* and may not
+          match an empty string, of which the substitutions differ between the two
+          engines
+        * The replacement may not contain backslashes, of which the escapes differ
+
+    Returns:
+        bool: True if RE2 gives the same result as Python for all values without a
+            newline at the end
+    """
+    return (
+        NON_ARROW_PATTERN.search(search.pattern) is None
+        and search.search("") is None
+        and isinstance(replace, str)
+        and "\\" not in replace
+    )
+
+
+class PatternReplacer:
+    """
+    Apply a sequence of regular expression substitutions to cell values
+
+    Args:
+        search_and_replace (dict, optional): The search and replace patterns, applied in
+            order to each value
+        aliases (dict, optional): The aliases, applied before the search and replace
+            patterns. An alias is only replaced if it matches the whole value
+
+    Attributes:
+        rules (list): The compiled search patterns with their replacements
+        matcher (re.Pattern or None): All search patterns merged into one alternation. A
+            value which does not match this pattern is not changed by any of the rules.
+            None if the patterns can not be merged
+        arrow_rules (list): For each rule, whether it can be applied with the Arrow
+            compute kernels, see *is_arrow_rule*
+
+    Notes:
+        * The substitutions are applied once per unique value only
+    """
+
+    def __init__(self, search_and_replace=None, aliases=None):
+        """
+        Constructor of the PatternReplacer class
+        """
+        self.rules = list()
+        if aliases is not None:
+            for alias, pattern in aliases.items():
+                self.rules.append((re.compile("^" + alias + "$"), pattern))
+        if search_and_replace is not None:
+            for search, replace in search_and_replace.items():
+                self.rules.append((re.compile(search), replace))
+
+        self.matcher = None
+        search_patterns = [rule[0].pattern for rule in self.rules]
+        # back references refer to group numbers which shift in the merged pattern
+        if not any(re.search(r"\\[1-9]|\(\?P=", p) for p in search_patterns):
+            try:
+                self.matcher = re.compile(
+                    "|".join([f"(?:{pattern})" for pattern in search_patterns])
+                )
+            except re.error:
+                _logger.debug("Could not merge the search patterns")
+        self.arrow_rules = [
+            is_arrow_rule(search, replace) for search, replace in self.rules
+        ]
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    def replace(self, value):
+        """
+        Apply all substitutions to a single value
+
+        Args:
+            value (str): The value to replace the patterns in
+
+        Returns:
+            str: The new value
+        """
+        if self.matcher is not None and self.matcher.search(value) is None:
+            return value
+        for search, replace in self.rules:
+            value = search.sub(replace, value)
+        return value
+
+    def replace_values(self, values):
+        """
+        Apply all substitutions to an array of values
+
+        Args:
+            values (array-like): The values to replace the patterns in. Missing values
+                are left as they are
+
+        Returns:
+            ndarray or None: The new values, or None if no value was changed
+        """
+        codes, uniques = pd.factorize(values)
+        new_uniques = np.array([self.replace(value) for value in uniques], dtype=object)
+        if np.array_equal(new_uniques, uniques):
+            return None
+        new_values = np.array(values, dtype=object)
+        valid = codes >= 0
+        new_values[valid] = new_uniques[codes[valid]]
+        return new_values
+
+    def replace_arrow(self, arrays: list):
+        """
+        Apply all substitutions to Arrow backed strings with the Arrow compute kernels
+
+        Args:
+            arrays (list): The ArrowStringArrays to replace the patterns in, such as the
+                columns of a table. Missing values are left as they are
+
+        Notes:
+            * The arrays are encoded with one dictionary of the distinct values of all
+              arrays. The rules are applied to the distinct values which match the
+              merged patterns. A rule which RE2 may apply differently than Python is
+              applied to the distinct values with *re.sub* instead
+            * RE2 only matches $ at the very end, where Python also matches before a
+              newline at the end. Rules with a $ are applied with *re.sub* if a value
+              ends with a newline
+
+        Returns:
+            list or None: The new ArrowStringArrays, or None if no value was changed
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        def ends_with_newline(strings):
+            return bool(pc.any(pc.ends_with(strings, "\n")).as_py())
+
+        encoded = pc.dictionary_encode(
+            pa.chunked_array([pa.array(array) for array in arrays])
+        )
+        # the chunks share the dictionary, which grows with each chunk
+        uniques = new_uniques = encoded.chunk(encoded.num_chunks - 1).dictionary
+        selected = None
+        if (
+            self.matcher is not None
+            and NON_ARROW_PATTERN.search(self.matcher.pattern) is None
+            and not ("$" in self.matcher.pattern and ends_with_newline(uniques))
+        ):
+            try:
+                selected = pc.match_substring_regex(uniques, self.matcher.pattern)
+            except pa.ArrowInvalid as err:
+                _logger.debug(f"Could not match the merged patterns with RE2: {err}")
+        if selected is not None:
+            if not pc.any(selected).as_py():
+                return None
+            new_uniques = uniques.filter(selected)
+
+        for (search, replace), arrow_rule in zip(self.rules, self.arrow_rules):
+            if arrow_rule and "$" in search.pattern:
+                arrow_rule = not ends_with_newline(new_uniques)
+            if arrow_rule:
+                try:
+                    new_uniques = pc.replace_substring_regex(
+                        new_uniques, pattern=search.pattern, replacement=replace
+                    )
+                    continue
+                except pa.ArrowInvalid as err:
+                    _logger.debug(f"Applying {search.pattern!r} with Python: {err}")
+            new_uniques = pa.array(
+                [search.sub(replace, value) for value in new_uniques.to_pylist()],
+                type=new_uniques.type,
+            )
+        if selected is not None:
+            new_uniques = pc.replace_with_mask(uniques, selected, new_uniques)
+        if new_uniques.equals(uniques):
+            return None
+        return [
+            pd.arrays.ArrowStringArray(pc.take(new_uniques, chunk.indices))
+            for chunk in encoded.chunks
+        ]
+
+    def replace_index(self, index):
+        """
+        Apply all substitutions to the values and the names of an index
+
+        Args:
+            index (Index or MultiIndex): The index to replace the patterns in
+
+        Returns:
+            Index or MultiIndex: The new index
+        """
+        names = [
+            self.replace(name) if isinstance(name, str) else name
+            for name in index.names
+        ]
+        levels = list()
+        changed = names != list(index.names)
+        for level in range(index.nlevels):
+            level_values = index.get_level_values(level)
+            new_values = None
+            if is_arrow_string_dtype(level_values.dtype):
+                new_values = self.replace_arrow([level_values.array])
+                if new_values is not None:
+                    new_values = new_values[0]
+            elif level_values.dtype == object:
+                new_values = self.replace_values(level_values.to_numpy())
+            if new_values is None:
+                levels.append(level_values)
+            else:
+                levels.append(new_values)
+                changed = True
+        if not changed:
+            return index
+        if index.nlevels > 1:
+            return pd.MultiIndex.from_arrays(levels, names=names)
+        return pd.Index(levels[0], name=names[0])
+
+
+def substitute_patterns(
+    table_df: DataFrame,
+    aliases: Union[dict, None] = None,
+    search_and_replace: Union[dict, None] = None,
+) -> DataFrame:
+    """
+    Replace the aliases and search patterns in a parsed table
+
+    Args:
+        table_df (DataFrame): The table as parsed from the tabular
+        aliases (dict, optional): The aliases to replace in the cells. Defaults to None
+        search_and_replace (dict, optional): The search and replace strings. These are
+            replaced in the cells as well as in the index and the column names. Defaults
+            to None
+
+    Notes:
+        * All cells are passed through the merged patterns in one go, the data frame is
+          only copied in case a value has changed
+        * If all columns hold Arrow backed strings, the patterns are replaced in the
+          distinct values of all columns with the Arrow compute kernels, see
+          :meth:`PatternReplacer.replace_arrow`, and the columns keep their dtype
+
+    Returns:
+        DataFrame: The table with the patterns replaced
+    """
+    cell_replacer = PatternReplacer(search_and_replace, aliases=aliases)
+    name_replacer = PatternReplacer(search_and_replace)
+
+    if not cell_replacer:
+        return table_df
+
+    new_df = None
+    if table_df.shape[1] > 0 and all(map(is_arrow_string_dtype, table_df.dtypes)):
+        new_arrays = cell_replacer.replace_arrow(
+            [table_df.iloc[:, column].array for column in range(table_df.shape[1])]
+        )
+        if new_arrays is not None:
+            new_df = pd.DataFrame(dict(enumerate(new_arrays)), copy=False)
+    else:
+        values = table_df.to_numpy(dtype=object)
+        new_values = cell_replacer.replace_values(values.ravel())
+        if new_values is not None:
+            new_df = pd.DataFrame(new_values.reshape(values.shape))
+
+    if name_replacer:
+        index = name_replacer.replace_index(table_df.index)
+        columns = name_replacer.replace_index(table_df.columns)
+    else:
+        index = table_df.index
+        columns = table_df.columns
+
+    if new_df is not None:
+        table_df = new_df
+    table_df.index = index
+    table_df.columns = columns
+
+    return table_df
+
+
+def get_number_format(decimals: int = 0, grouping: bool = False, percent: bool = False):
+    """
+    Get the format of the numbers of a column
+
+    Args:
+        decimals (int, optional): Number of decimals. Defaults to 0
+        grouping (bool, optional): Group the thousands. Defaults to False
+        percent (bool, optional): Show the numbers as percentage. Defaults to False
+
+    Returns:
+        tuple: The Excel number format and the equivalent Python format specification
+    """
+    excel_format = "#,##0" if grouping else "0"
+    if decimals > 0:
+        excel_format += "." + "0" * decimals
+    python_format = ("," if grouping else "") + f".{decimals}"
+    if percent:
+        excel_format += "%"
+        python_format += "%"
+    else:
+        python_format += "f"
+    return excel_format, python_format
+
+
+def convert_numeric_columns(table_df: DataFrame, decimal: str = ",") -> DataFrame:
+    """
+    Convert the columns which only contain numbers to numbers
+
+    Args:
+        table_df (DataFrame): The cleaned tabular data with strings
+        decimal (str, optional): The decimal separator, "," or ".". Defaults to ","
+
+    Notes:
+        * A column is converted when all its cells are numbers or one of the
+          *NUMBER_PLACEHOLDERS*, with at least one number. The placeholders stay text
+          and the missing cells of short rows stay None, in which case the column keeps
+          the object dtype. The index is not converted
+        * Thousands may be grouped with spaces or the separator which is not the decimal
+          separator, like *1 234* or *1.234,5*. Percentages like *45%* are converted to
+          fractions, which is what Excel expects. A column is only converted if either
+          none or all of its numbers are percentages
+        * Cells with leading zeros, like the codes *0123*, and integers which do not fit
+          in 64 bits are not numbers. The integers are parsed exactly, not via floats
+        * The cells of all columns are parsed at once with the vectorized string methods
+          of pandas
+        * The number format of each converted column is stored as (decimals, grouping,
+          percent) in the *number_formats* attribute of the data frame, keyed on the
+          column name. The writer uses it to format the cells
+        * Columns which are not converted keep their dtype, such as *string[pyarrow]*
+
+    Returns:
+        DataFrame: The data with the numeric columns converted
+    """
+    if decimal not in (",", "."):
+        raise ValueError(f"Decimal separator must be ',' or '.', not {decimal!r}")
+    if table_df.empty:
+        return table_df
+
+    if any(isinstance(dtype, pd.StringDtype) for dtype in table_df.dtypes):
+        # the missing cells of the string columns are None, as in the object columns
+        values = table_df.to_numpy(dtype=object, na_value=None)
+    else:
+        values = table_df.to_numpy(dtype=object)
+    shape = values.shape
+    cells = pd.Series(values.ravel(), dtype=object)
+    texts = cells.where(cells.notna(), "").astype(str).str.strip()
+
+    thousands = re.escape(THOUSANDS_SPACES + ("." if decimal == "," else ","))
+    number_pattern = re.compile(
+        rf"[-+]?(?:[1-9]\d{{0,2}}(?:[{thousands}]\d{{3}})+|0|[1-9]\d*)"
+        rf"(?:{re.escape(decimal)}\d+)?"
+    )
+    is_placeholder = texts.isin(NUMBER_PLACEHOLDERS).to_numpy()
+    is_percent = texts.str.endswith("%").to_numpy()
+    number_texts = texts.str.rstrip("%").str.rstrip().str.replace("\u2212", "-")
+    is_number = number_texts.str.fullmatch(number_pattern).to_numpy()
+    # integers with more than 18 digits may not fit in 64 bits
+    int64_info = np.iinfo(np.int64)
+    for position in np.flatnonzero(is_number & (number_texts.str.len() > 18)):
+        number_text = number_texts.iat[position]
+        if decimal not in number_text:
+            number = int(re.sub(f"[{thousands}]", "", number_text))
+            is_number[position] = int64_info.min <= number <= int64_info.max
+
+    numbers_per_column = is_number.reshape(shape).sum(axis=0)
+    percents_per_column = (is_number & is_percent).reshape(shape).sum(axis=0)
+    is_numeric_column = (
+        (is_number | is_placeholder).reshape(shape).all(axis=0)
+        & (numbers_per_column > 0)
+        & ((percents_per_column == 0) | (percents_per_column == numbers_per_column))
+    )
+    if not is_numeric_column.any():
+        return table_df
+
+    selected = (is_number.reshape(shape) & is_numeric_column).ravel()
+    columns = np.flatnonzero(selected) % shape[1]
+    number_texts = number_texts[selected]
+    grouped = number_texts.str.contains(f"[{thousands}]").to_numpy()
+    number_texts = number_texts.str.replace(f"[{thousands}]", "", regex=True)
+    if decimal == ",":
+        number_texts = number_texts.str.replace(",", ".", regex=False)
+    point_positions = number_texts.str.find(".").to_numpy()
+    decimals = np.where(
+        point_positions >= 0, number_texts.str.len().to_numpy() - point_positions - 1, 0
+    )
+    numbers = pd.to_numeric(number_texts).to_numpy(dtype=float)
+
+    column_decimals = np.zeros(shape[1], dtype=int)
+    np.maximum.at(column_decimals, columns, decimals)
+    column_grouping = np.bincount(columns, weights=grouped, minlength=shape[1]) > 0
+    column_percent = percents_per_column > 0
+
+    converted = numbers.astype(object)
+    is_integer = (column_decimals == 0) & ~column_percent
+    integers = is_integer[columns]
+    # parse the integers exactly, also beyond the 53 bits of the floats
+    converted[integers] = (
+        number_texts[integers].astype(np.int64).to_numpy().astype(object)
+    )
+    for column in np.flatnonzero(is_numeric_column & column_percent):
+        # round the fraction, such that 1.1% is 0.011 instead of 0.011000000000000001
+        cells_of_column = columns == column
+        converted[cells_of_column] = np.round(
+            numbers[cells_of_column] / 100, column_decimals[column] + 2
+        )
+
+    new_values = values.ravel().copy()
+    new_values[selected] = converted
+    converted_df = pd.DataFrame(
+        new_values.reshape(shape), index=table_df.index, columns=table_df.columns
+    ).infer_objects()
+    # a missing cell of a short row stays None instead of becoming NaN, which can not be
+    # written to Excel
+    is_missing = cells.isna().to_numpy().reshape(shape)
+    for column in np.flatnonzero(is_numeric_column & is_missing.any(axis=0)):
+        converted_df.isetitem(column, new_values.reshape(shape)[:, column])
+    # the other columns keep their dtype, such as the Arrow backed strings
+    for column in np.flatnonzero(~is_numeric_column):
+        if isinstance(table_df.dtypes.iloc[column], pd.StringDtype):
+            converted_df.isetitem(column, table_df.iloc[:, column])
+    converted_df.attrs["number_formats"] = {
+        table_df.columns[column]: (
+            int(column_decimals[column]),
+            bool(column_grouping[column]),
+            bool(column_percent[column]),
+        )
+        for column in np.flatnonzero(is_numeric_column)
+    }
+    _logger.debug(f"Numeric columns: {converted_df.attrs['number_formats']}")
+
+    return converted_df
+
+
+class TabularTokenizer:
+    """
+    Split the lines of a tabular into rows of raw cells
+
+    Notes:
+        * Cells are separated by an unescaped *&* and rows end with an unescaped *\\\\*
+          or the end of the tabular, both only at brace depth zero. An *&* inside
+          braces, such as in a multicolumn, and an escaped *\\&* are part of the cell
+        * A row may span several lines, which are joined with a space. Text after an
+          unescaped *%* is a comment
+        * Only the special characters are visited, by a single
+          :data:`TABULAR_TOKEN_PATTERN` search per line. A line with a complete row of
+          which each cell has balanced braces is split directly
+        * The arguments of the begin of the tabular, such as the column specification,
+          are skipped, as are rows with a single cell and lines outside a row with only
+          rules, see :data:`RULE_COMMAND_PATTERN`
+        * Other text outside a row is only kept as the start of a row if the next line
+          continues it with a separator. Stray text, such as a line of prose before the
+          tabular, is dropped
+
+    Attributes:
+        depth (int): The brace depth at the end of the lines fed so far
+        cells (list): The cells of the current row
+        parts (list): The parts of the current cell on the previous lines
+        in_preamble (bool): The arguments of the begin of the tabular are being read
+        pending (str or None): Text outside a row on the previous line, which starts a
+            row if the next line begins with a separator
+    """
+
+    def __init__(self):
+        """
+        Constructor of the TabularTokenizer class
+        """
+        self.depth = 0
+        self.cells = list()
+        self.parts = list()
+        self.in_preamble = False
+        self.pending = None
+
+    def feed(self, line: str) -> list:
+        """
+        Add a line of the tabular
+
+        Args:
+            line (str): The line without the line end
+
+        Returns:
+            list: The rows ended on this line, each row being a list with the raw cells
+        """
+        if self.pending is not None:
+            if line.lstrip().startswith("&"):
+                self.parts.append(self.pending)
+            self.pending = None
+
+        if (
+            line.endswith("\\\\")
+            and line.count("\\\\") == 1
+            and "%" not in line
+            and "\\&" not in line
+            and not (self.cells or self.parts or self.depth or self.in_preamble)
+        ):
+            # a complete row on one line. If the braces of each cell are balanced, no
+            # separator is inside braces
+            cells = line[:-2].split("&")
+            if "{" not in line or (
+                "\\begin" not in line
+                and "\\{" not in line
+                and "\\}" not in line
+                and all(cell.count("{") == cell.count("}") for cell in cells)
+            ):
+                return [cells] if len(cells) > 1 else []
+
+        rows = list()
+        start = 0
+        end = len(line)
+        for match in TABULAR_TOKEN_PATTERN.finditer(line):
+            token = match.group()
+            if token == "{":
+                self.depth += 1
+            elif token == "}":
+                if self.depth > 0:
+                    self.depth -= 1
+                if self.in_preamble and self.depth == 0:
+                    # the preamble ends with the last argument
+                    start = match.end()
+                    self.in_preamble = line.startswith("{", start) or line.startswith(
+                        "[", start
+                    )
+            elif token == "%":
+                end = match.start()
+                break
+            elif self.depth > 0 or (len(token) == 2 and token != "\\\\"):
+                # an escaped character or a separator inside braces
+                continue
+            elif token.startswith("\\begin"):
+                # whatever came before belongs to no row
+                self.cells = list()
+                self.parts = list()
+                self.pending = None
+                self.in_preamble = True
+                start = match.end()
+            elif token == "&":
+                self.parts.append(line[start : match.start()])
+                self.cells.append(" ".join(self.parts))
+                self.parts = list()
+                start = match.end()
+            else:
+                # the end of a row or of the tabular
+                self.parts.append(line[start : match.start()])
+                if row := self.end_row():
+                    rows.append(row)
+                start = ROW_END_SPACE_PATTERN.match(line, match.end()).end()
+
+        text = line[start:end]
+        if self.in_preamble:
+            # the preamble ends at the end of the line unless an argument is still open
+            self.in_preamble = self.depth > 0
+        elif self.cells or self.parts or self.depth:
+            self.parts.append(text)
+        elif RULE_COMMAND_PATTERN.sub("", text).strip():
+            # the first line of a row if the next line continues it, else stray text
+            self.pending = text
+        return rows
+
+    def end_row(self) -> Union[list, None]:
+        """
+        End the current row
+
+        Returns:
+            list or None: The cells of the row, None if the row has less than two cells
+        """
+        self.cells.append(" ".join(self.parts))
+        cells = self.cells
+        self.cells = list()
+        self.parts = list()
+        self.depth = 0
+        return cells if len(cells) > 1 else None
+
+    def close(self) -> Union[list, None]:
+        """
+        End the last row, which may not be followed by a row end
+
+        Returns:
+            list or None: The cells of the row, None if there are no cells left
+        """
+        if not self.cells:
+            return None
+        return self.end_row()
+
+
+class ColumnarRows:
+    """
+    The cells of the rows of a tabular, stored per column as codes of the distinct
+    values of the column
+
+    A tall tabular repeats the same cells many times, such as the labels, the
+    placeholders and the numbers. Instead of a list with a string per cell, each column
+    keeps an array with a 32 bit code per cell and an array with the distinct values of
+    the column.
+
+    Notes:
+        * Each chunk of rows is encoded with *pandas.factorize* per column. The chunks
+          of a column are merged with :meth:`compact_column` once their distinct values
+          outnumber the ones merged before, and when the column is decoded. Only the
+          first string of equal cells is kept
+        * A column of which more than :data:`PLAIN_SHARE` of the cells are distinct,
+          such as a column of numbers, gains nothing from the codes. Its cells are kept
+          as plain object arrays, to which the next chunks are added without encoding
+          them. This is checked on the first chunk of the column, and on all its cells
+          after each merge
+        * Rows with fewer cells than the others are padded with missing cells, which get
+          code -1 and are None in an object column, as with *DataFrame.from_records*
+        * The columns are decoded to object arrays of which equal cells share the same
+          string, to Arrow backed strings, or directly to a pandas *Categorical* or an
+          Arrow dictionary array
+
+    Attributes:
+        n_rows (int): Number of rows
+        codes (list): Per column, the arrays with the codes of the merged chunks
+        values (list): Per column, an array with the merged distinct values in order of
+            their code
+        chunks (list): Per column, the codes and the distinct values of the chunks which
+            are not merged yet
+        plain (list): Per column, the object arrays with the cells of the chunks if the
+            column is stored as plain cells, else None
+    """
+
+    def __init__(self):
+        """
+        Constructor of the ColumnarRows class
+        """
+        self.n_rows = 0
+        self.codes = list()
+        self.values = list()
+        self.chunks = list()
+        self.plain = list()
+
+    @property
+    def n_columns(self) -> int:
+        """
+        Number of columns, i.e. the number of cells of the longest row
+        """
+        return len(self.codes)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Number of bytes of the codes and of the arrays of the plain columns, excluding
+        the strings
+        """
+        return (
+            sum(codes.nbytes for arrays in self.codes for codes in arrays)
+            + sum(codes.nbytes for chunks in self.chunks for codes, _ in chunks)
+            + sum(cells.nbytes for arrays in self.plain if arrays for cells in arrays)
+        )
+
+    def add_column(self):
+        """
+        Add a column, of which the cells of the rows added so far are missing
+        """
+        self.codes.append([np.full(self.n_rows, -1, dtype=np.int32)])
+        self.values.append(np.empty(0, dtype=object))
+        self.chunks.append(list())
+        self.plain.append(None)
+
+    def extend(self, rows: list):
+        """
+        Add rows of cells
+
+        Args:
+            rows (list): The rows, each row being a list with the cleaned cells
+        """
+        if not rows:
+            return
+        lengths = set(map(len, rows))
+        while self.n_columns < max(lengths):
+            self.add_column()
+        if min(lengths) < self.n_columns:
+            padding = [None] * self.n_columns
+            rows = [row + padding[len(row) :] for row in rows]
+        cells = np.array(rows, dtype=object)
+        self.n_rows += len(rows)
+        for column, chunks in enumerate(self.chunks):
+            if (
+                self.plain[column] is None
+                and not chunks
+                and not len(self.values[column])
+            ):
+                if len(set(cells[:, column])) > PLAIN_SHARE * len(rows):
+                    self.make_plain(column)
+            if self.plain[column] is not None:
+                # a copy, such that the cells of the other columns are not kept alive
+                self.plain[column].append(cells[:, column].copy())
+                continue
+            codes, values = pd.factorize(cells[:, column])
+            chunks.append((codes.astype(np.int32), values))
+            # merging encodes the merged values once more, so it waits until the chunks
+            # have as many distinct values
+            n_values = sum(len(values) for _, values in chunks)
+            if n_values >= max(len(self.values[column]), COMPACT_SIZE):
+                self.compact_column(column)
+                if len(self.values[column]) > PLAIN_SHARE * self.n_rows:
+                    self.make_plain(column)
+
+    def make_plain(self, column: int):
+        """
+        Store the cells of a column as plain cells from now on, starting with the
+        decoded cells added so far
+
+        Args:
+            column (int): Number of the column
+        """
+        self.plain[column] = [self.get_column(column)]
+        self.codes[column] = list()
+        self.values[column] = np.empty(0, dtype=object)
+
+    def compact_column(self, column: int):
+        """
+        Merge the distinct values of the chunks of a column into its distinct values and
+        translate their codes
+
+        Args:
+            column (int): Number of the column
+        """
+        chunks = self.chunks[column]
+        if not chunks:
+            return
+        n_merged = len(self.values[column])
+        # the merged values come first and keep their codes, as factorize numbers the
+        # values in order of appearance
+        value_codes, values = pd.factorize(
+            np.concatenate([self.values[column]] + [values for _, values in chunks])
+        )
+        self.values[column] = values
+        # code -1 of a missing cell maps onto the appended -1
+        value_codes = np.append(value_codes[n_merged:].astype(np.int32), np.int32(-1))
+        offset = 0
+        for codes, values in chunks:
+            offset_codes = np.where(codes >= 0, codes + offset, len(value_codes) - 1)
+            self.codes[column].append(value_codes[offset_codes])
+            offset += len(values)
+        chunks.clear()
+
+    def compact(self):
+        """
+        Merge the chunks of all columns, see :meth:`compact_column`
+        """
+        for column in range(self.n_columns):
+            self.compact_column(column)
+
+    def get_codes(self, column: int) -> np.ndarray:
+        """
+        Get the codes of all cells of a column
+
+        Args:
+            column (int): Number of the column
+
+        Notes:
+            * The cells of a plain column are encoded once more
+
+        Returns:
+            ndarray: The codes into the distinct values of the column, -1 for a missing
+                cell
+        """
+        if self.plain[column] is not None:
+            codes, self.values[column] = pd.factorize(self.get_column(column))
+            self.codes[column] = [codes.astype(np.int32)]
+            self.plain[column] = None
+        self.compact_column(column)
+        if len(self.codes[column]) > 1:
+            self.codes[column] = [np.concatenate(self.codes[column])]
+        return self.codes[column][0]
+
+    def get_column(self, column: int) -> np.ndarray:
+        """
+        Decode a column to an object array
+
+        Args:
+            column (int): Number of the column
+
+        Returns:
+            ndarray: The cells of the column, of which equal cells are the same object
+                unless the column is plain
+        """
+        if self.plain[column] is not None:
+            if len(self.plain[column]) > 1:
+                self.plain[column] = [np.concatenate(self.plain[column])]
+            return self.plain[column][0]
+        codes = self.get_codes(column)
+        # the missing cells with code -1 take the appended None
+        return np.append(self.values[column], None)[codes]
+
+    def get_categorical(self, column: int) -> pd.Categorical:
+        """
+        Decode a column to a pandas Categorical, without decoding the cells
+
+        Args:
+            column (int): Number of the column
+
+        Returns:
+            Categorical: The cells of the column, of which the missing ones are NaN
+        """
+        codes = self.get_codes(column)
+        return pd.Categorical.from_codes(codes, categories=self.values[column])
+
+    def check_columns(self, columns: list):
+        """
+        Check that there is a name for each column
+
+        Args:
+            columns (list): The column names
+
+        Raises:
+            ValueError: There are more columns than column names
+        """
+        if len(columns) < self.n_columns:
+            raise ValueError(
+                f"{len(columns)} columns passed, "
+                f"passed data had {self.n_columns} columns"
+            )
+
+    def get_arrow_array(self, column: int):
+        """
+        Convert a column to an Arrow dictionary array, without decoding the cells
+
+        Args:
+            column (int): Number of the column
+
+        Returns:
+            pyarrow.DictionaryArray: The cells of the column, of which the missing ones
+                are null
+        """
+        import pyarrow as pa
+
+        codes = self.get_codes(column)
+        return pa.DictionaryArray.from_arrays(
+            pa.array(codes, mask=codes < 0),
+            pa.array(self.values[column], type=pa.string()),
+        )
+
+    def to_data_frame(self, columns: list, dtype: Union[str, None] = None) -> DataFrame:
+        """
+        Convert the rows to a data frame
+
+        Args:
+            columns (list): The column names, which may contain duplicates
+            dtype (str, optional): The dtype of the columns, either "category" for
+                pandas Categorical columns or "string[pyarrow]" for strings stored in
+                Arrow arrays. Defaults to None, i.e. object columns
+
+        Raises:
+            ValueError: There are more columns than column names or the dtype is unknown
+
+        Returns:
+            DataFrame: The data frame, of which the cells of the columns without any
+                cell are missing
+        """
+        if dtype not in (None, "category", "string[pyarrow]"):
+            raise ValueError(f"Unknown dtype {dtype!r} of the columns")
+        self.check_columns(columns)
+        if dtype == "string[pyarrow]":
+            import pyarrow as pa
+
+        arrays = dict()
+        for column in range(len(columns)):
+            if dtype == "string[pyarrow]":
+                if column >= self.n_columns:
+                    strings = pa.nulls(self.n_rows, type=pa.string())
+                elif self.plain[column] is not None:
+                    strings = pa.array(self.get_column(column), type=pa.string())
+                else:
+                    strings = self.get_arrow_array(column).dictionary_decode()
+                arrays[column] = pd.arrays.ArrowStringArray(strings)
+            elif column >= self.n_columns:
+                arrays[column] = np.full(self.n_rows, None, dtype=object)
+            elif dtype == "category":
+                arrays[column] = self.get_categorical(column)
+            else:
+                arrays[column] = self.get_column(column)
+        data_df = pd.DataFrame(arrays, copy=False)
+        data_df.columns = columns
+        return data_df
+
+    def to_arrow(self, columns: list):
+        """
+        Convert the rows to an Arrow table with a dictionary encoded string column per
+        column, without decoding the cells
+
+        Args:
+            columns (list): The column names
+
+        Notes:
+            * pyarrow is an optional dependency, which is only imported here
+
+        Returns:
+            pyarrow.Table: The table, in which the missing cells are null
+        """
+        import pyarrow as pa
+
+        self.check_columns(columns)
+        arrays = list()
+        for column in range(len(columns)):
+            if column >= self.n_columns:
+                arrays.append(pa.nulls(self.n_rows, type=pa.string()))
+            else:
+                arrays.append(self.get_arrow_array(column))
+        # Arrow allows duplicate column names
+        return pa.Table.from_arrays(arrays, names=[str(name) for name in columns])
+
+
+def add_cell_spans(spans: list, row: int, cells: list):
+    """
+    Add the multicolumn and multirow cells of a row to the spans of a tabular
+
+    Args:
+        spans (list): The spans of the tabular as row, column, number of rows and number
+            of columns
+        row (int): The number of the row in the tabular
+        cells (list): The raw cells of the row
+    """
+    for column, n_row, n_col in get_cell_spans(cells):
+        if n_row < 0:
+            # the text is at the bottom of the rows above
+            spans.append((row + n_row + 1, column, -n_row, n_col))
+        else:
+            spans.append((row, column, max(n_row, 1), n_col))
+
+
+def read_tabular_lines(
+    lines: Iterable[str],
+    aliases: Union[dict, None] = None,
+    chunk_size: int = 10000,
+    macro_rules: Union[MacroRules, None] = None,
+    spans: Union[list, None] = None,
+) -> Iterator[list]:
+    """
+    Clean the lines of a tabular and yield the rows in chunks
+
+    Args:
+        lines (iterable): The lines of the tabular, for instance an open file
+        aliases (dict, optional): Dictionary to which the newcommand aliases found in
+            the lines are added. The aliases are applied to all rows following the
+            definition. Defaults to None, in which case a new dictionary is used
+        chunk_size (int, optional): Maximum number of rows per chunk. Defaults to 10000
+        macro_rules (MacroRules, optional): The rules of the macros in the cells.
+            Defaults to :data:`DEFAULT_MACRO_RULES`
+        spans (list, optional): List to which the multicolumn and multirow cells are
+            added as the row, column, number of rows and number of columns they span.
+            The first row is the header row. Defaults to None, i.e. the spans are not
+            collected
+
+    Notes:
+        * The first row of the first chunk is the header row of the tabular
+        * The lines are split into rows and cells by a *TabularTokenizer*, so a row may
+          span several lines
+        * Only one chunk of rows is kept in memory
+        * The debug messages of the lines are only formatted with debug logging enabled
+
+    Yields:
+        list: A chunk of rows, each row being a list with the cleaned cells
+    """
+
+    if aliases is None:
+        aliases = AliasDict()
+
+    debug = _logger.isEnabledFor(logging.DEBUG)
+    profile = profiling.get_profile()
+    if profile is None:
+        clean_cells = clean_the_cells
+    else:
+        clean_cells = profile.timed("clean", clean_the_cells)
+
+    tokenizer = TabularTokenizer()
+    rows = list()
+    n_rows = 0
+
+    for line in lines:
+        clean_line = line.strip()
+
+        if clean_line.startswith("%") or clean_line == "":
+            continue
+        if debug:
+            match = re.search("caption{(.*)}", clean_line)
+            if match is not None:
+                caption = match.group(1)
+                _logger.debug(f"CAPTION : {caption}")
+
+        if "newcommand" in clean_line:
+            alias, pattern = get_new_command(clean_line, macro_rules=macro_rules)
+            aliases[alias] = pattern
+            if debug:
+                _logger.debug(f"alias {alias} -> {pattern}")
+            continue
+
+        # hyperref halen we weg
+        # de pattern '\\hyperref[mijnref]{content cell}' vervangen we met 'content cell'
+        if "\\hyperref" in clean_line:
+            clean_line = HYPERREF_PATTERN.sub(r"\1", clean_line)
+
+        line_rows = tokenizer.feed(clean_line)
+        for cells in line_rows:
+            if spans is not None:
+                add_cell_spans(spans, n_rows, cells)
+            rows.append(clean_cells(cells, aliases, macro_rules))
+            n_rows += 1
+        if debug:
+            if line_rows or tokenizer.cells:
+                _logger.debug(f"INSIDE : {clean_line}")
+            else:
+                _logger.debug(f"OUTSIZE : {clean_line}")
+        if len(rows) >= chunk_size:
+            yield rows
+            rows = list()
+
+    if (cells := tokenizer.close()) is not None:
+        if spans is not None:
+            add_cell_spans(spans, n_rows, cells)
+        rows.append(clean_cells(cells, aliases, macro_rules))
+    if rows:
+        yield rows
+
+
+def is_file_object(source) -> bool:
+    """
+    Check whether a source is a file object instead of the name of a file
+    """
+    return hasattr(source, "read")
+
+
+def get_text_stream(source, encoding: str = "utf-8") -> IO[str]:
+    """
+    Get a text stream of the LaTeX code in memory or of a file object
+
+    Args:
+        source (str, bytes or file object): The LaTeX code, the LaTeX code encoded as
+            bytes or a text or binary file object
+        encoding (str, optional): Encoding of the bytes or the binary file object.
+            Defaults to "utf-8"
+
+    Notes:
+        * A binary file object is decoded while it is read, without closing it
+          afterwards
+
+    Returns:
+        file object: A text stream which yields the lines of the LaTeX code
+    """
+    if isinstance(source, str):
+        return io.StringIO(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.StringIO(bytes(source).decode(encoding))
+    if isinstance(source, (io.TextIOBase, codecs.StreamReader)):
+        return source
+    if isinstance(source, (io.RawIOBase, io.BufferedIOBase)) or "b" in getattr(
+        source, "mode", ""
+    ):
+        return codecs.getreader(encoding)(source)
+    return source
+
+
+def get_source_name(input_filename) -> str:
+    """
+    Get the name of a tabular file or file object for the log messages and the data
+    frame attributes
+    """
+    if is_file_object(input_filename):
+        return str(getattr(input_filename, "name", "<stream>"))
+    return str(input_filename)
+
+
+@contextmanager
+def open_tabular_file(input_filename, encoding: str = "utf-8") -> Iterator[IO[str]]:
+    """
+    Open a tabular file, or read from a file object which is left open
+
+    Args:
+        input_filename (str, Path or file object): Name of the LaTeX file or a text or
+            binary file object
+        encoding (str, optional): Encoding of the file. Defaults to "utf-8"
+
+    Yields:
+        file object: The text stream of the file
+    """
+    if is_file_object(input_filename):
+        yield get_text_stream(input_filename, encoding=encoding)
+    else:
+        with open(input_filename, encoding=encoding) as fp:
+            yield fp
+
+
+def read_tabular_chunks(
+    input_filename: Union[str, Path, IO],
+    aliases: Union[dict, None] = None,
+    encoding: str = "utf-8",
+    chunk_size: int = 10000,
+    macro_rules: Union[MacroRules, None] = None,
+    spans: Union[list, None] = None,
+) -> Iterator[list]:
+    """
+    Read the tabular file line by line and yield the cleaned rows in chunks
+
+    Args:
+        input_filename (str, Path or file object): Name of the LaTeX tabular file or a
+            text or binary file object
+        aliases (dict, optional): Dictionary to which the newcommand aliases found in
+            the file are added. The aliases are applied to all rows following the
+            definition. Defaults to None, in which case a new dictionary is used
+        encoding (str, optional): Encoding of the input file. Defaults to "utf-8"
+        chunk_size (int, optional): Maximum number of rows per chunk. Defaults to 10000
+        macro_rules (MacroRules, optional): The rules of the macros in the cells.
+            Defaults to :data:`DEFAULT_MACRO_RULES`
+        spans (list, optional): List to which the multicolumn and multirow cells are
+            added, see *read_tabular_lines*. Defaults to None
+
+    Notes:
+        * The first row of the first chunk is the header row of the tabular
+        * Only one chunk of rows is kept in memory, the file is never read as a whole
+
+    Yields:
+        list: A chunk of rows, each row being a list with the cleaned cells
+    """
+
+    _logger.debug(f"Reading file {get_source_name(input_filename)}")
+    with open_tabular_file(input_filename, encoding=encoding) as fp:
+        yield from read_tabular_lines(
+            fp,
+            aliases=aliases,
+            chunk_size=chunk_size,
+            macro_rules=macro_rules,
+            spans=spans,
+        )
+
+
+def rows_to_data_frame(
+    row_chunks: Iterable[list],
+    aliases: Union[dict, None] = None,
+    multi_index: bool = False,
+    search_and_replace: Union[dict, None] = None,
+    top_row_merge: bool = False,
+    source: str = "",
+    convert_numbers: bool = False,
+    decimal: str = ",",
+    macro_rules: Union[MacroRules, None] = None,
+    spans: Union[list, None] = None,
+    dtype_backend: str = "numpy",
+) -> DataFrame:
+    """
+    Convert the cleaned rows of a tabular to a data frame
+
+    Args:
+        row_chunks (iterable): The chunks of rows as yielded by *read_tabular_lines*.
+            The first row is the header
+        aliases (dict, optional): The newcommand aliases of the tabular. Defaults to
+            None
+        multi_index (bool, optional): Convert the index into a multi index based on the first 2 columns. Defaults to
+            False.
+        search_and_replace (dict, optional): The search and replace strings stored in a dictionary. Defaults to None.
+        top_row_merge (bool, optional). Merge the top rows in the rows are multirow headers
+        source (str, optional): Description of the tabular used in error messages
+        convert_numbers (bool, optional): Convert the columns with numbers to numbers,
+            see *convert_numeric_columns*. Defaults to False
+        decimal (str, optional): The decimal separator of the numbers. Defaults to ","
+        macro_rules (MacroRules, optional): The rules with which the rows were cleaned.
+            The properties of its format rules are stored in the *cell_formats*
+            attribute of the data frame. Defaults to None
+        spans (list, optional): The multicolumn and multirow cells collected while
+            reading the rows, see *read_tabular_lines*. The spans of the cells below the
+            header are stored in the *cell_spans* attribute of the data frame as row,
+            column, number of rows and number of columns, counting the rows below the
+            header and the columns including the index. Defaults to None
+        dtype_backend (str, optional): Store the cells as Python strings in object
+            columns with "numpy", or as *string[pyarrow]* columns with "pyarrow", of
+            which the patterns are replaced with the Arrow compute kernels. Defaults to
+            "numpy"
+
+    Notes:
+        * The chunks of rows are stored as codes of the distinct cells per column, see
+          *ColumnarRows*, and only decoded once to build the data frame
+        * With *top_row_merge*, the column names are built from the two header rows
+          without transposing the data
+        * The pyarrow backend requires the optional pyarrow package. The cells are the
+          same as with the numpy backend, except that the missing ones are *pd.NA*
+          instead of None
+
+    Raises:
+        ValueError: The dtype backend is unknown
+        ImportError: The pyarrow backend is used without pyarrow installed
+
+    Returns:
+        DataFrame: The cleaned tubular data stored in a dataframe
+    """
+    if dtype_backend not in DTYPE_BACKENDS:
+        raise ValueError(
+            f"The dtype backend must be one of {DTYPE_BACKENDS}, not {dtype_backend!r}"
+        )
+    if dtype_backend == "pyarrow":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as err:
+            raise ImportError(
+                "The pyarrow dtype backend requires pyarrow, install it with "
+                "pip install tabular2xls[arrow]"
+            ) from err
+
+    header_row = None
+    index_columns = None
+    empty_column_names = False
+    columnar_rows = ColumnarRows()
+
+    profile = profiling.get_profile()
+    if profile is not None:
+        row_chunks = profile.timed_iterator("read", row_chunks)
+
+    for rows in row_chunks:
+        if header_row is None:
+            header_row = rows.pop(0)
+            index_columns = header_row[0]
+            if multi_index:
+                if header_row[0] == "":
+                    header_row[0] = "l1"
+                if header_row[1] == "":
+                    header_row[1] = "l2"
+                index_columns = ["l1", "l2"]
+                empty_column_names = True
+            elif index_columns in header_row[1:]:
+                _logger.warning(
+                    f"Your index columns has the same value '{index_columns}' as a "
+                    "column name. This might cause problems. Replacing now with index"
+                )
+                index_columns = "index"
+                header_row[0] = index_columns
+        with profiling.stage("build"):
+            columnar_rows.extend(rows)
+        # the rows of this chunk are not needed anymore now they are stored as codes
+        del rows
+
+    if header_row is None:
+        raise ValueError(f"No tabular rows found in {source}")
+
+    with profiling.stage("build"):
+        table_df = columnar_rows.to_data_frame(
+            header_row, dtype="string[pyarrow]" if dtype_backend == "pyarrow" else None
+        )
+        del columnar_rows
+    profiling.count("rows", table_df.shape[0])
+
+    if top_row_merge:
+        with profiling.stage("top_row_merge"):
+            # De eerste rij beschouwen als een multi column. Fix dat: the first data row
+            # holds the column names below the top row, which are prefixed with the name
+            # above the first column
+            sub_header = table_df.iloc[0].to_list()
+            top_name = header_row[1]
+            table_df = table_df.iloc[1:, 1:].set_axis(
+                pd.Index(table_df.iloc[1:, 0], name=sub_header[0])
+            )
+            table_df.columns = ["/".join([top_name, name]) for name in sub_header[1:]]
+    else:
+        with profiling.stage("build"):
+            table_df.set_index(index_columns, drop=True, inplace=True)
+            if empty_column_names:
+                table_df.index = table_df.index.rename(["", ""])
+    profiling.count("cells", table_df.size)
+    if macro_rules is not None and macro_rules.formats:
+        # the column names are written with the header format
+        table_df.columns = table_df.columns.map(remove_format_markers)
+        table_df.index.names = [
+            remove_format_markers(name) for name in table_df.index.names
+        ]
+
+    with profiling.stage("substitute"):
+        table_df = substitute_patterns(
+            table_df, aliases=aliases, search_and_replace=search_and_replace
+        )
+    if convert_numbers:
+        with profiling.stage("convert_numbers"):
+            table_df = convert_numeric_columns(table_df, decimal=decimal)
+    if macro_rules is not None and macro_rules.formats:
+        table_df.attrs["cell_formats"] = dict(macro_rules.formats)
+    if spans:
+        n_header = 2 if top_row_merge else 1
+        last_row = table_df.shape[0] - 1
+        cell_spans = list()
+        for row, column, n_row, n_col in spans:
+            first = max(row - n_header, 0)
+            last = min(row - n_header + n_row - 1, last_row)
+            if last >= 0 and (last > first or n_col > 1):
+                cell_spans.append((first, column, last - first + 1, n_col))
+        if cell_spans:
+            table_df.attrs["cell_spans"] = cell_spans
+
+    return table_df
+
+
+def parse_tabular(
+    input_filename: Union[str, Path, IO],
+    multi_index: bool = False,
+    search_and_replace: Union[dict, None] = None,
+    encoding: str = "utf-8",
+    top_row_merge: bool = False,
+    chunk_size: int = 10000,
+    convert_numbers: bool = False,
+    decimal: str = ",",
+    macro_rules: Union[MacroRules, None] = None,
+    dtype_backend: str = "numpy",
+) -> DataFrame:
+    """
+    Read the tabular file and convert contents to a data frame
+
+    Args:
+        input_filename (str, Path or file object): Name of the LaTeX tabular file or a
+            text or binary file object. LaTeX code in memory is read from a
+            *io.StringIO* or *io.BytesIO*
+        multi_index (bool, optional): Convert the index into a multi index based on the
+            first 2 columns. Defaults to False.
+        search_and_replace (dict, optional): The search and replace strings stored in a
+            dictionary. Defaults to None.
+        encoding (str, optional): Encoding of the input file. Defaults to "utf-8"
+        top_row_merge (bool, optional). Merge the top rows in the rows are multirow
+            headers
+        chunk_size (int, optional): Number of rows which are parsed before they are
+            added to the data frame. Defaults to 10000
+        convert_numbers (bool, optional): Convert the columns with numbers to numbers,
+            see *convert_numeric_columns*. Defaults to False
+        decimal (str, optional): The decimal separator of the numbers. Defaults to ","
+        macro_rules (MacroRules, optional): The rules of the macros in the cells, see
+            *MacroRules*. Defaults to :data:`DEFAULT_MACRO_RULES`
+        dtype_backend (str, optional): Store the cells in object columns with "numpy" or
+            in *string[pyarrow]* columns with "pyarrow", see *rows_to_data_frame*.
+            Defaults to "numpy"
 
     Returns:
-        first_cell (str), n_col (int): The contents of the first cell and the number of following multicolumn cells
+        DataFrame: The cleaned tubular data stored in a dataframe
     """
-    if match := re.search("\\\\multicolumn{(.*?)}", clean_cell):
-        n_col = int(match.group(1))
-        new_match = re.sub("\\\\multicolumn{(.*?)}", "", clean_cell)
-        cell_format, first_cell = get_new_command(new_match)
-    else:
-        first_cell = clean_cell
-        n_col = None
-    return first_cell, n_col
 
-
-def get_new_command(line):
+    aliases = AliasDict()
+    spans = list()
+    row_chunks = read_tabular_chunks(
+        input_filename,
+        aliases=aliases,
+        encoding=encoding,
+        chunk_size=chunk_size,
+        macro_rules=macro_rules,
+        spans=spans,
+    )
+    return rows_to_data_frame(
+        row_chunks,
+        aliases=aliases,
+        multi_index=multi_index,
+        search_and_replace=search_and_replace,
+        top_row_merge=top_row_merge,
+        source=get_source_name(input_filename),
+        convert_numbers=convert_numbers,
+        decimal=decimal,
+        macro_rules=macro_rules,
+        spans=spans,
+        dtype_backend=dtype_backend,
+    )
+
+
+class TabularEnvironment:
     """
-    Get the contents of a LaTeX newcommand definition
+    A tabular environment of a LaTeX document
 
     Args:
-        line (str):  Line potentially containing a newcommand definition
-
-    Returns:
+        number (int): Sequence number of the tabular in the document, starting at 1
+        aliases (dict, optional): The newcommand aliases defined in the document before
+            the tabular
 
+    Attributes:
+        lines (list): The lines of the environment, from the begin up to and including
+            the end of the tabular
+        caption (str or None): The cleaned caption of the table to which the tabular
+            belongs
+        label (str or None): The label of the table to which the tabular belongs
     """
 
-    parse_alias = True
-    alias = list()
-    pattern = list()
-    curl_level = 0
-    for char in list(line):
-        if char == "{":
-            curl_level += 1
-        elif char == "}":
-            curl_level -= 1
+    def __init__(self, number: int, aliases: Union[dict, None] = None):
+        """
+        Constructor of the TabularEnvironment class
+        """
+        self.number = number
+        self.aliases = dict(aliases) if aliases is not None else dict()
+        self.lines = list()
+        self.caption = None
+        self.label = None
+
+    def __repr__(self):
+        return (
+            f"TabularEnvironment(number={self.number}, caption={self.caption!r}, "
+            f"label={self.label!r}, n_lines={len(self.lines)})"
+        )
 
-        if curl_level > 0:
-            if parse_alias:
-                alias.append(char)
-            else:
-                pattern.append(char)
-        else:
-            if alias:
-                parse_alias = False
 
-    alias = "".join(alias)
-    pattern = "".join(pattern)
+def get_command_argument(line: str, command: str) -> Union[str, None]:
+    """
+    Get the argument of a LaTeX command, which may contain nested braces
 
-    clean_patterns = clean_the_cells([alias, pattern])
+    Args:
+        line (str): The line with the command
+        command (str): Name of the command without backslash, such as *caption*
 
-    return clean_patterns
+    Notes:
+        * An optional argument between square brackets is skipped
+        * An argument which is not closed on the same line runs until the end of the
+          line
+
+    Returns:
+        str or None: The argument of the first occurrence of the command or None if the
+            command is not found
+    """
+    match = re.search(r"\\" + command + r"\*?(?:\[[^\]]*\])?(?={)", line)
+    if match is None:
+        return None
+    start, end = get_brace_groups(line[match.end() :], max_groups=1)[0]
+    return line[match.end() + start : match.end() + end]
 
 
-def clean_the_cells(cells, aliases=None):
+def read_tabular_environments(
+    input_filename: Union[str, Path, IO],
+    encoding: str = "utf-8",
+    macro_rules: Union[MacroRules, None] = None,
+) -> list:
     """
-    Remove all spurious latex code from cell contents
+    Scan a LaTeX document once and collect all its tabular environments
 
     Args:
-        cells (list): List of cells containing strings to be cleaned
-        aliases (dict, optional): If aliases are passed (default None), all strings will be cleaned with the
-            replacements defined in the aliases
+        input_filename (str, Path or file object): Name of the LaTeX document or a text
+            or binary file object
+        encoding (str, optional): Encoding of the document. Defaults to "utf-8"
+        macro_rules (MacroRules, optional): The rules of the macros in the captions and
+            aliases. Defaults to :data:`DEFAULT_MACRO_RULES`
+
+    Notes:
+        * Both *tabular* and *cbstabular* environments are collected, including their
+          starred and *x* variants. Tabulars nested in a tabular are part of the outer
+          one
+        * The caption and label of a table or figure float belong to the tabular in that
+          float, no matter whether they are given before or after it. Outside a float, a
+          caption belongs to the next tabular
+        * The newcommand aliases defined before a tabular are passed on with it
 
     Returns:
-        list: The new cell contents
+        list: The TabularEnvironment objects in order of appearance
     """
 
-    clean_cells = list()
-    for cell in cells:
-        clean_cell = replace_textsuper(cell)
-        clean_cell, n_col = get_multicolumns(clean_cell)
-        clean_cell = clean_cell.replace("\\rowcolor{white}", "")
-        clean_cell = clean_cell.replace("\\cornercell{", "")
-        clean_cell = clean_cell.replace("\\normalsize{", "")
-        clean_cell = clean_cell.replace("\\textbf{", "")
-        clean_cell = clean_cell.replace("\\emph{", "")
-        clean_cell = clean_cell.replace("\\python{", "")
-        clean_cell = clean_cell.replace("\\textemdash", "-")
-        clean_cell = clean_cell.replace("\\textendash", "-")
-        clean_cell = clean_cell.replace("\\numprint{", "")
-        clean_cell = re.sub(r"\\hspace{.*?}", "", clean_cell)
-        clean_cell = re.sub(r"\\vspace{.*?}", "", clean_cell)
-        clean_cell = clean_cell.replace("}", "")
-        clean_cell = clean_cell.replace("{", "")
-        clean_cell = clean_cell.replace("\\", "")
-        clean_cell = clean_cell.replace("--", "-")
-
-        if aliases is not None:
-            for alias, pattern in aliases.items():
-                if match := re.match(alias, clean_cell):
-                    clean_cell = clean_cell.replace(alias, pattern)
-
-        clean_cells.append(clean_cell.strip())
-        if n_col is not None and n_col > 1:
-            for ii in range(1, n_col):
-                clean_cells.append("")
+    environments = list()
+    aliases = dict()
+    environment = None
+    depth = 0
+    # caption and label which are waiting for the next tabular and the last tabular of
+    # the current float
+    caption = label = None
+    float_tabular = None
+
+    with open_tabular_file(input_filename, encoding=encoding) as fp:
+        for line in fp:
+            clean_line = line.strip()
+            if clean_line.startswith("%") or clean_line == "":
+                continue
+
+            if environment is not None:
+                environment.lines.append(clean_line)
+                depth += len(BEGIN_TABULAR_PATTERN.findall(clean_line))
+                depth -= len(END_TABULAR_PATTERN.findall(clean_line))
+                if depth <= 0:
+                    environments.append(environment)
+                    environment = None
+                continue
+
+            if BEGIN_FLOAT_PATTERN.search(clean_line):
+                caption = label = float_tabular = None
+
+            if "newcommand" in clean_line:
+                alias, pattern = get_new_command(clean_line, macro_rules=macro_rules)
+                aliases[alias] = pattern
+
+            if (new_caption := get_command_argument(clean_line, "caption")) is not None:
+                new_caption = clean_the_cells([new_caption], aliases, macro_rules)[0]
+                if float_tabular is not None and float_tabular.caption is None:
+                    float_tabular.caption = new_caption
+                else:
+                    caption = new_caption
+            if (new_label := get_command_argument(clean_line, "label")) is not None:
+                if float_tabular is not None and float_tabular.label is None:
+                    float_tabular.label = new_label
+                else:
+                    label = new_label
+
+            if END_FLOAT_PATTERN.search(clean_line):
+                caption = label = float_tabular = None
+
+            if BEGIN_TABULAR_PATTERN.search(clean_line):
+                environment = TabularEnvironment(len(environments) + 1, aliases)
+                environment.caption, environment.label = caption, label
+                caption = label = None
+                float_tabular = environment
+                environment.lines.append(clean_line)
+                depth = len(BEGIN_TABULAR_PATTERN.findall(clean_line))
+                depth -= len(END_TABULAR_PATTERN.findall(clean_line))
+                if depth <= 0:
+                    environments.append(environment)
+                    environment = None
+
+    if environment is not None:
+        _logger.warning(f"Tabular {environment.number} is not closed")
+        environments.append(environment)
+
+    _logger.debug(
+        f"Found {len(environments)} tabulars in {get_source_name(input_filename)}"
+    )
+    return environments
+
+
+def get_sheet_names(environments: list) -> list:
+    """
+    Get a valid and unique sheet name for each tabular environment
 
-    return clean_cells
+    Args:
+        environments (list): The TabularEnvironment objects
 
+    Notes:
+        * The name is taken from the caption, the label or else the sequence number of
+          the tabular. Characters which are not allowed in a sheet name are replaced and
+          the name is cut at 31 characters
+        * Sheet names are unique regardless of their case, so a number is appended to
+          duplicate names
 
-def parse_tabular(
-    input_filename: Union[str, Path],
+    Returns:
+        list: The sheet names in the order of the environments
+    """
+    sheet_names = list()
+    used_names = set()
+    for environment in environments:
+        name = environment.caption or environment.label or ""
+        name = INVALID_SHEET_CHARACTERS_PATTERN.sub("_", name)
+        name = " ".join(name.split()).strip("'")
+        if not name:
+            name = f"Tabular {environment.number}"
+        sheet_name = name[:MAX_SHEET_NAME_LENGTH]
+        count = 1
+        while sheet_name.lower() in used_names:
+            count += 1
+            suffix = f" ({count})"
+            sheet_name = name[: MAX_SHEET_NAME_LENGTH - len(suffix)] + suffix
+        used_names.add(sheet_name.lower())
+        sheet_names.append(sheet_name)
+    return sheet_names
+
+
+def parse_tabular_environment(
+    environment: TabularEnvironment,
     multi_index: bool = False,
     search_and_replace: Union[dict, None] = None,
-    encoding: str = "utf-8",
     top_row_merge: bool = False,
+    convert_numbers: bool = False,
+    decimal: str = ",",
+    macro_rules: Union[MacroRules, None] = None,
+    dtype_backend: str = "numpy",
 ) -> DataFrame:
     """
-    Read the tabular file and convert contents to a data frame
+    Convert the contents of a tabular environment to a data frame
 
     Args:
-        input_filename (str or Path): Name of the LaTeX tabular file.
-        multi_index (bool, optional): Convert the index into a multi index based on the first 2 columns. Defaults to
-            False.
-        search_and_replace (dict, optional): The search and replace strings stored in a dictionary. Defaults to None.
-        encoding (str, optional): Encoding of the input file. Defaults to "utf-8"
-        top_row_merge (bool, optional). Merge the top rows in the rows are multirow headers
+        environment (TabularEnvironment): The tabular environment
+        multi_index (bool, optional): Convert the index into a multi index. Defaults to
+            False
+        search_and_replace (dict, optional): The search and replace strings. Defaults to
+            None
+        top_row_merge (bool, optional): Merge the top rows. Defaults to False
+        convert_numbers (bool, optional): Convert the columns with numbers to numbers.
+            Defaults to False
+        decimal (str, optional): The decimal separator of the numbers. Defaults to ","
+        macro_rules (MacroRules, optional): The rules of the macros in the cells.
+            Defaults to :data:`DEFAULT_MACRO_RULES`
+        dtype_backend (str, optional): The dtype backend of the cells, "numpy" or
+            "pyarrow". Defaults to "numpy"
 
     Returns:
-        DataFrame: The cleaned tubular data stored in a dataframe
+        DataFrame: The cleaned tabular data
     """
+    aliases = AliasDict(environment.aliases)
+    spans = list()
+    return rows_to_data_frame(
+        read_tabular_lines(
+            environment.lines, aliases=aliases, macro_rules=macro_rules, spans=spans
+        ),
+        aliases=aliases,
+        multi_index=multi_index,
+        search_and_replace=search_and_replace,
+        top_row_merge=top_row_merge,
+        source=f"tabular {environment.number}",
+        convert_numbers=convert_numbers,
+        decimal=decimal,
+        macro_rules=macro_rules,
+        spans=spans,
+        dtype_backend=dtype_backend,
+    )
+
+
+def parse_tabular_document(
+    input_filename: Union[str, Path, IO],
+    multi_index: bool = False,
+    search_and_replace: Union[dict, None] = None,
+    encoding: str = "utf-8",
+    top_row_merge: bool = False,
+    jobs: int = 1,
+    convert_numbers: bool = False,
+    decimal: str = ",",
+    macro_rules: Union[MacroRules, None] = None,
+    dtype_backend: str = "numpy",
+) -> dict:
+    """
+    Read all tabulars of a LaTeX document and convert each of them to a data frame
 
-    _logger.debug(f"Reading file {input_filename}")
-    with open(input_filename, encoding=encoding) as fp:
-        lines = fp.readlines()
-    rows = list()
-    header_row = None
-
-    aliases = dict()
-
-    for line in lines:
-        clean_line = line.strip()
-
-        if clean_line.startswith("%") or clean_line == "":
-            continue
-        match = re.search("caption{(.*)}", clean_line)
-        if match is not None:
-            caption = match.group(1)
-            _logger.debug(f"CAPTION : {caption}")
-
-        match = re.search("newcommand", clean_line)
-        if match is not None:
-            alias, pattern = get_new_command(clean_line)
-            aliases[alias] = pattern
-            _logger.debug(f"alias {alias} -> {pattern}")
+    Args:
+        input_filename (str, Path or file object): Name of the LaTeX document or a text
+            or binary file object
+        multi_index (bool, optional): Convert the index into a multi index. Defaults to
+            False
+        search_and_replace (dict, optional): The search and replace strings. Defaults to
+            None
+        encoding (str, optional): Encoding of the document. Defaults to "utf-8"
+        top_row_merge (bool, optional): Merge the top rows. Defaults to False
+        jobs (int, optional): Number of processes used to parse the tabulars. Defaults
+            to 1
+        convert_numbers (bool, optional): Convert the columns with numbers to numbers.
+            Defaults to False
+        decimal (str, optional): The decimal separator of the numbers. Defaults to ","
+        macro_rules (MacroRules, optional): The rules of the macros in the cells.
+            Defaults to :data:`DEFAULT_MACRO_RULES`
+        dtype_backend (str, optional): The dtype backend of the cells, "numpy" or
+            "pyarrow". Defaults to "numpy"
 
-        # hyperref halen we weg
-        # de pattern '\\hyperref[mijnref]{content cell}' vervangen we met 'content cell'
-        clean_line = re.sub(r"\\hyperref\[.*\]{(.*)}", r"\1", clean_line)
+    Notes:
+        * Tabulars without any row with cells, such as a single column list, are skipped
+        * When a profile is collected with more than one job, the times of the workers
+          are added to it
 
-        cells = clean_line.split("&")
-        if len(cells) > 1:
-            clean_cells = clean_the_cells(cells, aliases)
-            if header_row is None:
-                header_row = clean_cells
+    Returns:
+        dict: The data frames keyed on their sheet name, in order of appearance in the
+            document
+    """
+    source = get_source_name(input_filename)
+    environments = list()
+    with profiling.stage("read"):
+        for environment in read_tabular_environments(
+            input_filename, encoding=encoding, macro_rules=macro_rules
+        ):
+            if any("&" in line for line in environment.lines):
+                environments.append(environment)
             else:
-                rows.append(clean_cells)
-            _logger.debug(f"INSIDE : {clean_line}")
-        else:
-            _logger.debug(f"OUTSIZE : {clean_line}")
-
-    index_columns = header_row[0]
-    empty_column_names = False
-    if multi_index:
-        if header_row[0] == "":
-            header_row[0] = "l1"
-        if header_row[1] == "":
-            header_row[1] = "l2"
-        table_df = pd.DataFrame.from_records(rows, columns=header_row)
-        index_columns = ["l1", "l2"]
-        empty_column_names = True
-    else:
-        if index_columns in header_row[1:]:
-            _logger.warning(
-                f"Your index columns has the same value '{index_columns}' as a column name. "
-                "This might cause problems. Replacing now with index"
-            )
-            index_columns = "index"
-            header_row[0] = index_columns
-        table_df = pd.DataFrame.from_records(rows, columns=header_row)
-
-    if top_row_merge:
-        # De eerste rij beschouwen als een multi column. Fix dat
-        table_df = table_df.T.reset_index()
-        first_two_columns = table_df.columns[:2].to_list()
-        table_df = table_df.set_index(first_two_columns)
-        table_df.index = table_df.index.rename(["", ""])
-        table_df = table_df.T
-        first_single_col = table_df.columns[:1].to_list()
-        name = first_single_col[0][1]
-        table_df.set_index(first_single_col, drop=True, inplace=True)
-        table_df.index = table_df.index.rename(name)
-        top_name = table_df.columns[0][0]
-        new_columns = ["/".join([top_name, mc[1]]) for mc in table_df.columns]
-        table_df.columns = new_columns
-    else:
-        table_df.set_index(index_columns, drop=True, inplace=True)
-        if empty_column_names:
-            table_df.index = table_df.index.rename(["", ""])
-
-    for alias, pattern in aliases.items():
-        for col_name in table_df.columns:
-            try:
-                alias_exact = "^" + alias + "$"
-                table_df[col_name] = table_df[col_name].str.replace(
-                    alias_exact, pattern, regex=True
+                _logger.warning(
+                    f"Skipping tabular {environment.number} of {source}: no rows found"
                 )
-            except AttributeError:
-                pass
-
-    if search_and_replace is not None:
-        # to make sure that also regex in the index are replaced, reset is needed
-        index_names = list(table_df.index.names)
-        column_names = list(table_df.columns)
-        new_column_names = column_names.copy()
-        new_index_names = index_names.copy()
-        table_df.reset_index(inplace=True)
-        # replace all the search strings
-        for search, replace in search_and_replace.items():
-            table_df.replace(search, replace, regex=True, inplace=True)
-            new_index_names = [
-                re.sub(search, replace, name) for name in new_index_names
-            ]
-            new_names_columns = [
-                re.sub(search, replace, name) for name in new_column_names
-            ]
-
-        # put back
-        table_df.set_index(index_columns, inplace=True, drop=True)
-
-        if not all(x == y for x, y in zip(column_names, new_names_columns)):
-            table_df.columns = new_names_columns
-        if not all(x == y for x, y in zip(index_names, new_index_names)):
-            table_df.index.names = new_index_names
+    if not environments:
+        raise ValueError(f"No tabular environments found in {source}")
+
+    parse_environment = partial(
+        parse_tabular_environment,
+        multi_index=multi_index,
+        search_and_replace=search_and_replace,
+        top_row_merge=top_row_merge,
+        convert_numbers=convert_numbers,
+        decimal=decimal,
+        macro_rules=macro_rules,
+        dtype_backend=dtype_backend,
+    )
+    if jobs > 1 and len(environments) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        profile = profiling.get_profile()
+        with ProcessPoolExecutor(max_workers=min(jobs, len(environments))) as executor:
+            if profile is None:
+                tabular_dfs = list(executor.map(parse_environment, environments))
+            else:
+                # the workers collect their own profiles, which are added to this one
+                tabular_dfs = list()
+                for tabular_df, worker_profile in executor.map(
+                    partial(profiling.run_profiled, parse_environment), environments
+                ):
+                    tabular_dfs.append(tabular_df)
+                    profile.merge(worker_profile)
+    else:
+        tabular_dfs = [parse_environment(environment) for environment in environments]
 
-    return table_df
+    return dict(zip(get_sheet_names(environments), tabular_dfs))
 
 
 class WorkBook:
@@ -387,6 +2663,11 @@ class WorkBook:
         title_format (workbook format or None) : setup for workbook
         section_heading (workbook format or None) : setup for workbook
         footer_format (workbook format or None) : setup for workbook
+        format_registry (dict): The cell formats created by :meth:`set_format`,
+            :meth:`get_number_format` and :meth:`get_cell_format`, keyed on their
+            properties
+        format_hits (int): Number of times a cell format was reused from the registry
+        format_misses (int): Number of times a new cell format was added to the workbook
     """
 
     def __init__(self, workbook):
@@ -413,6 +2694,9 @@ class WorkBook:
         self.title_format = None
         self.section_heading = None
         self.footer_format = None
+        self.format_registry = dict()
+        self.format_hits = 0
+        self.format_misses = 0
         self.add_styles()
 
     def add_styles(self):
@@ -557,12 +2841,18 @@ class WorkBook:
         )
         self.footer_format.set_top()
 
-    def set_format(self, color_name):
+    def set_format(self, color_name, base_style=None):
         """
         Add color codes to the workbook style
 
         Args:
             color_name (str):  Name of the color to add to this workbook
+            base_style (dict, optional): Properties of the format on top of which the
+                color is set. Defaults to a font size of 8
+
+        Notes:
+            * Each combination of color code and base style is only added once to the
+              workbook. Subsequent calls return the same format from the registry
 
         Returns:
             str: Cell format with the color code definition assigned to it
@@ -572,15 +2862,84 @@ class WorkBook:
         color_code = get_color_code(color_name)
 
         if color_code is not None:
-            # a color code was found. add it as a definition to the work book
-            cell_format = self.workbook.add_format({"font_size": 8})
-            cell_format.set_font_color(color_code)
+            if base_style is None:
+                base_style = {"font_size": 8}
+            format_key = (color_code, tuple(sorted(base_style.items())))
+            try:
+                cell_format = self.format_registry[format_key]
+            except KeyError:
+                # a color code was found. add it as a definition to the work book
+                cell_format = self.workbook.add_format(base_style)
+                cell_format.set_font_color(color_code)
+                self.format_registry[format_key] = cell_format
+                self.format_misses += 1
+            else:
+                self.format_hits += 1
 
         else:
             cell_format = None
 
         return cell_format
 
+    def get_number_format(self, num_format: str):
+        """
+        Get the format of a column of numbers
+
+        Args:
+            num_format (str): The Excel number format, such as *#,##0.0*
+
+        Notes:
+            * Each number format is only added once to the workbook
+
+        Returns:
+            Format: Right aligned cell format with the number format
+        """
+        format_key = ("num_format", num_format)
+        try:
+            cell_format = self.format_registry[format_key]
+        except KeyError:
+            cell_format = self.workbook.add_format(
+                {
+                    "font": "arial",
+                    "align": "right",
+                    "font_size": 8,
+                    "border": 0,
+                    "num_format": num_format,
+                }
+            )
+            self.format_registry[format_key] = cell_format
+            self.format_misses += 1
+        else:
+            self.format_hits += 1
+        return cell_format
+
+    def get_cell_format(self, properties: dict):
+        """
+        Get the format of the cells of a format rule, see *MacroRules*
+
+        Args:
+            properties (dict): The xlsxwriter format properties on top of a font size
+                of 8, such as ``{"bold": True}``
+
+        Notes:
+            * Each set of properties is only added once to the workbook
+
+        Returns:
+            Format: The cell format
+        """
+        format_key = ("cell_format", tuple(sorted(properties.items())))
+        try:
+            cell_format = self.format_registry[format_key]
+        except KeyError:
+            cell_format = self.workbook.add_format(
+                {"font": "arial", "font_size": 8, **properties}
+            )
+            self.format_registry[format_key] = cell_format
+            self.format_misses += 1
+        else:
+            self.format_hits += 1
+        return cell_format
+
 
 def update_width(label, max_width=None):
     """
@@ -600,7 +2959,139 @@ def update_width(label, max_width=None):
     return max_width
 
 
-def get_max_width(input_data, name, column_index=None):
+def get_character_width(character: str) -> float:
+    """
+    Determine the display width of a single character
+
+    Args:
+        character (str): The character to measure
+
+    Returns:
+        float: The width of the character in number of normal characters
+    """
+    if character in SUPERSCRIPT_GLYPHS:
+        return SUPERSCRIPT_WIDTH
+    if unicodedata.east_asian_width(character) in ("W", "F"):
+        return WIDE_CHARACTER_WIDTH
+    return 1
+
+
+@lru_cache()
+def get_width_table() -> np.ndarray:
+    """
+    Get the extra width of all characters of the basic multilingual plane
+
+    Notes:
+        * The table is built once on first use. The extra width is given in half
+          characters, such that it fits in a small integer
+
+    Returns:
+        np.ndarray: The extra width in half characters, indexed by the code point of the
+            character
+    """
+    width_table = np.zeros(0x10000, dtype=np.int8)
+    for code_point in range(0x80, 0x10000):
+        width_table[code_point] = 2 * get_character_width(chr(code_point)) - 2
+    return width_table
+
+
+def get_text_width(text: str) -> float:
+    """
+    Determine the display width of a string
+
+    Args:
+        text (str): The string to measure
+
+    Notes:
+        * East-Asian wide and full width characters count as two characters, the
+          superscript glyphs produced by *get_super* as half a character
+
+    Returns:
+        float: The width of the string in number of normal characters
+    """
+    if text.isascii():
+        return len(text)
+    return sum([get_character_width(character) for character in text])
+
+
+def get_values_width(
+    values,
+    sample_size: Union[int, None] = None,
+    random_state=0,
+    remove_markers: bool = False,
+):
+    """
+    Determine the maximum display width of the values of a column or an index level
+
+    Args:
+        values (Series, Index or array): The values to check
+        sample_size (int or None): If given and the column is longer than twice the
+            sample size, only the first *sample_size* values and a random sample of
+            *sample_size* of the remaining values are checked
+        random_state (int): Seed of the random sample, such that the width is
+            reproducible
+        remove_markers (bool): Remove the format markers from the values before
+            measuring them, see *remove_format_markers*
+
+    Notes:
+        * The length of an ASCII value is its width. The code points of the values with
+          non-ASCII characters are looked up at once in the table of *get_width_table*
+          and summed per value with numpy
+        * The values are not modified, the format markers are only removed from the
+          checked values
+
+    Returns:
+        int: The maximum width of the values, rounded up
+    """
+    values = pd.Series(values, copy=False)
+    if sample_size is not None and values.size > 2 * sample_size:
+        sample = values.iloc[sample_size:].sample(
+            n=sample_size, random_state=random_state
+        )
+        values = pd.concat([values.iloc[:sample_size], sample])
+    if values.empty:
+        return 0
+
+    texts = values.to_numpy(dtype=object)
+    if remove_markers:
+        texts = np.fromiter(
+            map(remove_format_markers, texts), dtype=object, count=texts.size
+        )
+    try:
+        is_ascii = np.fromiter(map(str.isascii, texts), dtype=bool, count=texts.size)
+    except TypeError:
+        texts = list(map(str, texts))
+        is_ascii = np.fromiter(map(str.isascii, texts), dtype=bool, count=len(texts))
+    lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+    max_width = int(lengths[is_ascii].max(initial=0))
+    if is_ascii.all():
+        return max_width
+
+    # the values with non-ASCII characters are measured per character
+    non_ascii = np.flatnonzero(~is_ascii)
+    non_ascii_texts = [texts[position] for position in non_ascii]
+    code_points = np.frombuffer(
+        "".join(non_ascii_texts).encode("utf-32-le", errors="surrogatepass"),
+        dtype=np.uint32,
+    )
+    extra_widths = get_width_table()[np.minimum(code_points, 0xFFFF)]
+    for position in np.flatnonzero(code_points > 0xFFFF):
+        character = chr(code_points[position])
+        extra_widths[position] = 2 * get_character_width(character) - 2
+    lengths = lengths[non_ascii]
+    starts = np.cumsum(lengths) - lengths
+    half_widths = 2 * lengths + np.add.reduceat(extra_widths, starts, dtype=np.int64)
+
+    return max(max_width, math.ceil(half_widths.max() / 2))
+
+
+def get_max_width(
+    input_data,
+    name,
+    column_index=None,
+    sample_size: Union[int, None] = None,
+    remove_markers: bool = False,
+):
     """
     Determine the maximum string in an index or column of a Dataframe
 
@@ -608,24 +3099,80 @@ def get_max_width(input_data, name, column_index=None):
         input_data (DataFrame):  The dataframe to check
         name (str): Name of the column to check
         column_index (int or None): Index of the column to check
+        sample_size (int or None): Only check the first and a random sample of the
+            values, see *get_values_width*
+        remove_markers (bool): Remove the format markers from the values before
+            measuring them
 
     Returns:
         int: The maximum width of this column or index
 
     """
-    max_col_width = len(name)
     if column_index is None:
         # get the values of the column based on the name of the column
         values = input_data[name]
     else:
         # get the values of the column based on the index of the column
         values = input_data.iloc[:, column_index]
-    for value in values:
-        col_width = len(str(value))
-        if col_width > max_col_width:
-            max_col_width = col_width
+    name_width = math.ceil(get_text_width(str(name)))
+
+    return max(
+        name_width,
+        get_values_width(
+            values, sample_size=sample_size, remove_markers=remove_markers
+        ),
+    )
+
+
+def get_level_labels(index, level: int):
+    """
+    Get the labels of an index level which are in use, without repeating them per row
+
+    Args:
+        index (Index or MultiIndex): The index
+        level (int): Number of the level
+
+    Returns:
+        Index: The labels of a multi index level in use, or the index itself if it has
+            one level
+    """
+    if index.nlevels == 1:
+        return index
+    codes = index.codes[level]
+    labels = index.levels[level].take(np.unique(codes[codes >= 0]))
+    if (codes < 0).any():
+        # missing labels are written as an empty cell
+        labels = labels.append(pd.Index([""]))
+    return labels
+
+
+def get_numbers_width(
+    values, python_format: str, sample_size: Union[int, None] = None
+) -> int:
+    """
+    Determine the maximum width of a column of numbers as shown in Excel
 
-    return max_col_width
+    Args:
+        values (Series): The numbers of the column, which may contain text placeholders
+        python_format (str): The Python format specification equivalent to the Excel
+            number format
+        sample_size (int or None): Only check the first and a random sample of the text
+            values, see *get_values_width*
+
+    Notes:
+        * The widest number is either the smallest or the largest one, so only those two
+          are formatted
+
+    Returns:
+        int: The maximum width of the formatted numbers and the text values
+    """
+    numbers = pd.to_numeric(values, errors="coerce")
+    is_number = numbers.notna().to_numpy()
+    widths = [get_values_width(values[~is_number], sample_size=sample_size)]
+    if is_number.any():
+        for number in (numbers.min(), numbers.max()):
+            widths.append(len(format(number, python_format)))
+    return max(widths)
 
 
 def find_color_name(line: str, minimal_color_length=2):
@@ -636,70 +3183,419 @@ def find_color_name(line: str, minimal_color_length=2):
         line (str): Line in which to find the color name
         minimal_color_length (int): Minimum color length
 
+    Notes:
+        * All prefixes of the line are looked up in the color index of
+          :func:`get_color_index`. In case more color names match, the one which comes
+          first in the color name list is returned, just like a linear scan over
+          :func:`get_color_names` would do.
+        * This is not the longest matching prefix: *darkred3* gives *dark* and
+          *greenyellow* gives *green*. The first match is kept for compatibility, since
+          the color is removed from the cell and a longer match would change the text
+          written to Excel
+
     Returns:
         str: The color found int the line
 
     """
     found_color = None
-    default_colors = get_color_names(min_color_length=minimal_color_length)
-    for color_name in default_colors:
-        if line.startswith(color_name):
-            found_color = color_name
+    found_position = None
+    color_positions, color_lengths = get_color_index(
+        min_color_length=minimal_color_length
+    )
+    for color_length in color_lengths:
+        if color_length > len(line):
             break
+        position = color_positions.get(line[:color_length])
+        if position is not None and (
+            found_position is None or position < found_position
+        ):
+            found_color = line[:color_length]
+            found_position = position
     return found_color
 
 
-def write_data_to_sheet_multiindex(
-    data_df: DataFrame, file_name: str | Path, sheet_name="Sheet"
-):
+def get_index_spans(index):
     """
-    Write the data to Excel file with format
+    Get the rows over which the labels of a multi index are merged
 
-     Args:
-         data_df (DataFrame): The dataframe to write to Excel
-         file_name (str): Name of the Excel file with format
-         sheet_name (str): Name of the sheet to write to
+    Args:
+        index (MultiIndex): The index to get the spans of
+
+    Notes:
+        * A label spans all following rows with the same label, or an empty label, as
+          long as the labels of the higher levels do not change. This is the same as the
+          merged cells of :meth:`DataFrame.to_excel`
 
+    Returns:
+        list: For each level a dictionary with the number of rows spanned by the label
+            starting at a row
     """
+    labels = [list(index.get_level_values(level)) for level in range(index.nlevels)]
+    n_rows = len(index)
+
+    # replace labels equal to the one above by an empty label, except on the last level
+    sparse_labels = [level_labels.copy() for level_labels in labels]
+    for row in range(1, n_rows):
+        for level in range(index.nlevels - 1):
+            if labels[level][row] != labels[level][row - 1]:
+                break
+            sparse_labels[level][row] = ""
+
+    level_spans = list()
+    new_span = [True] + [False] * (n_rows - 1)
+    for level_labels in sparse_labels:
+        spans = dict()
+        first_row = 0
+        for row, label in enumerate(level_labels):
+            if row > 0 and (new_span[row] or label != ""):
+                spans[first_row] = row - first_row
+                first_row = row
+                new_span[row] = True
+        if n_rows > 0:
+            spans[first_row] = n_rows - first_row
+        level_spans.append(spans)
+
+    return level_spans
+
+
+def get_object_values(values):
+    """
+    Get the values of a column as written to a sheet
 
-    with pd.ExcelWriter(file_name, engine="xlsxwriter") as writer:
+    Args:
+        values (Series): The values of the column
 
-        data_df.to_excel(excel_writer=writer, sheet_name=sheet_name)
+    Returns:
+        Series or ndarray: The values themselves, or an object array with None for the
+            missing values in case of a pandas string dtype, such as the Arrow backed
+            strings
+    """
+    if isinstance(values.dtype, pd.StringDtype):
+        return values.to_numpy(dtype=object, na_value=None)
+    return values
 
-        ExcelFormatter.header_style = None
 
-        workbook = writer.book
-        worksheet = writer.sheets[sheet_name]
+def get_object_index(index):
+    """
+    Get an index as written to a sheet
 
-        wb = WorkBook(workbook=workbook)
+    Args:
+        index (Index or MultiIndex): The index
 
-        # we now just reset the index such that we loop over column only
-        data_df.reset_index(inplace=True, allow_duplicates=True)
+    Returns:
+        Index or MultiIndex: The index itself, or with object levels instead of the
+            levels with a pandas string dtype, of which the missing labels are None
+    """
+    if index.nlevels == 1:
+        if not isinstance(index.dtype, pd.StringDtype):
+            return index
+        return pd.Index(index.to_numpy(dtype=object, na_value=None), name=index.name)
+    if not any(isinstance(level.dtype, pd.StringDtype) for level in index.levels):
+        return index
+    # the levels hold no missing labels, those have code -1
+    return index.set_levels(
+        [
+            level.astype(object) if isinstance(level.dtype, pd.StringDtype) else level
+            for level in index.levels
+        ]
+    )
+
+
+def write_sheet(
+    worksheet,
+    wb: WorkBook,
+    data_df: DataFrame,
+    constant_memory: bool = False,
+    width_sample_size: Union[int, None] = None,
+):
+    """
+    Write a data frame with format to a sheet
 
-        character_width = 1
-        start_row = 0
+    Args:
+        worksheet (Worksheet): The xlsxwriter worksheet to write to
+        wb (WorkBook): The formats of the workbook to which the sheet belongs
+        data_df (DataFrame): The dataframe to write
+        constant_memory (bool): The workbook is in constant memory mode, in which the
+            labels of a multi index and the multicolumn and multirow cells are not
+            merged
+        width_sample_size (int or None): Base the column widths on a sample of the rows,
+            see *get_values_width*
 
-        for col_idx, column_name in enumerate(data_df.columns):
-            col_width = get_max_width(
-                input_data=data_df, name=column_name, column_index=col_idx
-            )
-            _logger.info(f"Adjusting {column_name}/{col_idx} with width {col_width}")
+    Notes:
+        * The index and the columns are written in one pass over the rows. The first row
+          contains the index names and the column names. Each cell is written once, the
+          cells with a color or format one by one and the other cells of the row in runs
+        * Cells cleaned with a format rule are written with the format properties in the
+          *cell_formats* attribute of the data frame, on top of which a color can be set
+        * The multicolumn and multirow cells in the *cell_spans* attribute of the data
+          frame are merged with the cells they span. With a multi index, the spans in
+          the index columns are left to the merged index labels
+        * The columns and index levels with a pandas string dtype, such as
+          *string[pyarrow]*, are written as object values, with an empty cell for a
+          missing value
+    """
+    index = get_object_index(data_df.index)
+    if index.nlevels == 1:
+        index_names = [index.name if index.name is not None else "index"]
+    else:
+        index_names = [
+            name if name is not None else f"level_{level}"
+            for level, name in enumerate(index.names)
+        ]
+    header = index_names + list(data_df.columns)
+    number_formats = data_df.attrs.get("number_formats", dict())
+    cell_formats = data_df.attrs.get("cell_formats", dict())
+    # the format markers do not take any width
+    remove_markers = bool(cell_formats)
+
+    character_width = 1
+    start_row = 0
+    column_formats = list()
+
+    with profiling.stage("widths"):
+        for col_idx, column_name in enumerate(header):
             align = wb.left_align
+            if col_idx < index.nlevels:
+                col_width = max(
+                    math.ceil(get_text_width(str(column_name))),
+                    get_values_width(
+                        get_level_labels(index, col_idx),
+                        sample_size=width_sample_size,
+                        remove_markers=remove_markers,
+                    ),
+                )
+            elif column_name in number_formats:
+                excel_format, python_format = get_number_format(
+                    *number_formats[column_name]
+                )
+                align = wb.get_number_format(excel_format)
+                col_width = get_numbers_width(
+                    data_df.iloc[:, col_idx - index.nlevels],
+                    python_format,
+                    sample_size=width_sample_size,
+                )
+                col_width = max(math.ceil(get_text_width(str(column_name))), col_width)
+            else:
+                col_width = get_max_width(
+                    input_data=data_df,
+                    name=column_name,
+                    column_index=col_idx - index.nlevels,
+                    sample_size=width_sample_size,
+                    remove_markers=remove_markers,
+                )
+            _logger.info(f"Adjusting {column_name}/{col_idx} with width {col_width}")
+            column_formats.append(align)
             worksheet.set_column(
                 col_idx, col_idx, col_width * character_width, cell_format=align
             )
-            worksheet.write(start_row, col_idx, column_name, wb.header_format)
+    worksheet.write_row(start_row, 0, header, wb.header_format)
 
-            for idx, value in enumerate(data_df[column_name]):
-                found_color_name = find_color_name(value)
+    if index.nlevels > 1 and not constant_memory:
+        index_spans = get_index_spans(index)
+    else:
+        index_spans = None
+
+    # the color of each distinct cell value is only looked up once
+    colored_values = dict()
+    merged_cells = list()
+    n_colored = 0
+    debug = _logger.isEnabledFor(logging.DEBUG)
+    if index.nlevels == 1:
+        index_rows = ((label,) for label in index)
+    else:
+        index_rows = iter(index)
+    data_rows = zip(
+        *[
+            get_object_values(data_df.iloc[:, column])
+            for column in range(data_df.shape[1])
+        ]
+    )
+    for idx, (index_row, data_row) in enumerate(zip(index_rows, data_rows)):
+        row = start_row + idx + 1
+        values = index_row + data_row
+        colored_cells = list()
+        for col_idx, value in enumerate(values):
+            if not isinstance(value, str):
+                continue
+            try:
+                colored_value = colored_values[value]
+            except KeyError:
+                colored_value = None
+                text = value
+                base_style = None
+                if FORMAT_MARKER in value:
+                    format_name, text = split_format_marker(value)
+                    properties = cell_formats.get(format_name, dict())
+                    base_style = {"font": "arial", "font_size": 8, **properties}
+                    colored_value = (text, wb.get_cell_format(properties))
+                found_color_name = find_color_name(text)
                 if found_color_name is not None:
-                    _logger.debug(f"Going to set {value} {found_color_name}")
-                    cell_format = wb.set_format(found_color_name)
-                    new_value = value.replace(found_color_name, "")
-                    if cell_format is not None:
-                        worksheet.write(idx + 1, col_idx, new_value, cell_format)
-                    else:
-                        _logger.debug("No color found")
-                        worksheet.write(idx + 1, col_idx, new_value)
+                    if debug:
+                        _logger.debug(f"Going to set {value} {found_color_name}")
+                    cell_format = wb.set_format(found_color_name, base_style=base_style)
+                    if cell_format is None:
+                        if debug:
+                            _logger.debug("No color found")
+                        if colored_value is not None:
+                            cell_format = colored_value[1]
+                    new_value = text.replace(found_color_name, "")
+                    colored_value = (new_value, cell_format)
+                colored_values[value] = colored_value
+            if colored_value is not None:
+                colored_cells.append((col_idx, colored_value))
+
+        n_colored += len(colored_cells)
+        # each cell is written once, the runs of cells without a color with write_row
+        start_col = 0
+        for col_idx, (new_value, cell_format) in colored_cells:
+            if col_idx > start_col:
+                worksheet.write_row(row, start_col, values[start_col:col_idx])
+            worksheet.write(row, col_idx, new_value, cell_format)
+            start_col = col_idx + 1
+        if start_col < len(values):
+            worksheet.write_row(row, start_col, values[start_col:])
+
+        if index_spans is not None:
+            colored_cells = dict(colored_cells)
+            for level, spans in enumerate(index_spans):
+                n_span = spans.get(idx, 1)
+                if n_span > 1:
+                    value, cell_format = colored_cells.get(level, (values[level], None))
+                    merged_cells.append(
+                        (row, level, row + n_span - 1, level, value, cell_format)
+                    )
+
+    if not constant_memory:
+        # the spans in the index columns of a multi index are left to the merged labels
+        first_column = index.nlevels if index_spans is not None else 0
+        for span_row, col_idx, n_row, n_col in data_df.attrs.get("cell_spans", []):
+            if col_idx < first_column or col_idx + n_col > len(header):
+                continue
+            # the text of a multirow may be in any of its rows
+            for value_row in range(span_row, span_row + n_row):
+                if col_idx < index.nlevels:
+                    value = index[value_row]
+                    if index.nlevels > 1:
+                        value = value[col_idx]
+                else:
+                    value = data_df.iat[value_row, col_idx - index.nlevels]
+                    if value is pd.NA:
+                        value = None
+                if value != "":
+                    break
+            value, cell_format = colored_values.get(value, None) or (value, None)
+            if cell_format is None:
+                cell_format = column_formats[col_idx]
+            first_row = start_row + span_row + 1
+            merged_cells.append(
+                (
+                    first_row,
+                    col_idx,
+                    first_row + n_row - 1,
+                    col_idx + n_col - 1,
+                    value,
+                    cell_format,
+                )
+            )
+
+    # the merged cells can only be written once the rows below have been written
+    for first_row, first_col, last_row, last_col, value, cell_format in merged_cells:
+        worksheet.merge_range(
+            first_row, first_col, last_row, last_col, value, cell_format
+        )
+
+    profiling.count("colored_cells", n_colored)
+    profiling.count("merged_cells", len(merged_cells))
+
+
+def write_data_to_sheets(
+    data_dfs: dict,
+    file_name: str | Path | IO[bytes],
+    constant_memory: bool = False,
+    width_sample_size: Union[int, None] = None,
+):
+    """
+    Write data frames to the sheets of one Excel file with format
+
+    Args:
+        data_dfs (dict): The dataframes to write keyed on the name of their sheet
+        file_name (str, Path or file object): Name of the Excel file with format or a
+            binary file object, such as a *io.BytesIO*, to write the Excel file to
+        constant_memory (bool): Use the constant memory mode of xlsxwriter, in which
+            each row is flushed to disk as soon as the next row is written. Labels of a
+            multi index are not merged in this mode
+        width_sample_size (int or None): Base the column widths on the first and a
+            random sample of this many rows instead of all rows, which is faster for
+            very tall tables
+
+    Notes:
+        * The color formats are shared by all sheets of the workbook
+        * A file object is written with the in memory mode of xlsxwriter, which does not
+          use temporary files. The constant memory mode is not available then
+    """
+
+    import xlsxwriter
+
+    if is_file_object(file_name):
+        if constant_memory:
+            _logger.warning("Constant memory mode is not used when writing to memory")
+            constant_memory = False
+        options = dict(in_memory=True)
+    else:
+        options = dict(constant_memory=constant_memory)
+    with profiling.stage("write"), xlsxwriter.Workbook(file_name, options) as workbook:
+        wb = WorkBook(workbook=workbook)
+        for sheet_name, data_df in data_dfs.items():
+            _logger.debug(f"Writing sheet {sheet_name}")
+            worksheet = workbook.add_worksheet(sheet_name)
+            write_sheet(
+                worksheet,
+                wb,
+                data_df,
+                constant_memory=constant_memory,
+                width_sample_size=width_sample_size,
+            )
+
+        _logger.info(
+            f"Color formats: {wb.format_misses} created, {wb.format_hits} reused"
+        )
+        profiling.count("sheets", len(data_dfs))
+        profiling.count("formats_created", wb.format_misses)
+        profiling.count("formats_reused", wb.format_hits)
 
     _logger.debug("Done")
+
+
+def write_data_to_sheet_multiindex(
+    data_df: DataFrame,
+    file_name: str | Path | IO[bytes],
+    sheet_name="Sheet",
+    constant_memory: bool = False,
+    width_sample_size: Union[int, None] = None,
+):
+    """
+    Write the data to Excel file with format
+
+     Args:
+         data_df (DataFrame): The dataframe to write to Excel
+         file_name (str, Path or file object): Name of the Excel file with format or a
+            binary file object
+         sheet_name (str): Name of the sheet to write to
+         constant_memory (bool): Use the constant memory mode of xlsxwriter, in which
+            each row is flushed to disk as soon as the next row is written. Labels of a
+            multi index are not merged in this mode
+         width_sample_size (int or None): Base the column widths on the first and a
+            random sample of this many rows instead of all rows, which is faster for
+            very tall tables
+
+    Notes:
+        * The index and the columns are written in one pass over the rows directly with
+          xlsxwriter. The first row contains the index names and the column names.
+
+    """
+    write_data_to_sheets(
+        {sheet_name: data_df},
+        file_name,
+        constant_memory=constant_memory,
+        width_sample_size=width_sample_size,
+    )
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+Watch a directory for changed tabular files
+"""
+import ctypes
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Iterator, Union
+
+_logger = logging.getLogger(__name__)
+
+# inotify events of a file which has been written or moved into the directory, and of
+# a lost event queue
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+# header of an inotify event: watch descriptor, mask, cookie and length of the name
+INOTIFY_EVENT = struct.Struct("iIII")
+
+# seconds without new changes before the changed files are reported
+DEFAULT_DEBOUNCE = 0.2
+DEFAULT_POLLING_INTERVAL = 0.5
+# maximum time to wait for changes before checking whether to stop
+WAIT_TIMEOUT = 0.5
+
+
+class PollingWatcher:
+    """
+    Find changed files by comparing the modification time and size of the files at a
+    regular interval
+
+    Args:
+        directory (str or Path): The directory to watch
+        pattern (str, optional): Pattern of the file names to watch. Defaults to "*.tex"
+        interval (float, optional): Seconds between two scans of the directory
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        pattern: str = "*.tex",
+        interval: float = DEFAULT_POLLING_INTERVAL,
+    ):
+        """
+        Constructor of the PollingWatcher class
+        """
+        self.directory = Path(directory)
+        self.pattern = pattern
+        self.interval = interval
+        self.file_states = self.scan()
+
+    def scan(self) -> dict:
+        """
+        Get the modification time and size of all files matching the pattern
+
+        Returns:
+            dict: The modification time in ns and size keyed on the file name
+        """
+        file_states = dict()
+        for filename in self.directory.glob(self.pattern):
+            try:
+                stat = filename.stat()
+            except FileNotFoundError:
+                continue
+            file_states[filename] = (stat.st_mtime_ns, stat.st_size)
+        return file_states
+
+    def wait(self, timeout: float) -> set:
+        """
+        Wait for changed files
+
+        Args:
+            timeout (float): Maximum number of seconds to wait
+
+        Returns:
+            set: The new and changed files, empty if nothing changed within the timeout
+        """
+        end_time = time.monotonic() + timeout
+        while True:
+            time.sleep(max(min(self.interval, end_time - time.monotonic()), 0))
+            file_states = self.scan()
+            changed = {
+                filename
+                for filename, state in file_states.items()
+                if self.file_states.get(filename) != state
+            }
+            self.file_states = file_states
+            if changed or time.monotonic() >= end_time:
+                return changed
+
+    def close(self):
+        """
+        Nothing to release for polling
+        """
+
+
+class InotifyWatcher:
+    """
+    Find changed files with the inotify interface of the Linux kernel
+
+    Args:
+        directory (str or Path): The directory to watch
+        pattern (str, optional): Pattern of the file names to watch. Defaults to "*.tex"
+
+    Notes:
+        * inotify is called directly from the C library, so no extra package is needed.
+          On other platforms the constructor raises an OSError
+        * A file counts as changed when it is closed after writing or moved into the
+          directory, such that a file is not converted while it is still being written
+    """
+
+    def __init__(self, directory: Union[str, Path], pattern: str = "*.tex"):
+        """
+        Constructor of the InotifyWatcher class
+        """
+        self.directory = Path(directory)
+        self.pattern = pattern
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            inotify_init1 = libc.inotify_init1
+            inotify_add_watch = libc.inotify_add_watch
+        except (AttributeError, OSError, TypeError) as err:
+            raise OSError(f"inotify is not available: {err}")
+
+        self.fd = inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO
+        if inotify_add_watch(self.fd, os.fsencode(self.directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, os.strerror(errno), str(self.directory))
+
+    def wait(self, timeout: float) -> set:
+        """
+        Wait for changed files
+
+        Args:
+            timeout (float): Maximum number of seconds to wait
+
+        Returns:
+            set: The changed files, empty if nothing changed within the timeout
+        """
+        changed = set()
+        end_time = time.monotonic() + timeout
+        # events of files which do not match the pattern do not count, so wait until
+        # the timeout
+        while not changed:
+            remaining = end_time - time.monotonic()
+            if remaining <= 0:
+                break
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if not ready:
+                break
+            changed.update(self.read_events())
+        return changed
+
+    def read_events(self) -> set:
+        """
+        Read the pending events
+
+        Returns:
+            set: The changed files matching the pattern
+        """
+        changed = set()
+        data = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            _, mask, _, name_length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = os.fsdecode(data[offset : offset + name_length].rstrip(b"\0"))
+            offset += name_length
+            if mask & IN_Q_OVERFLOW:
+                _logger.warning("Events were lost, all files are reported as changed")
+                changed.update(self.directory.glob(self.pattern))
+            elif fnmatch(name, self.pattern):
+                changed.add(self.directory / name)
+        return changed
+
+    def close(self):
+        """
+        Close the inotify file descriptor
+        """
+        os.close(self.fd)
+
+
+def get_watcher(
+    directory: Union[str, Path],
+    pattern: str = "*.tex",
+    polling: bool = False,
+    polling_interval: float = DEFAULT_POLLING_INTERVAL,
+):
+    """
+    Get a watcher for the directory, using inotify if possible
+
+    Args:
+        directory (str or Path): The directory to watch
+        pattern (str, optional): Pattern of the file names to watch. Defaults to "*.tex"
+        polling (bool, optional): Always poll the directory, also when inotify is
+            available. Defaults to False
+        polling_interval (float, optional): Seconds between two scans of the directory
+            when polling
+
+    Returns:
+        InotifyWatcher or PollingWatcher: The watcher
+    """
+    if not Path(directory).is_dir():
+        raise ValueError(f"Can not watch {directory}: not a directory")
+    if not polling:
+        try:
+            return InotifyWatcher(directory, pattern=pattern)
+        except OSError as err:
+            _logger.info(f"Falling back to polling: {err}")
+    return PollingWatcher(directory, pattern=pattern, interval=polling_interval)
+
+
+def watch_changes(
+    directory: Union[str, Path],
+    pattern: str = "*.tex",
+    debounce: float = DEFAULT_DEBOUNCE,
+    polling: bool = False,
+    polling_interval: float = DEFAULT_POLLING_INTERVAL,
+    stop_event: Union[threading.Event, None] = None,
+) -> Iterator[list]:
+    """
+    Watch a directory and yield the files which changed
+
+    Args:
+        directory (str or Path): The directory to watch
+        pattern (str, optional): Pattern of the file names to watch. Defaults to "*.tex"
+        debounce (float, optional): Seconds without new changes before the changed files
+            are yielded, such that a burst of writes to the same file leads to one
+            conversion
+        polling (bool, optional): Always poll the directory, also when inotify is
+            available. Defaults to False
+        polling_interval (float, optional): Seconds between two scans of the directory
+            when polling
+        stop_event (threading.Event, optional): Stop watching when this event is set.
+            Defaults to None, i.e. watch until interrupted
+
+    Yields:
+        list: The sorted names of the changed files which still exist
+    """
+    watcher = get_watcher(
+        directory, pattern=pattern, polling=polling, polling_interval=polling_interval
+    )
+    _logger.debug(f"Watching {directory} with {type(watcher).__name__}")
+    try:
+        while stop_event is None or not stop_event.is_set():
+            changed = watcher.wait(WAIT_TIMEOUT)
+            if not changed:
+                continue
+            while more_changed := watcher.wait(debounce):
+                changed.update(more_changed)
+            filenames = sorted(filename for filename in changed if filename.exists())
+            if filenames:
+                yield filenames
+    finally:
+        watcher.close()
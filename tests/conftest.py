@@ -6,5 +6,19 @@
     - https://docs.pytest.org/en/stable/fixture.html
     - https://docs.pytest.org/en/stable/writing_plugins.html
 """
+from pathlib import Path
 
-# import pytest
+import pytest
+
+
+@pytest.fixture
+def root_directory():
+    """the root directory from which pytests is launched"""
+    current_directory = Path(".").cwd().name
+    if current_directory == "tests":
+        # we are inside the tests-directory. Move one up
+        root_directory = Path("..")
+    else:
+        # we are in the root directory
+        root_directory = Path(".")
+    return root_directory
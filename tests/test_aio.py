@@ -0,0 +1,106 @@
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+
+from openpyxl import load_workbook
+
+from tabularxls.aio import AsyncConverter, convert_async
+from tabularxls.profiling import profile_conversion
+
+
+async def measure_heartbeat(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Longest time the event loop took to wake up a sleeping task"""
+    max_delay = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        max_delay = max(max_delay, time.perf_counter() - start - interval)
+    return max_delay
+
+
+class SamplingConverter(AsyncConverter):
+    """Converter which records the number of running conversions when one is started"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.running_samples = list()
+
+    async def run_conversion(self, tex_code: bytes, **options) -> bytes:
+        self.running_samples.append(self.running)
+        return await super().run_conversion(tex_code, **options)
+
+
+def test_convert_async_responsive(root_directory, tmp_path):
+    """The event loop keeps responding while 50 conversions run"""
+    tex_files = [
+        root_directory / "tests" / f"tabular_{number}.tex" for number in range(1, 6)
+    ]
+
+    async def run_conversions(converter):
+        stop = asyncio.Event()
+        heartbeat = asyncio.create_task(measure_heartbeat(stop))
+        conversions = list()
+        for ii in range(50):
+            tex_file = tex_files[ii % len(tex_files)]
+            if ii % 2 == 0:
+                conversions.append(
+                    converter.convert(tex_file, tmp_path / f"{ii}_{tex_file.stem}.xlsx")
+                )
+            else:
+                conversions.append(converter.convert(tex_file.read_bytes()))
+        results = await asyncio.gather(*conversions)
+        stop.set()
+        return results, await heartbeat
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        converter = SamplingConverter(executor=executor, max_concurrent=2)
+        results, max_delay = asyncio.run(run_conversions(converter))
+
+    assert max_delay < 0.5
+    assert len(list(tmp_path.glob("*.xlsx"))) == 25
+    assert all(result is None for result in results[::2])
+    assert load_workbook(BytesIO(results[1])).active["A1"].value is not None
+
+    metrics = converter.get_metrics()
+    assert metrics["completed"] == 50
+    assert metrics["queue_depth"] == 0
+    assert metrics["running"] == 0
+    assert 0 < metrics["max_queue_depth"] <= 50
+    # the semaphore never lets more than two conversions run
+    assert len(converter.running_samples) == 50
+    assert 1 <= max(converter.running_samples) <= converter.max_concurrent
+
+
+def test_convert_async_default_converter(root_directory):
+    """Conversions with the default converter of the loop, also in a new loop"""
+    tex_code = (root_directory / "tests" / "tabular_3.tex").read_bytes()
+
+    for _ in range(2):
+        xls_bytes = asyncio.run(convert_async(tex_code, convert_numbers=True))
+        assert load_workbook(BytesIO(xls_bytes)).active["A1"].value is not None
+
+
+def test_convert_async_process_pool(root_directory):
+    """The profile collected in a worker process is added to the one of the caller"""
+    tex_code = (root_directory / "tests" / "tabular_1.tex").read_bytes()
+
+    async def run_conversions(converter, n_conversions):
+        return [await converter.convert(tex_code) for _ in range(n_conversions)]
+
+    # a converter belongs to one event loop, so each loop gets its own converter
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        converter = AsyncConverter(executor=executor)
+        (xls_bytes,) = asyncio.run(run_conversions(converter, 1))
+        assert load_workbook(BytesIO(xls_bytes)).active["A1"].value is not None
+
+        with profile_conversion() as profile:
+            converter = AsyncConverter(executor=executor)
+            results = asyncio.run(run_conversions(converter, 2))
+        for xls_bytes in results:
+            assert load_workbook(BytesIO(xls_bytes)).active["A1"].value is not None
+
+    assert profile.counts["files"] == 2
+    assert profile.counts["rows"] > 0
+    assert {"clean", "build", "write"} <= set(profile.get_stages())
+    assert converter.get_metrics()["completed"] == 2
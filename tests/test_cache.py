@@ -0,0 +1,62 @@
+import os
+
+import tabularxls
+from tabularxls.cache import ConversionCache
+
+
+def test_cache_key(tmp_path):
+
+    tabular_file = tmp_path / "tabular.tex"
+    tabular_file.write_text("a & b \\\\\n")
+
+    key = ConversionCache.get_key(tabular_file)
+    assert key == ConversionCache.get_key(tabular_file)
+    assert key != ConversionCache.get_key(tabular_file, multi_index=True)
+    assert key != ConversionCache.get_key(tabular_file, top_row_merge=True)
+    assert key != ConversionCache.get_key(tabular_file, encoding="latin-1")
+    assert key != ConversionCache.get_key(tabular_file, search_and_replace={"a": "b"})
+    # the order of the search and replace patterns matters
+    assert ConversionCache.get_key(
+        tabular_file, search_and_replace={"a": "b", "b": "c"}
+    ) != ConversionCache.get_key(tabular_file, search_and_replace={"b": "c", "a": "b"})
+
+    tabular_file.write_text("a & c \\\\\n")
+    assert key != ConversionCache.get_key(tabular_file)
+
+
+def test_cache_fetch_and_evict(tmp_path):
+
+    cache = ConversionCache(tmp_path / "cache", max_size=2.5 / 1024)
+
+    for ii, key in enumerate(["first", "second"]):
+        xls_file = tmp_path / f"{key}.xlsx"
+        xls_file.write_bytes(bytes(1024))
+        assert not cache.fetch(key, tmp_path / "out" / xls_file.name)
+        cache.store(key, xls_file)
+        # make sure the modification times differ
+        os.utime(cache.get_cache_file(key), (ii, ii))
+
+    # only two files fit in the cache, the least recently used one is evicted
+    assert cache.fetch("first", tmp_path / "out" / "first.xlsx")
+    cache.store("third", tmp_path / "second.xlsx")
+
+    assert cache.fetch("first", tmp_path / "out" / "first.xlsx")
+    assert not cache.fetch("second", tmp_path / "out" / "second.xlsx")
+    assert cache.fetch("third", tmp_path / "out" / "third.xlsx")
+    assert (tmp_path / "out" / "third.xlsx").stat().st_size == 1024
+
+
+def test_cache_key_version(tmp_path, monkeypatch):
+
+    tabular_file = tmp_path / "tabular.tex"
+    tabular_file.write_text("a & b \\\\\n")
+
+    cache = ConversionCache(tmp_path / "cache")
+    xls_file = tmp_path / "tabular.xlsx"
+    xls_file.write_bytes(bytes(16))
+    cache.store(ConversionCache.get_key(tabular_file), xls_file)
+
+    # a new version of the package never reuses the results of the old one
+    monkeypatch.setattr(tabularxls, "__version__", "999.0")
+    key = ConversionCache.get_key(tabular_file)
+    assert not cache.fetch(key, tmp_path / "out" / "tabular.xlsx")
@@ -0,0 +1,38 @@
+import subprocess
+import sys
+
+# maximum time in seconds to import the command line tool
+IMPORT_TIME_BUDGET = 0.25
+
+# modules which should not be imported before a conversion actually starts
+HEAVY_MODULES = ["pandas", "numpy", "matplotlib", "xlsxwriter", "cbsplotlib"]
+
+
+def get_import_times(module_name):
+    """
+    Import a module in a fresh interpreter and get the cumulative import time of all
+    modules in seconds
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    import_times = dict()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_time, cumulative_time, name = line.split(":", 1)[1].split("|")
+        import_times[name.strip()] = int(cumulative_time) / 1e6
+    return import_times
+
+
+def test_import_time():
+
+    import_times = get_import_times("tabularxls.main")
+
+    for module_name in HEAVY_MODULES:
+        assert module_name not in import_times, f"{module_name} imported at startup"
+
+    assert import_times["tabularxls.main"] < IMPORT_TIME_BUDGET
@@ -0,0 +1,120 @@
+from io import BytesIO
+from pathlib import Path
+import shutil
+
+import pytest
+from openpyxl import load_workbook
+
+from tabularxls.main import (
+    main,
+    convert_tabular,
+    convert_tabular_in_memory,
+    get_input_filenames,
+    get_output_filename,
+)
+
+
+def test_get_output_filename():
+
+    assert get_output_filename(Path("tab/table.tex")) == Path("tab/table.xlsx")
+    assert get_output_filename(Path("tab/table.tex"), output_directory="out") == Path(
+        "out/table.xlsx"
+    )
+    assert get_output_filename(
+        Path("tab/table.tex"), output_filename="other.xlsx", output_directory="out"
+    ) == Path("out/other.xlsx")
+
+
+def test_batch_conversion(root_directory, tmp_path):
+    """Convert several files at once, one of which fails"""
+    for name in ("tabular_3.tex", "tabular_4.tex"):
+        shutil.copy(root_directory / "tests" / name, tmp_path / name)
+    (tmp_path / "empty.tex").write_text("no tabular in here\n")
+
+    input_files = get_input_filenames([str(tmp_path / "*.tex")])
+    assert [f.name for f in input_files] == [
+        "empty.tex",
+        "tabular_3.tex",
+        "tabular_4.tex",
+    ]
+
+    output_directory = tmp_path / "out"
+    n_failures = main(
+        [str(tmp_path / "*.tex"), "--output_directory", str(output_directory)]
+        + ["--jobs", "2"]
+    )
+
+    assert n_failures == 1
+    assert sorted(f.name for f in output_directory.glob("*.xlsx")) == [
+        "tabular_3.xlsx",
+        "tabular_4.xlsx",
+    ]
+
+
+def test_batch_conversion_errors(root_directory, tmp_path):
+    """Files converted to the same Excel file and patterns without files are errors"""
+    for directory in ("a", "b"):
+        (tmp_path / directory).mkdir()
+        shutil.copy(root_directory / "tests" / "tabular_3.tex", tmp_path / directory)
+
+    output_directory = tmp_path / "out"
+    with pytest.raises(ValueError, match="tabular_3.xlsx"):
+        main(
+            [str(tmp_path / "*" / "*.tex"), "--output_directory", str(output_directory)]
+            + ["--jobs", "2"]
+        )
+    assert not output_directory.exists()
+
+    n_failures = main(
+        [str(tmp_path / "a" / "*.tex"), str(tmp_path / "c" / "*.tex")]
+        + ["--output_directory", str(output_directory)]
+    )
+    assert n_failures == 1
+    assert (output_directory / "tabular_3.xlsx").exists()
+    assert main([str(tmp_path / "c" / "*.tex")]) == 1
+
+
+def test_document_conversion(root_directory, tmp_path):
+    """Convert a document with several tabulars into one Excel file"""
+    xls_file = tmp_path / "document.xlsx"
+    n_failures = main(
+        [
+            str(root_directory / "tests" / "document.tex"),
+            "--output_filename",
+            str(xls_file),
+        ]
+        + ["--document", "--jobs", "2"]
+    )
+
+    assert n_failures == 0
+    assert xls_file.exists()
+
+
+def get_sheet_values(xls_file):
+    """The values of all sheets of an Excel file keyed on the sheet name"""
+    workbook = load_workbook(xls_file)
+    return {
+        worksheet.title: list(worksheet.iter_rows(values_only=True))
+        for worksheet in workbook.worksheets
+    }
+
+
+def test_convert_in_memory(root_directory, tmp_path):
+    """Convert LaTeX code in memory to the same workbook as the file based conversion"""
+    tex_file = root_directory / "tests" / "tabular_3.tex"
+    xls_file = tmp_path / "tabular_3.xlsx"
+    convert_tabular(tex_file, xls_file)
+    expected = get_sheet_values(xls_file)
+
+    xls_bytes = convert_tabular_in_memory(tex_file.read_text(encoding="utf-8"))
+    assert get_sheet_values(BytesIO(xls_bytes)) == expected
+
+    xls_buffer = BytesIO()
+    with open(tex_file, "rb") as fp:
+        assert convert_tabular_in_memory(fp, output=xls_buffer) is None
+        assert not fp.closed
+    assert get_sheet_values(xls_buffer) == expected
+
+    document = (root_directory / "tests" / "document.tex").read_bytes()
+    xls_bytes = convert_tabular_in_memory(document, document=True)
+    assert len(get_sheet_values(BytesIO(xls_bytes))) == 3
@@ -0,0 +1,81 @@
+import json
+import time
+
+import pytest
+
+from tabularxls.main import convert_tabular, main
+from tabularxls.profiling import ConversionProfile, get_profile, profile_conversion
+
+
+def test_nested_stages(monkeypatch):
+    """The time of a nested stage is not counted for the outer stage"""
+    # a clock which only advances when told to
+    clock = [100.0]
+    monkeypatch.setattr(time, "perf_counter", lambda: clock[0])
+
+    profile = ConversionProfile()
+    with profile.stage("outer"):
+        clock[0] += 0.01
+        with profile.stage("inner"):
+            clock[0] += 0.05
+        clock[0] += 0.02
+    assert profile.timings["inner"] == pytest.approx(0.05)
+    assert profile.timings["outer"] == pytest.approx(0.03)
+    assert profile.total == profile.timings["outer"] + profile.timings["inner"]
+
+    copy = ConversionProfile.from_dict(profile.to_dict())
+    copy.count("rows", 3)
+    profile.merge(copy)
+    assert profile.timings["inner"] == 2 * copy.timings["inner"]
+    assert profile.counts == {"rows": 3}
+
+
+def test_profile_conversion(root_directory, tmp_path):
+    """The stages of a conversion are timed and its rows and cells are counted"""
+    profiles = list()
+    with profile_conversion(callback=profiles.append) as profile:
+        assert get_profile() is profile
+        convert_tabular(
+            root_directory / "tests" / "tabular_1.tex",
+            tmp_path / "tabular_1.xlsx",
+            search_and_replace={"Extern": "External"},
+        )
+    assert get_profile() is None
+    assert profiles == [profile]
+
+    assert profile.get_stages() == [
+        "read",
+        "clean",
+        "build",
+        "substitute",
+        "widths",
+        "write",
+    ]
+    assert profile.counts["files"] == 1
+    assert profile.counts["sheets"] == 1
+    assert profile.counts["cells"] > profile.counts["rows"] > 0
+    assert profile.counts["colored_cells"] == 0
+    assert "stage" in profile.format_table()
+
+
+def test_profile_option(root_directory, tmp_path, capsys):
+    """The profile of several conversions over a pool is written as JSON"""
+    profile_file = tmp_path / "profile.json"
+    main(
+        [
+            str(root_directory / "tests" / "tabular_3.tex"),
+            str(root_directory / "tests" / "tabular_4.tex"),
+            "--output_directory",
+            str(tmp_path),
+            "--jobs",
+            "2",
+            "--profile",
+            "--profile_json",
+            str(profile_file),
+        ]
+    )
+    assert "total" in capsys.readouterr().out
+    with open(profile_file) as fp:
+        profile = json.load(fp)
+    assert profile["counts"]["files"] == 2
+    assert profile["timings"]["write"] > 0
@@ -0,0 +1,81 @@
+import shutil
+import threading
+
+import pytest
+
+from tabularxls.client import ConversionClient, main
+from tabularxls.server import ConversionServer
+
+
+@pytest.fixture
+def server(tmp_path):
+    """A server with a single worker, running in a thread"""
+    server = ConversionServer(tmp_path / "server.sock", jobs=1)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    thread.join()
+    server.server_close()
+
+
+def test_client(root_directory, server, tmp_path):
+    """Convert a file and a file which fails over the same connection"""
+    shutil.copy(root_directory / "tests" / "tabular_3.tex", tmp_path / "tabular_3.tex")
+
+    with ConversionClient(server.socket_path) as client:
+        assert not client.convert(
+            tmp_path / "tabular_3.tex", tmp_path / "out" / "tabular_3.xlsx"
+        )
+        with pytest.raises(RuntimeError):
+            client.convert(tmp_path / "missing.tex", tmp_path / "missing.xlsx")
+        assert not client.convert(
+            tmp_path / "tabular_3.tex",
+            tmp_path / "out" / "numbers.xlsx",
+            convert_numbers=True,
+        )
+
+    assert (tmp_path / "out" / "tabular_3.xlsx").exists()
+    assert (tmp_path / "out" / "numbers.xlsx").exists()
+
+    # only one server can listen on a socket
+    with pytest.raises(RuntimeError):
+        ConversionServer(server.socket_path, jobs=1)
+
+
+def test_client_main(root_directory, server, tmp_path):
+    """The client has the same command line as tabular2xls"""
+    for name in ("tabular_3.tex", "tabular_4.tex"):
+        shutil.copy(root_directory / "tests" / name, tmp_path / name)
+    (tmp_path / "empty.tex").write_text("no tabular in here\n")
+
+    n_failures = main(
+        [
+            str(tmp_path / "*.tex"),
+            "--output_directory",
+            str(tmp_path / "out"),
+            "--jobs",
+            "2",
+            "--socket",
+            str(server.socket_path),
+        ]
+    )
+    assert n_failures == 1
+    assert sorted(f.name for f in (tmp_path / "out").iterdir()) == [
+        "tabular_3.xlsx",
+        "tabular_4.xlsx",
+    ]
+
+
+def test_stale_socket(tmp_path):
+    """A socket left behind by a server which was killed is reused"""
+    socket_path = tmp_path / "server.sock"
+    server = ConversionServer(socket_path, jobs=1)
+    # close the listening socket without removing it, as a killed server would do
+    server.socket.close()
+    server.executor.shutdown()
+    assert socket_path.exists()
+
+    server = ConversionServer(socket_path, jobs=1)
+    server.server_close()
+    assert not socket_path.exists()
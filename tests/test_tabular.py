@@ -1,29 +1,25 @@
 from pathlib import Path
+import pytest
+import openpyxl
 import pandas as pd
 import numpy as np
 import pandas.testing as pt
 import numpy.testing as nt
 
 from tabularxls.main import parse_tabular
+from tabularxls.tabular_utils import (
+    MacroRules,
+    read_tabular_chunks,
+    read_tabular_environments,
+    parse_tabular_document,
+    write_data_to_sheet_multiindex,
+    write_data_to_sheets,
+)
 
 
-def get_root_directory():
-    """small utility to get the root directory from which pytests is launched"""
-    current_directory = Path(".").cwd().name
-    if current_directory == "tests":
-        # we are inside the tests-directory. Move one up
-        root_directory = Path("..")
-    else:
-        # we are in the root directory
-        root_directory = Path(".")
-    return root_directory
-
-
-def test_tabular_1():
+def test_tabular_1(root_directory):
     """API Tests"""
-    root = get_root_directory()
-
-    tabular_file = root / Path("tests/tabular_1.tex")
+    tabular_file = root_directory / Path("tests/tabular_1.tex")
     tabular_df = parse_tabular(input_filename=tabular_file)
 
     expected_column_names = pd.Index(
@@ -58,7 +54,7 @@ def test_tabular_1():
             "",
             "",
             "",
-            "",
+            "Beveiligings-",
             "opties",
             "",
             "",
@@ -184,11 +180,9 @@ def test_tabular_1():
         nt.assert_array_equal(tabular_df[column_name].to_numpy(), expected_col)
 
 
-def test_tabular_2():
+def test_tabular_2(root_directory):
     """API Tests"""
-    root = get_root_directory()
-
-    tabular_file = root / Path("tests/tabular_2.tex")
+    tabular_file = root_directory / Path("tests/tabular_2.tex")
     tabular_df = parse_tabular(input_filename=tabular_file, multi_index=True)
 
     expected_column_names = pd.Index(["2008-2013", "2014-2019 ¹⁾"], dtype="object")
@@ -215,11 +209,9 @@ def test_tabular_2():
         nt.assert_array_equal(tabular_df[column_name].to_numpy(), expected_col)
 
 
-def test_tabular_3():
+def test_tabular_3(root_directory):
     """API Tests"""
-    root = get_root_directory()
-
-    tabular_file = root / Path("tests/tabular_3.tex")
+    tabular_file = root_directory / Path("tests/tabular_3.tex")
     tabular_df = parse_tabular(input_filename=tabular_file)
 
     expected_column_names = pd.Index(["Bedrijfsklasse"], dtype="object")
@@ -259,12 +251,10 @@ def test_tabular_3():
         nt.assert_array_equal(tabular_col, expected_col)
 
 
-def test_tabular_4():
+def test_tabular_4(root_directory):
     """API Tests"""
 
-    root = get_root_directory()
-
-    tabular_file = root / Path("tests/tabular_4.tex")
+    tabular_file = root_directory / Path("tests/tabular_4.tex")
     tabular_df = parse_tabular(input_filename=tabular_file)
 
     expected_column_names = pd.Index(["Bedrijfsgrootte"], dtype="object")
@@ -313,7 +303,7 @@ def test_tabular_4():
         nt.assert_array_equal(tabular_df[column_name].to_numpy(), expected_col)
 
 
-def test_tabular_5():
+def test_tabular_5(root_directory):
     """API Tests"""
     # let op dat de cdot en ast commando's zonder \ gegeven worden omdat we search en replace
     # op het eind pas toepassen en dan zijn alle back slashes al verwijderd
@@ -321,9 +311,7 @@ def test_tabular_5():
         r"\$cdot\$": ".",
         r"\$ast\$": "*",
     }
-    root = get_root_directory()
-
-    tabular_file = root / Path("tests/tabular_5.tex")
+    tabular_file = root_directory / Path("tests/tabular_5.tex")
     tabular_df = parse_tabular(input_filename=tabular_file, search_and_replace=s_and_r)
 
     expected_column_names = pd.Index(
@@ -394,3 +382,390 @@ def test_tabular_5():
     for column_name in expected_column_names:
         expected_col = expected_columns[column_name]
         nt.assert_array_equal(tabular_df[column_name].to_numpy(), expected_col)
+
+
+def test_tabular_chunks(root_directory):
+    """Parsing in small chunks must give the same result as in one go"""
+    tabular_file = root_directory / Path("tests/tabular_1.tex")
+
+    aliases = dict()
+    chunks = list(read_tabular_chunks(tabular_file, aliases=aliases, chunk_size=4))
+    assert [len(chunk) for chunk in chunks] == [4] * 8
+    assert chunks[0][0] == [
+        "Categorie",
+        "Testomschrijving",
+        "Testuitkomsten",
+        "Variabelenaam",
+    ]
+    assert aliases["goodbad"] == "good/bad"
+
+    tabular_df = parse_tabular(input_filename=tabular_file)
+    chunked_df = parse_tabular(input_filename=tabular_file, chunk_size=4)
+    pt.assert_frame_equal(chunked_df, tabular_df)
+
+
+def test_tabular_search_and_replace_multi_index(root_directory):
+    """Search and replace also works on a multi index"""
+    tabular_file = root_directory / Path("tests/tabular_2.tex")
+    tabular_df = parse_tabular(
+        input_filename=tabular_file,
+        multi_index=True,
+        search_and_replace={"OM": "Openbaar Ministerie", r"¹⁾": "(1)"},
+    )
+
+    expected_column_names = pd.Index(["2008-2013", "2014-2019 (1)"], dtype="object")
+    expected_index = pd.MultiIndex.from_tuples(
+        [
+            ("Totaal door Openbaar Ministerie genomen beslissingen", ""),
+            ("", "- waaronder strafoplegging Openbaar Ministerie²⁾"),
+            ("Schuldig verklaard door rechter", ""),
+        ],
+        names=["", ""],
+    )
+
+    pt.assert_index_equal(tabular_df.columns, expected_column_names)
+    pt.assert_index_equal(tabular_df.index, expected_index)
+    nt.assert_array_equal(
+        tabular_df["2008-2013"].to_numpy(), np.array(["512", "93", "124"], dtype=object)
+    )
+
+
+def test_write_multi_index(root_directory, tmp_path):
+    """Write a multi index table with and without constant memory mode"""
+    tabular_file = root_directory / Path("tests/tabular_2.tex")
+    tabular_df = parse_tabular(input_filename=tabular_file, multi_index=True)
+
+    expected_rows = [
+        (None, None, "2008-2013", "2014-2019 ¹⁾"),
+        ("Totaal door OM genomen beslissingen", None, "512", "551"),
+        (None, "- waaronder strafoplegging OM²⁾", "93", "88"),
+        ("Schuldig verklaard door rechter", None, "124", "82"),
+    ]
+
+    for constant_memory in (False, True):
+        xls_file = tmp_path / f"tabular_2_{constant_memory}.xlsx"
+        write_data_to_sheet_multiindex(
+            tabular_df, xls_file, constant_memory=constant_memory
+        )
+        worksheet = openpyxl.load_workbook(xls_file).active
+        assert list(worksheet.iter_rows(values_only=True)) == expected_rows
+
+        merged_cells = [str(cells) for cells in worksheet.merged_cells.ranges]
+        if constant_memory:
+            assert merged_cells == []
+        else:
+            # the empty label below the first label is merged with it
+            assert merged_cells == ["A2:A3"]
+
+
+def test_tabular_document(root_directory, tmp_path):
+    """Extract all tabulars of a document and write them to one Excel file"""
+    document_file = root_directory / Path("tests/document.tex")
+    environments = read_tabular_environments(document_file)
+    assert [(env.caption, env.label) for env in environments] == [
+        ("Uitkomsten van de tests", "tab:uitkomsten"),
+        ("Bedrijfsklassen: codes en namen", None),
+        (None, None),
+        (None, None),
+    ]
+    # the alias of the preamble is passed on to the tabulars
+    assert list(environments[0].aliases.values()) == ["good/bad"]
+
+    for jobs in (1, 2):
+        tabular_dfs = parse_tabular_document(document_file, jobs=jobs)
+        # the single column tabular has no rows and is skipped
+        assert list(tabular_dfs.keys()) == [
+            "Uitkomsten van de tests",
+            "Bedrijfsklassen_ codes en namen",
+            "Tabular 4",
+        ]
+        expected_df = pd.DataFrame(
+            {"Uitkomst": ["good/bad", "good/bad"]},
+            index=pd.Index(["IPv6", "DNSSEC"], name="Test"),
+        )
+        pt.assert_frame_equal(tabular_dfs["Uitkomsten van de tests"], expected_df)
+
+    xls_file = tmp_path / "document.xlsx"
+    write_data_to_sheets(tabular_dfs, xls_file)
+    workbook = openpyxl.load_workbook(xls_file)
+    assert workbook.sheetnames == list(tabular_dfs.keys())
+    assert list(workbook["Tabular 4"].iter_rows(values_only=True)) == [
+        ("Jaar", "Aantal"),
+        ("2020", "12"),
+        ("2021", "15"),
+    ]
+
+
+def test_write_numbers(root_directory, tmp_path):
+    """Numeric columns are written as numbers with a number format"""
+    tabular_file = root_directory / Path("examples/ransomware_gehad_gk_tabular.tex")
+    tabular_df = parse_tabular(
+        input_filename=tabular_file, top_row_merge=True, convert_numbers=True
+    )
+
+    xls_file = tmp_path / "ransomware.xlsx"
+    write_data_to_sheet_multiindex(tabular_df, xls_file)
+    worksheet = openpyxl.load_workbook(xls_file).active
+    cells = [(cell.value, cell.number_format) for cell in worksheet[2]]
+    assert cells == [
+        ("1 werkzame persoon (ZZP'er)", "General"),
+        (4000, "0"),
+        (0.3, "0.0"),
+    ]
+
+
+def test_write_numbers_short_row(tmp_path):
+    """A missing cell of a short row in a numeric column is written as an empty cell"""
+    tabular_file = tmp_path / "tabular.tex"
+    tabular_file.write_text(
+        "\n".join(
+            [
+                r"\begin{tabular}{lrr}",
+                r"Regio & 2020 & 2021 \\",
+                r"Noord & 1 & 2,5 \\",
+                r"Zuid & 3 \\",
+                r"\end{tabular}",
+            ]
+        ),
+        encoding="utf-8",
+    )
+    tabular_df = parse_tabular(input_filename=tabular_file, convert_numbers=True)
+    assert tabular_df.attrs["number_formats"] == {
+        "2020": (0, False, False),
+        "2021": (1, False, False),
+    }
+    assert tabular_df["2021"].to_list() == [2.5, None]
+
+    xls_file = tmp_path / "tabular.xlsx"
+    write_data_to_sheet_multiindex(tabular_df, xls_file)
+    worksheet = openpyxl.load_workbook(xls_file).active
+    assert list(worksheet.iter_rows(min_row=2, values_only=True)) == [
+        ("Noord", 1, 2.5),
+        ("Zuid", 3, None),
+    ]
+
+
+def test_write_macro_formats(root_directory, tmp_path):
+    """The cells of a format rule are written with its format"""
+    rules_file = tmp_path / "rules.ini"
+    rules_file.write_text('[format]\nemph = {"italic": true}\n', encoding="utf-8")
+    macro_rules = MacroRules.from_file(rules_file)
+    tabular_df = parse_tabular(
+        input_filename=root_directory / Path("tests/tabular_1.tex"),
+        macro_rules=macro_rules,
+    )
+    assert tabular_df.attrs["cell_formats"] == {"emph": {"italic": True}}
+
+    xls_file = tmp_path / "tabular_1.xlsx"
+    write_data_to_sheet_multiindex(tabular_df, xls_file)
+    worksheet = openpyxl.load_workbook(xls_file).active
+    italic_cells = [
+        cell.value for row in worksheet.iter_rows() for cell in row if cell.font.i
+    ]
+    assert italic_cells
+    assert not any(
+        "\ue000" in str(cell.value) for row in worksheet.iter_rows() for cell in row
+    )
+
+
+def test_write_read_only_threads(root_directory, tmp_path):
+    """The writer does not change the data frame, so threads can write it at once"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    rules_file = tmp_path / "rules.ini"
+    rules_file.write_text('[format]\nemph = {"italic": true}\n', encoding="utf-8")
+    macro_rules = MacroRules.from_file(rules_file)
+    tabular_dfs = [
+        parse_tabular(
+            input_filename=root_directory / Path("tests/tabular_1.tex"),
+            macro_rules=macro_rules,
+        ),
+        parse_tabular(
+            input_filename=root_directory / Path("tests/tabular_2.tex"),
+            multi_index=True,
+        ),
+    ]
+    expected_dfs = [tabular_df.copy(deep=True) for tabular_df in tabular_dfs]
+
+    def write_table(number):
+        xls_file = tmp_path / f"table_{number}.xlsx"
+        write_data_to_sheet_multiindex(tabular_dfs[number % 2], xls_file)
+        worksheet = openpyxl.load_workbook(xls_file).active
+        return list(worksheet.iter_rows(values_only=True))
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        rows = list(executor.map(write_table, range(8)))
+
+    assert all(table_rows == rows[number % 2] for number, table_rows in enumerate(rows))
+    for tabular_df, expected_df in zip(tabular_dfs, expected_dfs):
+        pt.assert_frame_equal(tabular_df, expected_df)
+        assert tabular_df.attrs == expected_df.attrs
+
+
+def test_tabular_multi_line_rows(tmp_path):
+    """Escaped ampersands, separators inside braces and rows over several lines"""
+    tabular_file = tmp_path / "tabular.tex"
+    tabular_file.write_text(
+        "\n".join(
+            [
+                r"\begin{tabular}{G{0.3\textwidth}>{\footnotesize}rr}",
+                r"\rowcolor{white}Sector & \textbf{2020} & \textbf{2021} \\",
+                r"\hline",
+                r"R\&D & 12 & 13 \\",
+                r"\multicolumn{1}{l}{Handel & industrie}",
+                r"  & 14 % voorlopig",
+                r"  & 15 \\",
+                r"\multirow{2}{*}{Overig} & 16 & 17 \\[1ex]",
+                r"\end{tabular}",
+            ]
+        ),
+        encoding="utf-8",
+    )
+    tabular_df = parse_tabular(input_filename=tabular_file)
+    assert tabular_df.index.to_list() == ["R&D", "Handel & industrie", "Overig"]
+    assert tabular_df.to_dict(orient="list") == {
+        "2020": ["12", "14", "16"],
+        "2021": ["13", "15", "17"],
+    }
+
+
+def test_tabular_stray_text(tmp_path):
+    """Newcommands and prose outside the rows are not glued onto the next row"""
+    tabular_file = tmp_path / "tabular.tex"
+    tabular_file.write_text(
+        "\n".join(
+            [
+                r"Some text",
+                r"\begin{tabular}{lr}",
+                r"Name & Value \\",
+                r"\newcommand{\x}{XX}",
+                r"r1 & \x \\",
+                r"\end{tabular}",
+            ]
+        ),
+        encoding="utf-8",
+    )
+    tabular_df = parse_tabular(input_filename=tabular_file)
+    assert tabular_df.index.name == "Name"
+    assert tabular_df.index.to_list() == ["r1"]
+    assert tabular_df.to_dict(orient="list") == {"Value": ["XX"]}
+
+    # a fragment without the begin of the tabular
+    tabular_file.write_text(
+        "\n".join(
+            [
+                r"\newcommand{\gb}{good/bad}",
+                r"Some text",
+                r"Name & Value \\",
+                r"r1 & \gb \\",
+            ]
+        ),
+        encoding="utf-8",
+    )
+    tabular_df = parse_tabular(input_filename=tabular_file)
+    assert tabular_df.index.name == "Name"
+    assert tabular_df.index.to_list() == ["r1"]
+    assert tabular_df.to_dict(orient="list") == {"Value": ["good/bad"]}
+
+
+def test_write_cell_spans(tmp_path):
+    """Multicolumn and multirow cells are written as merged cells"""
+    tabular_file = tmp_path / "tabular.tex"
+    tabular_file.write_text(
+        "\n".join(
+            [
+                r"\begin{tabular}{llrr}",
+                r"Groep & Sector & 2020 & 2021 \\",
+                r"\multirow{2}{*}{Bedrijven} & Handel & 1 & 2 \\",
+                r" & Industrie & \multicolumn{2}{c}{3} \\",
+                r" & Overig & 4 & 5 \\",
+                r"\multirow{-2}{*}{Overheid} & Totaal & 6 & 7 \\",
+                r"\end{tabular}",
+            ]
+        ),
+        encoding="utf-8",
+    )
+    tabular_df = parse_tabular(input_filename=tabular_file)
+    assert tabular_df.attrs["cell_spans"] == [(0, 0, 2, 1), (1, 2, 1, 2), (2, 0, 2, 1)]
+
+    xls_file = tmp_path / "tabular.xlsx"
+    write_data_to_sheet_multiindex(tabular_df, xls_file)
+    worksheet = openpyxl.load_workbook(xls_file).active
+    assert sorted(str(cells) for cells in worksheet.merged_cells.ranges) == [
+        "A2:A3",
+        "A4:A5",
+        "C3:D3",
+    ]
+    assert worksheet["A4"].value == "Overheid"
+    assert worksheet["C3"].value == "3"
+
+    write_data_to_sheet_multiindex(tabular_df, xls_file, constant_memory=True)
+    worksheet = openpyxl.load_workbook(xls_file).active
+    assert not worksheet.merged_cells.ranges
+
+
+def test_tabular_arrow_strings(root_directory, tmp_path):
+    """The pyarrow dtype backend gives the same cells and Excel file as numpy"""
+    pytest.importorskip("pyarrow")
+    short_row_file = tmp_path / "short_row.tex"
+    short_row_file.write_text(
+        "\n".join(
+            [
+                r"\begin{tabular}{lrr}",
+                r"Regio & 2020 & 2021 \\",
+                r"\multirow{2}{*}{Noord} & 1,5 & 2 \\",
+                r" & 3 \\",
+                r"Zuid & \multicolumn{2}{c}{4} \\",
+                r"\end{tabular}",
+            ]
+        ),
+        encoding="utf-8",
+    )
+    search_and_replace = {r"\$cdot\$": ".", "a": "A", r"(\d),(\d)": r"\1.\2"}
+    cases = [
+        (
+            root_directory / "tests" / "tabular_1.tex",
+            dict(search_and_replace=search_and_replace),
+        ),
+        (root_directory / "tests" / "tabular_2.tex", dict(multi_index=True)),
+        (root_directory / "tests" / "tabular_3.tex", dict(convert_numbers=True)),
+        (
+            root_directory / "tests" / "tabular_5.tex",
+            dict(search_and_replace=search_and_replace),
+        ),
+        (short_row_file, dict(convert_numbers=True)),
+        (short_row_file, dict(search_and_replace=search_and_replace)),
+    ]
+    for number, (tabular_file, options) in enumerate(cases):
+        tabular_df = parse_tabular(input_filename=tabular_file, **options)
+        arrow_df = parse_tabular(
+            input_filename=tabular_file, dtype_backend="pyarrow", **options
+        )
+        if "convert_numbers" not in options:
+            assert all(dtype == "string" for dtype in arrow_df.dtypes)
+        # the string columns hold the same cells, with NA instead of None if missing
+        expected_df = arrow_df.copy()
+        for position, dtype in enumerate(arrow_df.dtypes):
+            if dtype == "string":
+                expected_df.isetitem(
+                    position,
+                    arrow_df.iloc[:, position].to_numpy(dtype=object, na_value=None),
+                )
+        pt.assert_frame_equal(expected_df, tabular_df, check_index_type=False)
+        assert arrow_df.attrs == tabular_df.attrs
+
+        rows = list()
+        for data_df in (tabular_df, arrow_df):
+            xls_file = tmp_path / f"tabular_{number}.xlsx"
+            write_data_to_sheet_multiindex(data_df, xls_file)
+            worksheet = openpyxl.load_workbook(xls_file).active
+            rows.append(
+                (
+                    list(worksheet.iter_rows(values_only=True)),
+                    sorted(str(cells) for cells in worksheet.merged_cells.ranges),
+                )
+            )
+        assert rows[0] == rows[1]
+
+    with pytest.raises(ValueError):
+        parse_tabular(input_filename=short_row_file, dtype_backend="arrow")
@@ -1,10 +1,37 @@
 from pathlib import Path
+import pytest
+import xlsxwriter
+import openpyxl
 import pandas as pd
 import numpy as np
 import pandas.testing as pt
 import numpy.testing as nt
 
-from tabularxls.tabular_utils import get_super, replace_textsuper
+from tabularxls.tabular_utils import (
+    get_max_width,
+    get_text_width,
+    get_values_width,
+    get_super,
+    replace_textsuper,
+    find_color_name,
+    get_color_names,
+    clean_the_cells,
+    AliasDict,
+    MacroRules,
+    TabularTokenizer,
+    ColumnarRows,
+    get_brace_groups,
+    DEFAULT_MACRO_RULES,
+    PatternReplacer,
+    WorkBook,
+    get_index_spans,
+    get_command_argument,
+    get_sheet_names,
+    TabularEnvironment,
+    convert_numeric_columns,
+    get_number_format,
+    write_sheet,
+)
 
 
 def test_get_super():
@@ -25,3 +52,535 @@ def test_replace_test_super():
     assert "Also check thisˢᵘᵖᵉʳ" == replace_textsuper(
         r"Also check this\textsuperscript{super}"
     )
+
+
+def test_clean_the_cells():
+
+    cells = [
+        r"\rowcolor{white}\cornercell{\textbf{Categorie}} ",
+        r"  \normalsize{\textbf{Variabelenaam}}\\",
+        r"\hspace{1ex}93 ",
+        r"\textbf{2008--2013}",
+        r"\emph{good}/\emph{bad} \textemdash{} \numprint{1234}",
+        r"-- strafoplegging OM\textsuperscript{2)}",
+        r"\multicolumn{2}{G{0.5\textwidth}}{Totaal}",
+    ]
+    expected_cells = [
+        "Categorie",
+        "Variabelenaam",
+        "93",
+        "2008-2013",
+        "good/bad - 1234",
+        "- strafoplegging OM²⁾",
+        "Totaal",
+        "",
+    ]
+    assert clean_the_cells(cells) == expected_cells
+
+
+def test_clean_the_cells_aliases():
+    """The remembered cells are cleaned again when the aliases change"""
+
+    cells = [r"\goodbad", r"\emph{bad}", r"\goodbad"]
+    aliases = AliasDict()
+    assert clean_the_cells(cells, aliases) == ["goodbad", "bad", "goodbad"]
+
+    aliases["goodbad"] = "good/bad"
+    assert clean_the_cells(cells, aliases) == ["good/bad", "bad", "good/bad"]
+    assert clean_the_cells(cells, {"goodbad": "good or bad"}) == [
+        "good or bad",
+        "bad",
+        "good or bad",
+    ]
+    assert clean_the_cells(cells) == ["goodbad", "bad", "goodbad"]
+
+    # alias sets with the same contents share their version
+    assert AliasDict(goodbad="good/bad").version == aliases.version
+    assert AliasDict().version == 0
+
+
+def test_alias_dict_many_aliases(monkeypatch):
+    """Adding aliases counts the changes and the versions of few alias sets are kept"""
+    import tabularxls.tabular_utils as tabular_utils
+
+    aliases = AliasDict()
+    for number in range(400):
+        aliases[f"alias{number}"] = f"value {number}"
+    assert aliases.changes == 400
+    # the matcher is built once, when the aliases are used
+    assert clean_the_cells(["alias12", "alias399x"], aliases) == [
+        "value 12",
+        "value 399x",
+    ]
+    state = aliases._state
+    assert clean_the_cells(["alias7"], aliases) == ["value 7"]
+    assert aliases._state is state
+
+    monkeypatch.setattr(AliasDict, "_versions", dict())
+    monkeypatch.setattr(tabular_utils, "ALIAS_VERSIONS_SIZE", 10)
+    versions = set()
+    for number in range(25):
+        versions.add(AliasDict({f"alias{number}": "value"}).version)
+        assert len(AliasDict._versions) <= 10
+    # a version is not given to another set of aliases once it is forgotten
+    assert len(versions) == 25
+
+
+def test_clean_cache_bypass(monkeypatch):
+    """Cells of mostly distinct values are not remembered once the cache misses often"""
+    import tabularxls.tabular_utils as tabular_utils
+
+    monkeypatch.setattr(tabular_utils, "CLEAN_CACHE_WINDOW", 10)
+    monkeypatch.setattr(tabular_utils, "CLEAN_CACHE_BYPASS", 20)
+    tabular_utils.clear_clean_cache()
+
+    cells = [f"\\textbf{{{number}}}" for number in range(10)]
+    assert clean_the_cells(cells) == [str(number) for number in range(10)]
+    assert len(tabular_utils._clean_cache) == 10
+    assert tabular_utils._clean_cache_stats["bypass"] == 20
+
+    # the next cells are cleaned without the cache, after which it is used again
+    cells = [f"\\textbf{{{number}}}" for number in range(10, 30)]
+    assert clean_the_cells(cells[:10]) == [str(number) for number in range(10, 20)]
+    assert clean_the_cells(cells[10:]) == [str(number) for number in range(20, 30)]
+    assert len(tabular_utils._clean_cache) == 10
+    assert clean_the_cells(cells[10:]) == [str(number) for number in range(20, 30)]
+    assert len(tabular_utils._clean_cache) == 20
+    tabular_utils.clear_clean_cache()
+
+
+def test_macro_rules(tmp_path):
+    """Rules added with the API or read from a file change the cleaning of the macros"""
+
+    cells = [r"\Checkmark{} \textbf{12}", r"\footnotesize{klein}", r"\red{\emph{8}}"]
+    assert clean_the_cells(cells) == ["Checkmark 12", "footnotesizeklein", "red8"]
+
+    macro_rules = DEFAULT_MACRO_RULES.copy()
+    macro_rules.add_rule("Checkmark", "replace", "✓")
+    macro_rules.add_rule("footnotesize", "unwrap")
+    assert clean_the_cells(cells, macro_rules=macro_rules) == ["✓ 12", "klein", "red8"]
+    assert macro_rules.version != DEFAULT_MACRO_RULES.version
+    assert clean_the_cells(cells) == ["Checkmark 12", "footnotesizeklein", "red8"]
+
+    macro_rules.remove_rule("footnotesize")
+    assert macro_rules.copy().version == macro_rules.version
+
+    rules_file = tmp_path / "rules.ini"
+    rules_file.write_text(
+        "[strip]\nfootnotesize\n"
+        "[replace]\nCheckmark = ✓\n"
+        '[format]\ntextbf = {"bold": true}\n',
+        encoding="utf-8",
+    )
+    macro_rules = MacroRules.from_file(rules_file)
+    assert macro_rules.formats == {"textbf": {"bold": True}}
+    assert clean_the_cells(cells, macro_rules=macro_rules) == [
+        "✓ \ue000textbf\ue00012",
+        "",
+        "red8",
+    ]
+
+    with pytest.raises(ValueError):
+        macro_rules.add_rule("textbf", "remove")
+    with pytest.raises(ValueError):
+        macro_rules.add_rule("textbf", "format", "bold")
+
+
+def test_tabular_tokenizer():
+    """Rows are split on the separators at brace depth zero, also across lines"""
+
+    lines = [
+        r"\begin{tabular}[t]{G{2cm}>{\bfseries}",
+        r"rr}",
+        r"\hline",
+        r"R\&D & \multicolumn{2}{c}{a & b} \\[2pt]",
+        r"Totaal % comment & not a cell",
+        r"  & 12\% & \makecell{1\\2} \\ x & y \\",
+        r"\multirow{2}{*}{Lang",
+        r"label} & 3 & 4",
+        r"\end{tabular}",
+    ]
+    tokenizer = TabularTokenizer()
+    rows = [row for line in lines for row in tokenizer.feed(line)]
+    assert tokenizer.close() is None
+    assert rows == [
+        ["R\\&D ", " \\multicolumn{2}{c}{a & b} "],
+        ["Totaal    ", " 12\\% ", " \\makecell{1\\\\2} "],
+        ["x ", " y "],
+        ["\\multirow{2}{*}{Lang label} ", " 3 ", " 4 "],
+    ]
+    assert clean_the_cells(rows[0]) == ["R&D", "a & b", ""]
+    assert clean_the_cells(rows[3]) == ["Lang label", "3", "4"]
+
+    assert get_brace_groups(r"{a}\{{b{c}}d}{e") == [(1, 2), (6, 10), (14, 15)]
+
+
+def test_columnar_rows():
+    """Rows stored as codes per column give the same data frame as the records"""
+    rows = [["a", "1", "x"], ["b", "1"], ["a", "2", "x"]] * 4000
+    rows.append(["c", "3", "y"])
+    columns = ["label", "value", "note"]
+
+    columnar_rows = ColumnarRows()
+    for start in range(0, len(rows), 5000):
+        columnar_rows.extend(rows[start : start + 5000])
+    assert columnar_rows.nbytes == 4 * 3 * len(rows)
+
+    data_df = columnar_rows.to_data_frame(columns)
+    pt.assert_frame_equal(data_df, pd.DataFrame.from_records(rows, columns=columns))
+    # equal cells are the same string
+    assert data_df.iat[0, 0] is data_df.iat[3, 0]
+    assert list(columnar_rows.values[0]) == ["a", "b", "c"]
+
+    categorical_df = columnar_rows.to_data_frame(columns, dtype="category")
+    assert list(categorical_df["note"].cat.categories) == ["x", "y"]
+    pt.assert_frame_equal(categorical_df.astype(object).fillna(""), data_df.fillna(""))
+
+    # a row which is longer than the header
+    with pytest.raises(ValueError):
+        columnar_rows.to_data_frame(columns[:2])
+
+    pa = pytest.importorskip("pyarrow")
+    table = columnar_rows.to_arrow(columns)
+    assert table.column("note").type == pa.dictionary(pa.int32(), pa.string())
+    assert table.column("note").null_count == 4000
+    pt.assert_frame_equal(
+        table.to_pandas().astype(object).fillna(""), data_df.fillna("")
+    )
+    strings_df = columnar_rows.to_data_frame(columns, dtype="string[pyarrow]")
+    assert strings_df["note"].dtype == pd.StringDtype("pyarrow")
+    assert strings_df["note"].isna().sum() == 4000
+    pt.assert_frame_equal(strings_df.astype(object).fillna(""), data_df.fillna(""))
+
+
+def test_columnar_rows_plain():
+    """Mostly distinct cells are stored as plain cells, which give the same frame"""
+    rows = [
+        [f"Regio {ii}", str(ii % 7), f"{ii},5", "x" if ii < 10_000 else f"{ii}"]
+        for ii in range(25_000)
+    ]
+    rows[-1] = rows[-1][:2]
+    columns = ["label", "value", "number", "code"]
+
+    columnar_rows = ColumnarRows()
+    columnar_rows.extend(rows[:10_000])
+    # the cells of the first chunk of the last column are equal
+    assert columnar_rows.plain[3] is None
+    for start in range(10_000, len(rows), 10_000):
+        columnar_rows.extend(rows[start : start + 10_000])
+    # the codes become plain once their distinct values are merged
+    assert [plain is not None for plain in columnar_rows.plain] == [
+        True,
+        False,
+        True,
+        True,
+    ]
+
+    expected_df = pd.DataFrame.from_records(rows, columns=columns)
+    pt.assert_frame_equal(columnar_rows.to_data_frame(columns), expected_df)
+    categorical_df = columnar_rows.to_data_frame(columns, dtype="category")
+    pt.assert_frame_equal(
+        categorical_df.astype(object).fillna(""), expected_df.fillna("")
+    )
+    # the plain columns are encoded for the categorical columns
+    assert columnar_rows.plain == [None] * 4
+    assert columnar_rows.nbytes == 4 * 4 * len(rows)
+
+
+def test_find_color_name():
+    def find_color_name_linear(line):
+        for color_name in get_color_names():
+            if line.startswith(color_name):
+                return color_name
+        return None
+
+    lines = [
+        "",
+        "no color here",
+        "oranjetests_web_ipv6_verdict",
+        "tealish green cell",
+        "greenyellow",
+        "tab:blue",
+        "re",
+    ]
+    lines.extend([name + "suffix" for name in get_color_names()])
+
+    for line in lines:
+        assert find_color_name(line) == find_color_name_linear(line)
+
+    # the first color in the list wins, not the longest prefix
+    assert find_color_name("darkred3") == "dark"
+    assert find_color_name("greenyellow") == "green"
+    assert find_color_name("tealish green cell") == "tea"
+    assert find_color_name("no color here") is None
+
+
+def test_set_format_registry(tmp_path):
+
+    workbook = xlsxwriter.Workbook(tmp_path / "registry.xlsx")
+    wb = WorkBook(workbook=workbook)
+
+    red_format = wb.set_format("red")
+    assert wb.set_format("red") is red_format
+    assert wb.set_format("blue") is not red_format
+    assert wb.set_format("red", base_style={"font_size": 10}) is not red_format
+    assert wb.set_format("not_a_color") is None
+
+    assert wb.format_misses == 3
+    assert wb.format_hits == 1
+    workbook.close()
+
+
+class RecordingWorksheet:
+    """Worksheet which records the cells written by write_row and write"""
+
+    def __init__(self, worksheet):
+        self.worksheet = worksheet
+        self.cells = list()
+
+    def write_row(self, row, col, values, *args):
+        self.cells.extend((row, col + offset) for offset in range(len(values)))
+        return self.worksheet.write_row(row, col, values, *args)
+
+    def write(self, row, col, *args):
+        self.cells.append((row, col))
+        return self.worksheet.write(row, col, *args)
+
+    def __getattr__(self, name):
+        return getattr(self.worksheet, name)
+
+
+@pytest.mark.parametrize("constant_memory", [False, True])
+def test_write_sheet_cells_once(tmp_path, constant_memory):
+    """Each cell is written once, also the colored cells"""
+    xls_file = tmp_path / "cells.xlsx"
+    workbook = xlsxwriter.Workbook(xls_file, {"constant_memory": constant_memory})
+    wb = WorkBook(workbook=workbook)
+    data_df = pd.DataFrame(
+        {"a": ["redx", "1", "2"], "b": ["3", "blue4", "bluey"], "c": ["5", "6", "7"]},
+        index=pd.Index(["r1", "r2", "greenr3"], name="label"),
+    )
+    worksheet = RecordingWorksheet(workbook.add_worksheet("data"))
+    write_sheet(worksheet, wb, data_df, constant_memory=constant_memory)
+    workbook.close()
+
+    assert sorted(worksheet.cells) == [
+        (row, col) for row in range(4) for col in range(4)
+    ]
+    # the rows are written in order, as required by the constant memory mode
+    rows = [row for row, _ in worksheet.cells]
+    assert rows == sorted(rows)
+    worksheet = openpyxl.load_workbook(xls_file).active
+    values = [list(row) for row in worksheet.iter_rows(values_only=True)]
+    assert values == [
+        ["label", "a", "b", "c"],
+        ["r1", "x", "3", "5"],
+        ["r2", "1", "4", "6"],
+        ["r3", "2", "y", "7"],
+    ]
+
+
+def test_pattern_replacer():
+
+    replacer = PatternReplacer(
+        {r"\$cdot\$": ".", r"(\d+),(\d+)": r"\1.\2"}, aliases={"goodbad": "good/bad"}
+    )
+    assert replacer.replace("goodbad") == "good/bad"
+    assert replacer.replace("goodbadnt") == "goodbadnt"
+    assert replacer.replace("$cdot$") == "."
+    assert replacer.replace("12,5 en 1,0") == "12.5 en 1.0"
+    assert replacer.replace("nothing") == "nothing"
+
+    values = np.array(["goodbad", None, "12,5", "goodbad", "x"], dtype=object)
+    new_values = replacer.replace_values(values)
+    nt.assert_array_equal(
+        new_values, np.array(["good/bad", None, "12.5", "good/bad", "x"], dtype=object)
+    )
+    assert replacer.replace_values(np.array(["x", "y"], dtype=object)) is None
+
+    # back references can not be merged into one pattern, but are still replaced
+    replacer = PatternReplacer({r"(a)\1": "b"})
+    assert replacer.matcher is None
+    assert replacer.replace("aab") == "bb"
+
+
+def test_pattern_replacer_arrow():
+    """The Arrow kernels replace as Python, also with rules which RE2 can not apply"""
+    pytest.importorskip("pyarrow")
+
+    replacer = PatternReplacer(
+        {r"\$cdot\$": ".", r"(\d+),(\d+)": r"\1.\2", "a$": "b", r"\\": "/"},
+        aliases={"goodbad": "good/bad"},
+    )
+    # only the rule with digit classes and a back reference is left to Python
+    assert replacer.arrow_rules == [True, True, False, True, True]
+    values = [
+        ["goodbad", None, "12,5 en 1,0", "$cdot$", "x"],
+        ["1,2", "a\n", "aa", "a\\b", "goodbad"],
+    ]
+    arrays = [pd.array(column, dtype="string[pyarrow]") for column in values]
+    new_arrays = replacer.replace_arrow(arrays)
+    for column, new_array in zip(values, new_arrays):
+        assert new_array.dtype == pd.StringDtype("pyarrow")
+        expected = [
+            None if value is None else replacer.replace(value) for value in column
+        ]
+        assert new_array.to_numpy(dtype=object, na_value=None).tolist() == expected
+    assert (
+        replacer.replace_arrow([pd.array(["x", None], dtype="string[pyarrow]")]) is None
+    )
+
+
+def test_pattern_replacer_arrow_prefilter(monkeypatch):
+    """With rules which RE2 can apply, values are matched with the merged patterns"""
+    pytest.importorskip("pyarrow")
+    import pyarrow.compute as pc
+
+    matched_patterns = list()
+    match_substring_regex = pc.match_substring_regex
+
+    def match_substring_regex_spy(strings, pattern, **kwargs):
+        matched_patterns.append(pattern)
+        return match_substring_regex(strings, pattern, **kwargs)
+
+    monkeypatch.setattr(pc, "match_substring_regex", match_substring_regex_spy)
+
+    replacer = PatternReplacer(
+        {r"\$cdot\$": ".", ",": "."}, aliases={"goodbad": "good/bad"}
+    )
+    assert all(replacer.arrow_rules)
+    values = [
+        ["goodbad", None, "12,5", "goodbadnt", "x"],
+        ["$cdot$", "x", "12,5", "y", None],
+    ]
+    arrays = [pd.array(column, dtype="string[pyarrow]") for column in values]
+    new_arrays = replacer.replace_arrow(arrays)
+    assert matched_patterns == [replacer.matcher.pattern]
+    assert [
+        new_array.to_numpy(dtype=object, na_value=None).tolist()
+        for new_array in new_arrays
+    ] == [
+        ["good/bad", None, "12.5", "goodbadnt", "x"],
+        [".", "x", "12.5", "y", None],
+    ]
+
+    # none of the values matches, so no rule is applied
+    unchanged = [pd.array(["x", "goodbadnt", None], dtype="string[pyarrow]")]
+    assert replacer.replace_arrow(unchanged) is None
+    assert len(matched_patterns) == 2
+
+
+def test_get_index_spans():
+
+    index = pd.MultiIndex.from_arrays(
+        [["A", "", "A", "A", "B", "B"], ["x", "", "y", "", "", "z"]]
+    )
+    # labels equal to the one above and empty labels are merged with the label above, as
+    # long as the higher level does not start a new label
+    assert get_index_spans(index) == [
+        {0: 2, 2: 2, 4: 2},
+        {0: 2, 2: 2, 4: 1, 5: 1},
+    ]
+
+
+def test_get_max_width():
+
+    assert get_text_width("abc") == 3
+    # wide characters count double, superscript glyphs half
+    assert get_text_width("東京") == 4
+    assert get_text_width("x" + get_super("12")) == 2
+
+    data_df = pd.DataFrame(
+        {"name": ["a", "bbbb", None], "long column name": [1.5, 10, "東京東京東京東京東京"]}
+    )
+    assert get_max_width(data_df, "name") == 4
+    assert get_max_width(data_df, "long column name", column_index=1) == 20
+    assert get_values_width(pd.Index([], dtype=object)) == 0
+
+    # with sampling only the first values and a random sample of the rest are checked
+    values = pd.Series(["a"] * 1000 + ["bbbbbb"])
+    assert get_values_width(values) == 6
+    assert get_values_width(values, sample_size=10) == 1
+    assert get_values_width(values, sample_size=1000) == 6
+
+
+def test_get_command_argument():
+
+    line = r"\caption[kort]{Tabel met \emph{nadruk}}\label{tab:nadruk}"
+    assert get_command_argument(line, "caption") == r"Tabel met \emph{nadruk}"
+    assert get_command_argument(line, "label") == "tab:nadruk"
+    assert get_command_argument(line, "section") is None
+
+
+def test_get_sheet_names():
+
+    environments = [TabularEnvironment(number) for number in range(1, 6)]
+    environments[0].caption = "Uitkomsten [%]: IPv6/IPv4"
+    environments[1].label = "tab:uitkomsten"
+    environments[2].caption = "UITKOMSTEN [%]: IPV6/IPV4"
+    environments[3].caption = "Een heel erg lange titel van een tabel in een hoofdstuk"
+
+    assert get_sheet_names(environments) == [
+        "Uitkomsten _%__ IPv6_IPv4",
+        "tab_uitkomsten",
+        "UITKOMSTEN _%__ IPV6_IPV4 (2)",
+        "Een heel erg lange titel van ee",
+        "Tabular 5",
+    ]
+
+
+def test_convert_numeric_columns():
+
+    table_df = pd.DataFrame(
+        {
+            "decimal": ["12,5", "-", "1.234,25", "−3,0"],
+            "integer": ["1 234", "*", "5", "."],
+            "percent": ["45%", "1,1 %", "", "100%"],
+            "text": ["12,5", "n.v.t.", "3", "4"],
+            "mixed percent": ["45%", "12", "3", "4"],
+        },
+        index=pd.Index(["2019", "2020", "2021", "2022"], name="jaar"),
+    )
+    converted_df = convert_numeric_columns(table_df)
+
+    assert converted_df["decimal"].to_list() == [12.5, "-", 1234.25, -3.0]
+    assert converted_df["integer"].to_list() == [1234, "*", 5, "."]
+    assert converted_df["percent"].to_list() == [0.45, 0.011, "", 1.0]
+    # columns with other text or only some percentages are kept, just like the index
+    pt.assert_series_equal(converted_df["text"], table_df["text"])
+    pt.assert_series_equal(converted_df["mixed percent"], table_df["mixed percent"])
+    pt.assert_index_equal(converted_df.index, table_df.index)
+    assert converted_df.attrs["number_formats"] == {
+        "decimal": (2, True, False),
+        "integer": (0, True, False),
+        "percent": (1, False, True),
+    }
+
+    # without placeholders the column gets a numeric dtype
+    table_df = pd.DataFrame({"a": ["1.5", "2,000.25"], "b": ["1", "2"]})
+    converted_df = convert_numeric_columns(table_df, decimal=".")
+    assert converted_df.dtypes.to_list() == [np.dtype(float), np.dtype(np.int64)]
+    # with a decimal comma, 1.5 is not a number
+    assert "number_formats" not in convert_numeric_columns(table_df[["a"]]).attrs
+
+    # integers are parsed exactly, those beyond 64 bits and codes with leading zeros
+    # stay text
+    table_df = pd.DataFrame(
+        {
+            "large": ["9007199254740993", "-9 223 372 036 854 775 808"],
+            "too large": ["12345678901234567890", "1"],
+            "codes": ["0123", "4"],
+            "zeros": ["0", "0,5"],
+            "grouped zeros": ["0.123", "1"],
+        }
+    )
+    converted_df = convert_numeric_columns(table_df)
+    assert converted_df["large"].to_list() == [2**53 + 1, -(2**63)]
+    assert converted_df["large"].dtype == np.int64
+    pt.assert_series_equal(converted_df["too large"], table_df["too large"])
+    pt.assert_series_equal(converted_df["codes"], table_df["codes"])
+    assert converted_df["zeros"].to_list() == [0.0, 0.5]
+    pt.assert_series_equal(converted_df["grouped zeros"], table_df["grouped zeros"])
+
+    assert get_number_format(2, True, False) == ("#,##0.00", ",.2f")
+    assert get_number_format(1, False, True) == ("0.0%", ".1%")
@@ -0,0 +1,84 @@
+import shutil
+import threading
+import time
+
+import pytest
+
+from tabularxls.main import watch_directory
+from tabularxls.watch import InotifyWatcher, PollingWatcher, watch_changes
+
+
+def get_watchers():
+    """The watchers available on this platform"""
+    watchers = [dict(polling=True, polling_interval=0.05)]
+    try:
+        InotifyWatcher(".").close()
+    except OSError:
+        pass
+    else:
+        watchers.append(dict(polling=False))
+    return watchers
+
+
+@pytest.mark.parametrize("watcher_options", get_watchers())
+def test_watch_changes(tmp_path, watcher_options):
+    """A burst of writes is reported once and only for the files which changed"""
+    (tmp_path / "unchanged.tex").write_text("a & b\n")
+
+    stop_event = threading.Event()
+    changes = list()
+
+    def collect():
+        for filenames in watch_changes(
+            tmp_path, debounce=0.5, stop_event=stop_event, **watcher_options
+        ):
+            changes.append([filename.name for filename in filenames])
+
+    watcher_thread = threading.Thread(target=collect)
+    watcher_thread.start()
+    time.sleep(0.2)
+    for count in range(3):
+        (tmp_path / "changed.tex").write_text(f"a & {count}\n")
+        (tmp_path / "ignored.xlsx").write_text("not a tabular")
+        time.sleep(0.01)
+    time.sleep(1.5)
+    stop_event.set()
+    watcher_thread.join()
+
+    assert changes == [["changed.tex"]]
+
+
+def test_polling_watcher(tmp_path):
+
+    watcher = PollingWatcher(tmp_path, interval=0.01)
+    assert watcher.wait(0.05) == set()
+    (tmp_path / "new.tex").write_text("a & b\n")
+    assert watcher.wait(0.05) == {tmp_path / "new.tex"}
+    assert watcher.wait(0.05) == set()
+
+
+def test_watch_directory(root_directory, tmp_path):
+    """Changed tabulars are converted while watching"""
+    stop_event = threading.Event()
+    output_directory = tmp_path / "out"
+    watcher_thread = threading.Thread(
+        target=watch_directory,
+        args=(tmp_path,),
+        kwargs=dict(output_directory=output_directory, stop_event=stop_event),
+    )
+    watcher_thread.start()
+
+    # watching only starts once pandas has been loaded, so keep writing the file until
+    # it is converted
+    xls_file = output_directory / "tabular_3.xlsx"
+    for _ in range(20):
+        shutil.copy(
+            root_directory / "tests" / "tabular_3.tex", tmp_path / "tabular_3.tex"
+        )
+        time.sleep(0.5)
+        if xls_file.exists():
+            break
+    stop_event.set()
+    watcher_thread.join()
+
+    assert xls_file.exists()